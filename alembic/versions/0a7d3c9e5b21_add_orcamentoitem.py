@@ -0,0 +1,85 @@
+"""add orcamentoitem table (relational copy of orcamento.itens)
+
+Revision ID: 0a7d3c9e5b21
+Revises: f2b6d8e41c93
+Create Date: 2026-10-19 15:32:40.118305
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7d3c9e5b21'
+down_revision: Union[str, Sequence[str], None] = 'f2b6d8e41c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    orcamentoitem = op.create_table(
+        'orcamentoitem',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('posicao', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(), nullable=False),
+        sa.Column('nome', sa.String(), nullable=False),
+        sa.Column('quantidade', sa.Float(), nullable=False),
+        sa.Column('unidade', sa.String(), nullable=True),
+        sa.Column('valor', sa.Float(), nullable=False),
+        sa.Column('ncm', sa.String(), nullable=True),
+        sa.Column('topicos', sa.JSON(), nullable=True),
+        sa.Column('orcamento_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['orcamento_id'], ['orcamento.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['item_id'], ['item.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_orcamentoitem_orcamento_id_posicao', 'orcamentoitem', ['orcamento_id', 'posicao'])
+    op.create_index('ix_orcamentoitem_tipo_nome', 'orcamentoitem', ['tipo', 'nome'])
+    op.create_index('ix_orcamentoitem_item_id', 'orcamentoitem', ['item_id'])
+
+    # Copia os itens dos orçamentos existentes, em lotes para não segurar tudo em memória
+    bind = op.get_bind()
+    resultado = bind.execute(sa.text("SELECT id, itens FROM orcamento WHERE itens IS NOT NULL"))
+    while lote := resultado.fetchmany(500):
+        linhas = []
+        for orcamento_id, itens in lote:
+            if isinstance(itens, str):
+                itens = json.loads(itens)
+            for posicao, item in enumerate(itens or []):
+                linhas.append({
+                    'orcamento_id': orcamento_id,
+                    'posicao': posicao,
+                    'tipo': item.get('tipo') or '',
+                    'nome': item.get('nome') or '',
+                    'quantidade': float(item.get('quantidade') or 0),
+                    'unidade': item.get('unidade'),
+                    'valor': float(item.get('valor') or 0),
+                    'ncm': item.get('ncm') or None,
+                    'topicos': item.get('topicos') or None,
+                })
+        if linhas:
+            op.bulk_insert(orcamentoitem, linhas)
+
+    # Liga as linhas ao item do catálogo do mesmo usuário com o mesmo tipo e nome
+    op.execute("""
+        UPDATE orcamentoitem SET item_id = (
+            SELECT MIN(item.id) FROM item, orcamento
+            WHERE orcamento.id = orcamentoitem.orcamento_id
+              AND item.user_id = orcamento.user_id
+              AND item.tipo = orcamentoitem.tipo
+              AND lower(item.nome) = lower(orcamentoitem.nome)
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orcamentoitem_item_id', table_name='orcamentoitem')
+    op.drop_index('ix_orcamentoitem_tipo_nome', table_name='orcamentoitem')
+    op.drop_index('ix_orcamentoitem_orcamento_id_posicao', table_name='orcamentoitem')
+    op.drop_table('orcamentoitem')
@@ -0,0 +1,63 @@
+"""add resumomensal table (dashboard aggregates)
+
+Revision ID: 1c5e8f2a7d94
+Revises: 0a7d3c9e5b21
+Create Date: 2026-10-19 16:08:12.904517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c5e8f2a7d94'
+down_revision: Union[str, Sequence[str], None] = '0a7d3c9e5b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'resumomensal',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('mes', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('quantidade', sa.Integer(), nullable=False),
+        sa.Column('total_geral', sa.Float(), nullable=False),
+        sa.Column('total_servicos', sa.Float(), nullable=False),
+        sa.Column('total_materiais', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('uq_resumomensal_user_id_mes_status', 'resumomensal', ['user_id', 'mes', 'status'], unique=True)
+
+    # Preenche com os orçamentos existentes (mesma conta de resumo.reconstruir_resumo)
+    op.execute("""
+        INSERT INTO resumomensal (user_id, mes, status, quantidade, total_geral, total_servicos, total_materiais)
+        SELECT o.user_id,
+               substr(o.data_emissao, 7, 4) || '-' || substr(o.data_emissao, 4, 2),
+               coalesce(o.status, 'Orçamento'),
+               count(*),
+               sum(coalesce(o.total_geral, 0)),
+               sum(coalesce(t.servicos, 0)),
+               sum(coalesce(t.materiais, 0))
+        FROM orcamento o
+        LEFT JOIN (
+            SELECT orcamento_id,
+                   sum(CASE WHEN tipo = 'servico' THEN quantidade * valor ELSE 0 END) AS servicos,
+                   sum(CASE WHEN tipo = 'material' THEN quantidade * valor ELSE 0 END) AS materiais
+            FROM orcamentoitem GROUP BY orcamento_id
+        ) t ON t.orcamento_id = o.id
+        WHERE o.user_id IS NOT NULL
+        GROUP BY o.user_id, substr(o.data_emissao, 7, 4) || '-' || substr(o.data_emissao, 4, 2), coalesce(o.status, 'Orçamento')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_resumomensal_user_id_mes_status', table_name='resumomensal')
+    op.drop_table('resumomensal')
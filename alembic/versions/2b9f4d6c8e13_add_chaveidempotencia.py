@@ -0,0 +1,39 @@
+"""add chaveidempotencia table
+
+Revision ID: 2b9f4d6c8e13
+Revises: 1c5e8f2a7d94
+Create Date: 2026-10-19 16:47:55.302871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b9f4d6c8e13'
+down_revision: Union[str, Sequence[str], None] = '1c5e8f2a7d94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'chaveidempotencia',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('chave', sa.String(length=128), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=False),
+        sa.Column('resposta', sa.JSON(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'chave'),
+    )
+    op.create_index('ix_chaveidempotencia_criado_em', 'chaveidempotencia', ['criado_em'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chaveidempotencia_criado_em', table_name='chaveidempotencia')
+    op.drop_table('chaveidempotencia')
@@ -0,0 +1,28 @@
+"""add user.catalogo_revisao (catalog version shared by all workers)
+
+Revision ID: a3d7e9c2f184
+Revises: 2b9f4d6c8e13
+Create Date: 2026-10-19 18:41:07.553120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d7e9c2f184'
+down_revision: Union[str, Sequence[str], None] = '2b9f4d6c8e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('catalogo_revisao', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'catalogo_revisao')
@@ -0,0 +1,60 @@
+"""add item.nome_busca and catalog search indexes
+
+Revision ID: b7e2c4a19d03
+Revises: 93b5b14544e8
+Create Date: 2026-10-19 10:12:31.418207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from normalizacao import normalizar_texto
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c4a19d03'
+down_revision: Union[str, Sequence[str], None] = '93b5b14544e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('item', sa.Column('nome_busca', sa.String(), nullable=True))
+
+    # Preenche o nome normalizado dos itens existentes (mesma regra usada pela aplicação)
+    bind = op.get_bind()
+    itens = bind.execute(sa.text("SELECT id, nome FROM item")).fetchall()
+    if itens:
+        bind.execute(
+            sa.text("UPDATE item SET nome_busca = :nome_busca WHERE id = :id"),
+            [{"id": item_id, "nome_busca": normalizar_texto(nome)} for item_id, nome in itens],
+        )
+
+    is_postgres = bind.dialect.name == 'postgresql'
+    op.create_index(
+        'ix_item_user_id_nome_busca', 'item', ['user_id', 'nome_busca'],
+        postgresql_ops={'nome_busca': 'varchar_pattern_ops'},
+    )
+    op.create_index(
+        'ix_item_user_id_ncm', 'item', ['user_id', 'ncm'],
+        postgresql_ops={'ncm': 'varchar_pattern_ops'},
+    )
+    if is_postgres:
+        # Índice trigram: atende o "contém" (LIKE '%termo%') da busca do catálogo
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            'ix_item_nome_busca_trgm', 'item', ['nome_busca'],
+            postgresql_using='gin', postgresql_ops={'nome_busca': 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_item_nome_busca_trgm', table_name='item')
+    op.drop_index('ix_item_user_id_ncm', table_name='item')
+    op.drop_index('ix_item_user_id_nome_busca', table_name='item')
+    op.drop_column('item', 'nome_busca')
@@ -0,0 +1,56 @@
+"""add unique (user_id, tipo, lower(nome)) index on item
+
+Revision ID: c41f8e2d6a57
+Revises: b7e2c4a19d03
+Create Date: 2026-10-19 11:03:48.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8e2d6a57'
+down_revision: Union[str, Sequence[str], None] = 'b7e2c4a19d03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Junta os duplicados que escaparam da verificação do create_item: fica o item mais
+    # antigo (o id que já pode estar em uso), com o valor e o NCM do cadastro mais recente
+    op.execute("""
+        UPDATE item SET
+            valor = (
+                SELECT d.valor FROM item d
+                WHERE d.user_id = item.user_id AND d.tipo = item.tipo AND lower(d.nome) = lower(item.nome)
+                ORDER BY d.id DESC LIMIT 1
+            ),
+            ncm = (
+                SELECT d.ncm FROM item d
+                WHERE d.user_id = item.user_id AND d.tipo = item.tipo AND lower(d.nome) = lower(item.nome)
+                ORDER BY d.id DESC LIMIT 1
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM item WHERE user_id IS NOT NULL
+            GROUP BY user_id, tipo, lower(nome) HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM item
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM item GROUP BY user_id, tipo, lower(nome)
+        )
+    """)
+    op.create_index(
+        'uq_item_user_id_tipo_nome', 'item',
+        ['user_id', 'tipo', sa.text('lower(nome)')], unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_item_user_id_tipo_nome', table_name='item')
@@ -0,0 +1,51 @@
+"""add cliente.nome_key/telefone_key and contato.cliente_id index
+
+Revision ID: d5a90b3e7c12
+Revises: c41f8e2d6a57
+Create Date: 2026-10-19 12:21:09.553920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from normalizacao import normalizar_texto, normalizar_telefone
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a90b3e7c12'
+down_revision: Union[str, Sequence[str], None] = 'c41f8e2d6a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cliente', sa.Column('nome_key', sa.String(), nullable=True))
+    op.add_column('cliente', sa.Column('telefone_key', sa.String(), nullable=True))
+
+    # Preenche as chaves dos clientes existentes (mesma regra usada pela aplicação)
+    bind = op.get_bind()
+    clientes = bind.execute(sa.text("SELECT id, nome, telefone FROM cliente")).fetchall()
+    if clientes:
+        bind.execute(
+            sa.text("UPDATE cliente SET nome_key = :nome_key, telefone_key = :telefone_key WHERE id = :id"),
+            [
+                {"id": cliente_id, "nome_key": normalizar_texto(nome), "telefone_key": normalizar_telefone(telefone) or None}
+                for cliente_id, nome, telefone in clientes
+            ],
+        )
+
+    op.create_index('ix_cliente_user_id_nome_key', 'cliente', ['user_id', 'nome_key'])
+    op.create_index('ix_cliente_user_id_telefone_key', 'cliente', ['user_id', 'telefone_key'])
+    op.create_index(op.f('ix_contato_cliente_id'), 'contato', ['cliente_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_contato_cliente_id'), table_name='contato')
+    op.drop_index('ix_cliente_user_id_telefone_key', table_name='cliente')
+    op.drop_index('ix_cliente_user_id_nome_key', table_name='cliente')
+    op.drop_column('cliente', 'telefone_key')
+    op.drop_column('cliente', 'nome_key')
@@ -0,0 +1,42 @@
+"""add cliente listing/search indexes
+
+Revision ID: e8c3f1a20b46
+Revises: d5a90b3e7c12
+Create Date: 2026-10-19 13:40:52.906311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c3f1a20b46'
+down_revision: Union[str, Sequence[str], None] = 'd5a90b3e7c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_cliente_user_id_nome', 'cliente', ['user_id', 'nome'])
+    if op.get_bind().dialect.name == 'postgresql':
+        # Índices trigram: atendem o "contém" da busca de clientes por nome e telefone
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            'ix_cliente_nome_key_trgm', 'cliente', ['nome_key'],
+            postgresql_using='gin', postgresql_ops={'nome_key': 'gin_trgm_ops'},
+        )
+        op.create_index(
+            'ix_cliente_telefone_key_trgm', 'cliente', ['telefone_key'],
+            postgresql_using='gin', postgresql_ops={'telefone_key': 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_cliente_telefone_key_trgm', table_name='cliente')
+        op.drop_index('ix_cliente_nome_key_trgm', table_name='cliente')
+    op.drop_index('ix_cliente_user_id_nome', table_name='cliente')
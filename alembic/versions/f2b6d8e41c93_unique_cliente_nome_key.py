@@ -0,0 +1,49 @@
+"""make (user_id, nome_key) unique on cliente
+
+Revision ID: f2b6d8e41c93
+Revises: e8c3f1a20b46
+Create Date: 2026-10-19 14:55:17.660482
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d8e41c93'
+down_revision: Union[str, Sequence[str], None] = 'e8c3f1a20b46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Cliente "sobrevivente" de cada grupo de duplicados: o mais antigo com o mesmo nome normalizado
+SOBREVIVENTE = """
+    SELECT MIN(d.id) FROM cliente d, cliente c
+    WHERE c.id = {tabela}.cliente_id AND d.user_id = c.user_id AND d.nome_key = c.nome_key
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Junta clientes duplicados (ex.: "João Silva" e "joao  silva"): orçamentos e contatos
+    # passam para o cliente mais antigo e os demais são apagados
+    for tabela in ('orcamento', 'contato'):
+        op.execute(f"""
+            UPDATE {tabela} SET cliente_id = ({SOBREVIVENTE.format(tabela=tabela)})
+            WHERE cliente_id IN (SELECT id FROM cliente WHERE nome_key IS NOT NULL)
+        """)
+    op.execute("""
+        DELETE FROM cliente
+        WHERE nome_key IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM cliente WHERE nome_key IS NOT NULL GROUP BY user_id, nome_key)
+    """)
+
+    op.drop_index('ix_cliente_user_id_nome_key', table_name='cliente')
+    op.create_index('uq_cliente_user_id_nome_key', 'cliente', ['user_id', 'nome_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_cliente_user_id_nome_key', table_name='cliente')
+    op.create_index('ix_cliente_user_id_nome_key', 'cliente', ['user_id', 'nome_key'])
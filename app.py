@@ -1,137 +1,170 @@
 
+# --- Medição do cold start (precisa ser o primeiro import) ---
+from inicializacao import TEMPOS, marcar, esquema_em_dia, MedirPrimeiraResposta
+
+# --- Logs estruturados (JSON em stdout, escritos por uma thread à parte) ---
+from logs import configurar_logs
+configurar_logs()
+
 import os
-import httpx
+import logging
 import json
-import locale
 import secrets
 import io
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import List, Literal, Optional
 from urllib.parse import quote
-from sqlalchemy import func, cast, Integer
+from sqlalchemy import func, cast, Integer, update, insert, delete, case, or_
+from sqlalchemy.exc import IntegrityError
 
 # --- Imports do FastAPI e bibliotecas ---
-from fastapi import FastAPI, HTTPException, status, Form, Request, Depends, Response, Header, Path, Query
+from fastapi import FastAPI, HTTPException, status, Form, Request, Depends, Response, Header, Path, Query, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from dotenv import load_dotenv
-from fpdf import FPDF
-from sqlmodel import SQLModel, Session, create_engine, select
+from sqlmodel import SQLModel, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import selectinload
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
-# --- IMPORTS DO CLOUDINARY (MOVA ELES PARA CÁ) ---
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-
 # --- Import dos seus modelos de dados ---
-from models import Orcamento, Item, User, Cliente, Contato, ContatoOrcamento
+from models import Orcamento, Item, User, Cliente, Contato, ContatoOrcamento, OrcamentoItem, ResumoMensal
+
+# --- Engines e sessões (síncrona e assíncrona) ---
+from database import engine, async_engine, get_db_session, get_async_session, insert_upsert, estado_pool
+
+# --- Métricas no formato do Prometheus (/metrics) ---
+from metricas import metricas, MedirRequisicoes, registrar_contagem_consultas, series_agregadas, texto_prometheus
+
+# --- Cache em memória do usuário autenticado ---
+from cache import guardar_usuario_no_cache, buscar_usuario_no_cache, invalidar_usuario
+from cache import catalogo_cache, invalidar_catalogo
+
+# --- Normalização de textos para buscas ---
+from normalizacao import normalizar_texto, normalizar_telefone, somente_digitos
+
+# --- Resumo mensal dos orçamentos (dashboard) ---
+from resumo import contribuicao, atualizar_resumo, atualizar_resumo_async, ajustar_resumo_em_massa
+
+# --- Sincronização de contatos por diferença ---
+from contatos import CAMPOS_CONTATO, sincronizar_contatos, sincronizar_contatos_async
+
+# --- Idempotência do "Salvar" (reenvios de redes móveis instáveis) ---
+from idempotencia import CABECALHO_IDEMPOTENCIA, buscar_resposta_salva, registrar_resposta
+
+# --- Importação em massa de planilhas ---
+from importacao import iterar_linhas_planilha, validar_linha_item, em_lotes, LinhaInvalida
+from importacao import iterar_clientes_arquivo, validar_cliente
 
 # --- Import do nosso módulo de segurança ---
 from security import get_password_hash, verify_password
 
-from pdf_models.modelo_joao import gerar_pdf_joao
-from pdf_models.modelo_cacador import gerar_pdf_cacador
-from pdf_models.modelo_apresentacao import gerar_pdf_apresentacao
-from pdf_models.modelo_construtora_araras import gerar_pdf_construtora_araras
-from pdf_models.modelo_relatorio_custo import gerar_pdf_relatorio_custo
-
-PDF_GENERATORS = {
-    "joao": gerar_pdf_joao,
-    "cacador": gerar_pdf_cacador,
-    "apresentacao": gerar_pdf_apresentacao,
-    "construtora_araras": gerar_pdf_construtora_araras,
-    "default": gerar_pdf_apresentacao 
-}
+# --- Modelos de PDF: descobertos por nome e importados só no primeiro uso ---
+from pdf_models.registro import registro_pdf
 
 # --- CONFIGURAÇÃO INICIAL E CONSTANTES ---
 load_dotenv()
 
-cloudinary.config(
-    cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key = os.getenv("CLOUDINARY_API_KEY"),
-    api_secret = os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
-
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except locale.Error:
-    print("Aviso: Localidade 'pt_BR.UTF-8' não encontrada.")
-
 USERNAME = os.getenv("BASIC_AUTH_USER", "admin")
 PASSWORD = os.getenv("BASIC_AUTH_PASS", "secret")
 
+logger = logging.getLogger(__name__)
+
 BASE_DIR = os.path.dirname(__file__)
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 
-# --- BANCO DE DADOS ---
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL não definida no arquivo .env")
-
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,             # Número de conexões para manter no pool
-    max_overflow=2,           # Conexões extras permitidas em picos de uso
-    pool_recycle=300,         # Essencial: Recicla conexões a cada 5 minutos (300s)
-    pool_pre_ping=True        # Essencial: Verifica se a conexão está "viva" antes de usar
-)
-
 def create_db_and_tables():
-    print("INFO:     Criando/Verificando tabelas no banco de dados PostgreSQL...")
+    """
+    Roda o create_all só quando o banco não está na revisão head do Alembic.
+    Com as migrações em dia é uma consulta só, em vez de uma verificação por tabela.
+    """
+    with engine.connect() as conn:
+        if esquema_em_dia(conn):
+            logger.info("Migrações em dia; create_all dispensado.")
+            return
+    logger.info("Criando/verificando tabelas no banco de dados...")
     SQLModel.metadata.create_all(engine)
-    print("INFO:     Tabelas prontas.")
+    logger.info("Tabelas prontas.")
 
 
-def format_brl(value):
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-# --- CLASSE DE GERAÇÃO DE PDF (Sua lógica de desenho vai aqui) ---
-# Constantes para o PDF
-FULL_PAGE_BACKGROUND_IMAGE = os.path.join(STATIC_DIR, 'full_page_background.png')
-LOGO_PATH = os.path.join(STATIC_DIR, 'logo.png')
-FIXED_RECT_HEIGHT = 7
-PADDING_RECT_VERTICAL = 1
-LINE_HEIGHT = 4
-TABLE_COL_WIDTHS = [10, 80, 30, 40, 30]
-TABLE_TOTAL_WIDTH = sum(TABLE_COL_WIDTHS)
-
-create_db_and_tables()
-
-app = FastAPI(title="Orçamento API")
-app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "uma_chave_muito_secreta"))
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
-templates = Jinja2Templates(directory="templates") 
+def criar_primeiro_usuario():
+    """Cria o usuário padrão (BASIC_AUTH_USER/BASIC_AUTH_PASS) se o banco ainda não tiver nenhum."""
+    with Session(engine) as session:
+        # Verifica se já existe algum usuário no banco
+        user_in_db = session.exec(select(User.id).limit(1)).first()
+        if user_in_db:
+            return
 
-# --- LÓGICA PARA CRIAR O PRIMEIRO USUÁRIO ---
-with Session(engine) as session:
-    # Verifica se já existe algum usuário no banco
-    user_in_db = session.exec(select(User)).first()
-    
-    # Se não houver nenhum usuário, cria o usuário padrão
-    if not user_in_db:
         # Pega o usuário e senha do .env
         admin_username = os.getenv("BASIC_AUTH_USER", "admin")
         admin_password = os.getenv("BASIC_AUTH_PASS", "secret")
-        
+
         # Criptografa a senha antes de salvar
         hashed_password = get_password_hash(admin_password)
-        
+
         # Cria o objeto User e salva no banco
         admin_user = User(username=admin_username, hashed_password=hashed_password, pdf_template_name="joao" )
         session.add(admin_user)
-        session.commit()
-        print(f"Usuário '{admin_username}' criado com sucesso com a senha padrão.")
+        try:
+            session.commit()
+        except IntegrityError:
+            # Outro processo (ex.: outro worker subindo junto) criou o mesmo usuário antes
+            session.rollback()
+            return
+        logger.warning("Usuário '%s' criado com a senha padrão.", admin_username)
+
+
+# Já preparado neste processo? Com o preload do gunicorn o master prepara antes do
+# fork, e os workers herdam o True e pulam essa etapa no lifespan.
+_aplicacao_preparada = False
+
+
+def preparar_aplicacao():
+    """Tabelas e usuário inicial. Roda uma vez por processo (ou uma vez no master do gunicorn)."""
+    global _aplicacao_preparada
+    if _aplicacao_preparada:
+        return
+    create_db_and_tables()
+    criar_primeiro_usuario()
+    _aplicacao_preparada = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Preparação do banco fora do import do módulo: a máquina do Fly escala a zero
+    (min_machines_running = 0), então isso roda a cada vez que ela acorda.
+    """
+    # Num worker do gunicorn a thread de escrita dos logs do master não veio no fork
+    configurar_logs()
+    await run_in_threadpool(preparar_aplicacao)
+    marcar("startup")
+    logger.info(
+        "Importação em %.3fs; pronto para requisições em %.3fs.", TEMPOS["importacao"], TEMPOS["startup"],
+        extra={"tempos": dict(TEMPOS)},
+    )
+    yield
+    # Worker saindo (ex.: reciclado pelo gunicorn): o último retrato das métricas vai para o disco
+    metricas.gravar_retrato(forcar=True)
+
+
+app = FastAPI(title="Orçamento API", lifespan=lifespan)
+app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "uma_chave_muito_secreta"))
+app.add_middleware(MedirRequisicoes)
+registrar_contagem_consultas(engine, async_engine)
+# Adicionado por último = camada mais externa: mede a primeira resposta inteira
+app.add_middleware(MedirPrimeiraResposta)
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+templates = Jinja2Templates(directory="templates") 
+
+# Violação do índice único (user_id, nome_key) ao renomear um cliente
+MSG_CLIENTE_DUPLICADO = "Já existe outro cliente com este nome."
 
 FECHAMENTO_USERS = [u.strip().lower() for u in os.getenv("FECHAMENTO_USERS", "").split(",") if u.strip()]
 
@@ -147,30 +180,35 @@ async def auth_exception_handler(request: Request, exc: StarletteHTTPException):
         return RedirectResponse("/login")
     return JSONResponse(content={"detail": exc.detail}, status_code=exc.status_code)
 
-def get_db_session():
-    """Cria e fornece uma sessão de banco de dados para uma rota."""
-    with Session(engine) as session:
-        yield session
+METODOS_LEITURA = ("GET", "HEAD")
 
 def get_current_user(request: Request, session: Session = Depends(get_db_session)) -> User:
     """
-    Pega o ID do usuário da sessão, busca o usuário no banco
+    Pega o ID do usuário da sessão, busca o usuário (no cache ou no banco)
     e o retorna. Lança uma exceção se não estiver logado.
     """
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    
+
+    # O cache é por worker: numa escrita o usuário sempre vem do banco, para que um
+    # acesso revogado ou uma conta apagada em outro worker valham na hora
+    if request.method in METODOS_LEITURA:
+        user = buscar_usuario_no_cache(user_id, session)
+        if user:
+            return user
+
     user = session.get(User, user_id)
     if not user:
         request.session.clear()
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     
+    guardar_usuario_no_cache(user)
     return user
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return templates.TemplateResponse(request, "login.html")
 
 def verify_action_permission(user: User = Depends(get_current_user)):
     """
@@ -222,17 +260,18 @@ def login_submit(request: Request, username: str = Form(...), password: str = Fo
             # Se tudo estiver correto, armazena o ID e o username do usuário na sessão
             request.session["user_id"] = user.id
             request.session["user_username"] = user.username
-            print(f"Login bem-sucedido para o usuário: {user.username}")
+            invalidar_usuario(user.id)
+            logger.info("Login bem-sucedido.", extra={"user_id": user.id, "usuario": user.username})
             return RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
 
     # Se o usuário não existir ou a senha estiver incorreta, redireciona para a página de login com erro
-    print(f"Falha no login para o usuário: {username}")
+    logger.warning("Falha no login.", extra={"usuario": username})
     return RedirectResponse(url="/login?error=true", status_code=status.HTTP_303_SEE_OTHER)
 
 @app.get("/visualizar-pdf", response_class=HTMLResponse)
 async def visualizar_pdf_page(request: Request):
     """ Rota para a página que exibe o PDF dentro de um iframe. """
-    return templates.TemplateResponse("visualizador_pdf.html", {"request": request})
+    return templates.TemplateResponse(request, "visualizador_pdf.html")
 
 @app.get("/sw.js", response_class=FileResponse)
 async def service_worker():
@@ -246,19 +285,19 @@ async def logout(request: Request):
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request, current_user: User = Depends(get_current_user)):
-    return templates.TemplateResponse("index.html", {"request": request, "user": current_user, "show_fechamento": show_fechamento_for(current_user), "tem_funcao_analise_custo": current_user.tem_funcao_analise_custo})
+    return templates.TemplateResponse(request, "index.html", {"user": current_user, "show_fechamento": show_fechamento_for(current_user), "tem_funcao_analise_custo": current_user.tem_funcao_analise_custo})
 
 @app.get("/orcamentos", response_class=HTMLResponse)
 async def orcamentos_page(request: Request, current_user: User = Depends(verify_page_access)):
     admin_username = os.getenv("BASIC_AUTH_USER", "admin")
 
     # Pega a lista de modelos (exceto o 'default') para enviar ao template
-    available_templates = {key: key.capitalize() for key in PDF_GENERATORS if key != 'default'}
+    available_templates = {nome: nome.capitalize() for nome in registro_pdf.nomes()}
 
     return templates.TemplateResponse(
+        request,
         "orcamentos.html", 
         {
-            "request": request, 
             "user": current_user, 
             "admin_username_from_env": admin_username,
             "pdf_templates": available_templates 
@@ -268,12 +307,69 @@ async def orcamentos_page(request: Request, current_user: User = Depends(verify_
 
 # --- ROTAS DA API ---
 
+def montar_linhas_itens(orcamento_id: int, itens: list) -> list:
+    """Converte a lista JSON de itens do orçamento nas linhas da tabela OrcamentoItem."""
+    return [
+        {
+            "orcamento_id": orcamento_id,
+            "posicao": posicao,
+            "tipo": item.get("tipo") or "",
+            "nome": item.get("nome") or "",
+            "quantidade": float(item.get("quantidade") or 0),
+            "unidade": item.get("unidade"),
+            "valor": float(item.get("valor") or 0),
+            "ncm": item.get("ncm") or None,
+            "topicos": item.get("topicos") or None,
+        }
+        for posicao, item in enumerate(itens)
+    ]
+
+
+async def sincronizar_itens_orcamento(
+    session: AsyncSession, orcamento_id: int, user_id: int, itens: list, orcamento_novo: bool = False
+):
+    """
+    Regrava as linhas de OrcamentoItem a partir do JSON 'itens' (DELETE + INSERT em lote)
+    e liga cada linha ao item do catálogo com o mesmo tipo e nome, num único UPDATE.
+    Não faz commit: roda na mesma transação que grava o orçamento.
+    """
+    if not orcamento_novo:  # Orçamento recém-criado ainda não tem linhas para apagar
+        await session.exec(delete(OrcamentoItem).where(OrcamentoItem.orcamento_id == orcamento_id))
+    linhas = montar_linhas_itens(orcamento_id, itens)
+    if not linhas:
+        return
+    # render_nulls: linhas com campos vazios (ex.: sem NCM) vão no mesmo INSERT em lote que as demais
+    await session.exec(insert(OrcamentoItem), params=linhas, execution_options={"render_nulls": True})
+    await ligar_itens_ao_catalogo(session, user_id, OrcamentoItem.orcamento_id == orcamento_id)
+
+
+async def ligar_itens_ao_catalogo(session: AsyncSession, user_id: int, *condicoes):
+    """Preenche OrcamentoItem.item_id (das linhas que atendem 'condicoes') com o item do catálogo de mesmo tipo e nome."""
+    item_do_catalogo = (
+        select(Item.id)
+        .where(
+            Item.user_id == user_id,
+            Item.tipo == OrcamentoItem.tipo,
+            func.lower(Item.nome) == func.lower(OrcamentoItem.nome),
+        )
+        .limit(1)
+        .scalar_subquery()
+    )
+    await session.exec(update(OrcamentoItem).where(*condicoes).values(item_id=item_do_catalogo))
+
+
 @app.post("/salvar-orcamento/")
 async def salvar_orcamento_endpoint(
     request: Request,
-    session: Session = Depends(get_db_session),
-    current_user: User = Depends(verify_action_permission)  
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(verify_action_permission),
+    idempotency_key: Optional[str] = Header(default=None, alias=CABECALHO_IDEMPOTENCIA, max_length=128)
 ):
+    # Reenvio de um "Salvar" já processado: devolve a mesma resposta sem gravar de novo
+    if idempotency_key:
+        resposta_salva = await buscar_resposta_salva(session, current_user.id, idempotency_key)
+        if resposta_salva:
+            return resposta_salva
     
     form_data = await request.form()
     
@@ -283,95 +379,65 @@ async def salvar_orcamento_endpoint(
     contatos_json = form_data.get("contatos", "[]") 
     contatos_data = json.loads(contatos_json)
 
-    cliente_para_orcamento = None
     cliente_id_para_orcamento = None
 
+    # Tudo abaixo roda numa única transação: um só commit no fim, sem refresh no meio.
+    # Dados do cliente vindos do formulário (casos 1 e 2). O UPDATE/INSERT direto não passa
+    # pelos eventos do ORM, então as chaves normalizadas vão calculadas aqui.
+    dados_cliente = {
+        "nome": nome_cliente,
+        "telefone": form_data.get("telefone"),
+        "cep": form_data.get("cep"),
+        "logradouro": form_data.get("logradouro"),
+        "numero_casa": form_data.get("numero_casa"),
+        "complemento": form_data.get("complemento"),
+        "bairro": form_data.get("bairro"),
+        "cidade_uf": form_data.get("cidade_uf"),
+        "nome_key": normalizar_texto(nome_cliente),
+        "telefone_key": normalizar_telefone(form_data.get("telefone")) or None,
+    }
+
+    # CASO 1: Um cliente existente foi selecionado e as alterações devem ser salvas no perfil
     if cliente_id_str and salvar_cliente_flag:
-        cliente_existente = session.get(Cliente, int(cliente_id_str))
-        if not cliente_existente or cliente_existente.user_id != current_user.id:
+        # UPDATE ... RETURNING: atualiza e confere o dono sem carregar o cliente antes
+        try:
+            cliente_id = (await session.exec(
+                update(Cliente)
+                .where(Cliente.id == int(cliente_id_str), Cliente.user_id == current_user.id)
+                .values(**dados_cliente)
+                .returning(Cliente.id)
+            )).scalar_one_or_none()
+        except IntegrityError:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=MSG_CLIENTE_DUPLICADO)
+        if cliente_id is None:
             raise HTTPException(status_code=404, detail="Cliente selecionado inválido.")
-        
-        # ATUALIZA os dados do cliente existente com o que veio do formulário
-        cliente_existente.nome = form_data.get("nome")
-        cliente_existente.telefone = form_data.get("telefone")
-        cliente_existente.cep = form_data.get("cep")
-        cliente_existente.logradouro = form_data.get("logradouro")
-        cliente_existente.numero_casa = form_data.get("numero_casa")
-        cliente_existente.complemento = form_data.get("complemento")
-        cliente_existente.bairro = form_data.get("bairro")
-        cliente_existente.cidade_uf = form_data.get("cidade_uf")
-
-        # Apaga os contatos antigos e recria com a nova lista (mesma lógica da tela de edição)
-        for contato in cliente_existente.contatos:
-            session.delete(contato)
-        
-        for contato_info in contatos_data:
-            session.add(Contato(
-                nome=contato_info['nome'],
-                telefone=contato_info['telefone'],
-                email=contato_info.get('email'),
-                cliente_id=cliente_existente.id
-            ))
-        
-        session.add(cliente_existente)
-        session.commit()
-            
-        session.refresh(cliente_existente)
-        
-        cliente_para_orcamento = cliente_existente
-        cliente_id_para_orcamento = cliente_existente.id
+
+        # Grava só a diferença entre os contatos do perfil e a lista do formulário
+        await sincronizar_contatos_async(session, Contato, cliente_id, contatos_data)
+        cliente_id_para_orcamento = cliente_id
 
     # CASO 2: Um cliente NOVO está sendo criado e salvo
     elif not cliente_id_str and nome_cliente and salvar_cliente_flag:
-        # --- INÍCIO DA CORREÇÃO ---
-        # 1. Verifica se um cliente com o mesmo nome já existe (ignorando maiúsculas/minúsculas)
-        statement = select(Cliente).where(
-            func.lower(Cliente.nome) == func.lower(nome_cliente),
-            Cliente.user_id == current_user.id
-        )
-        cliente_existente = session.exec(statement).first()
-
-        target_cliente = cliente_existente or Cliente(user_id=current_user.id)
-        
-        # 2. Atualiza os dados do cliente (seja ele novo ou existente) com os dados do formulário
-        target_cliente.nome = nome_cliente
-        target_cliente.telefone = form_data.get("telefone")
-        target_cliente.cep = form_data.get("cep")
-        target_cliente.logradouro = form_data.get("logradouro")
-        target_cliente.numero_casa = form_data.get("numero_casa")
-        target_cliente.complemento = form_data.get("complemento")
-        target_cliente.bairro = form_data.get("bairro")
-        target_cliente.cidade_uf = form_data.get("cidade_uf")
-
-        # Se o cliente já existia, carrega os contatos para poder limpá-los
-        if cliente_existente:
-             session.refresh(target_cliente, attribute_names=["contatos"])
-             for contato in target_cliente.contatos:
-                 session.delete(contato)
-
-        session.add(target_cliente)
-        session.commit()
-        session.refresh(target_cliente)
-
-        # 3. Adiciona os novos contatos (a lógica original)
-        for contato_info in contatos_data:
-            session.add(Contato(
-                nome=contato_info['nome'],
-                telefone=contato_info['telefone'],
-                email=contato_info.get('email'),
-                cliente_id=target_cliente.id
-            ))
-        
-        session.commit()
-        session.refresh(target_cliente)
-
-        cliente_para_orcamento = target_cliente
-        cliente_id_para_orcamento = target_cliente.id
+        # Um único INSERT ... ON CONFLICT: cria o cliente ou, se já existir um com o mesmo nome
+        # normalizado (sem acentos, maiúsculas ou espaços extras), atualiza os dados dele.
+        statement = insert_upsert(session, Cliente).values(user_id=current_user.id, **dados_cliente)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Cliente.user_id, Cliente.nome_key],
+            set_={campo: statement.excluded[campo] for campo in dados_cliente if campo != "nome_key"},
+        ).returning(Cliente.id)
+        cliente_id = (await session.exec(statement)).scalar_one()
+
+        # Contatos do cliente = lista do formulário (só a diferença vai ao banco)
+        await sincronizar_contatos_async(session, Contato, cliente_id, contatos_data)
+        cliente_id_para_orcamento = cliente_id
 
     # CASO 3: Um cliente existente foi selecionado, mas NENHUMA alteração foi feita/salva
     elif cliente_id_str:
-        cliente_para_orcamento = session.get(Cliente, int(cliente_id_str))
-        cliente_id_para_orcamento = cliente_para_orcamento.id     
+        cliente_id_para_orcamento = (await session.exec(
+            select(Cliente.id).where(Cliente.id == int(cliente_id_str), Cliente.user_id == current_user.id)
+        )).first()
+        if cliente_id_para_orcamento is None:
+            raise HTTPException(status_code=404, detail="Cliente selecionado inválido.")
 
     # --- LÓGICA DO ORÇAMENTO (como já estava)
     itens_data = json.loads(form_data.get("itens"))
@@ -411,9 +477,6 @@ async def salvar_orcamento_endpoint(
         observacoes=form_data.get("observacoes"),
     )
 
-    contatos_json = form_data.get("contatos", "[]") 
-    contatos_data = json.loads(contatos_json)
-
     for contato_info in contatos_data:
         contato_orc = ContatoOrcamento(
             nome=contato_info['nome'],
@@ -423,13 +486,18 @@ async def salvar_orcamento_endpoint(
         orcamento_db.contatos_extras.append(contato_orc)
 
     session.add(orcamento_db)
-    session.commit()
+    await session.flush()  # Gera o id do orçamento para as linhas de itens
+    await sincronizar_itens_orcamento(session, orcamento_db.id, current_user.id, itens_data, orcamento_novo=True)
+    await atualizar_resumo_async(session, None, contribuicao(orcamento_db))
 
     if current_user.contador_orcamento_override is not None:
-        current_user.contador_orcamento_override = None
-        session.add(current_user)
-        session.commit()
+        # O current_user pertence à sessão síncrona da autenticação, por isso o UPDATE direto
+        await session.exec(
+            update(User).where(User.id == current_user.id).values(contador_orcamento_override=None)
+        )
 
+    # A resposta é montada antes do commit para ser gravada junto com a chave de idempotência
+    conteudo = {"status": "success", "message": "Orçamento salvo com sucesso!"}
     admin_user_env = os.getenv("BASIC_AUTH_USER", "admin")
     # A verificação só se aplica se o usuário não for admin e não tiver plano vitalício
     if current_user.username != admin_user_env and not current_user.plano_ilimitado and current_user.data_expiracao:
@@ -438,19 +506,26 @@ async def salvar_orcamento_endpoint(
         # Se faltam 3 dias ou menos para expirar, envia uma resposta de "sucesso com aviso"
         if 0 <= dias_restantes <= 3:
             pix_message = "Para renovar, pague o valor e contate o administrador. Chave PIX (Celular): 19971351371. Valor: R$ 100,00."
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "status": "warning", 
-                    "message": f"Orçamento salvo! Atenção: seu acesso expira em {dias_restantes + 1} dia(s). {pix_message}"
-                }
-            )
+            conteudo = {
+                "status": "warning", 
+                "message": f"Orçamento salvo! Atenção: seu acesso expira em {dias_restantes + 1} dia(s). {pix_message}"
+            }
 
-    # Se não houver aviso, envia a resposta de sucesso padrão
-    return JSONResponse(
-        status_code=200,
-        content={"status": "success", "message": "Orçamento salvo com sucesso!"}
-    )
+    try:
+        if idempotency_key:
+            await registrar_resposta(session, current_user.id, idempotency_key, 200, conteudo)
+        await session.commit()
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        # Outra requisição com a mesma chave terminou antes: descarta esta e devolve a resposta dela
+        await session.rollback()
+        resposta_salva = await buscar_resposta_salva(session, current_user.id, idempotency_key)
+        if not resposta_salva:
+            raise
+        return resposta_salva
+
+    return JSONResponse(status_code=200, content=conteudo)
 
 # Função para atualizar a data de expiração após pagamento
 def atualizar_data_expiracao(user: User, session: Session):
@@ -459,46 +534,44 @@ def atualizar_data_expiracao(user: User, session: Session):
     session.add(user)
     session.commit()
 
+def totais_por_tipo():
+    """Colunas de soma (quantidade x valor) por tipo, para agregar as linhas de OrcamentoItem."""
+    subtotal = OrcamentoItem.quantidade * OrcamentoItem.valor
+    return (
+        func.coalesce(func.sum(case((OrcamentoItem.tipo == "servico", subtotal), else_=0)), 0).label("total_servicos"),
+        func.coalesce(func.sum(case((OrcamentoItem.tipo == "material", subtotal), else_=0)), 0).label("total_materiais"),
+    )
+
+
 @app.get("/api/orcamentos/")
 def listar_orcamentos_api(
     user: User = Depends(get_current_user), 
     session: Session = Depends(get_db_session)
 ):
+    # Os totais de serviços e materiais saem de um único GROUP BY sobre as linhas de itens
     statement = (
-        select(Orcamento)
+        select(
+            Orcamento.id, Orcamento.numero, Orcamento.nome_cliente, Orcamento.data_emissao,
+            Orcamento.total_geral, Orcamento.telefone_cliente, *totais_por_tipo(),
+        )
+        .outerjoin(OrcamentoItem, OrcamentoItem.orcamento_id == Orcamento.id)
         .where(Orcamento.user_id == user.id)
+        .group_by(Orcamento.id)
         .order_by(Orcamento.id.desc())
     )
-    orcamentos = session.exec(statement).all()
-    resultado = []
-    for o in orcamentos:
-        
-        # --- LÓGICA DE CÁLCULO ADICIONADA ---
-        total_servicos = 0
-        total_materiais = 0
-        # O campo 'itens' é um JSON, então o tratamos como um dicionário
-        for item in o.itens:
-            # Garantimos que os campos existem e são numéricos
-            quantidade = int(item.get('quantidade', 0))
-            valor = float(item.get('valor', 0))
-            
-            if item.get('tipo') == 'servico':
-                total_servicos += quantidade * valor
-            elif item.get('tipo') == 'material':
-                total_materiais += quantidade * valor
-        # --- FIM DA LÓGICA ---
-        
-        resultado.append({
+    return [
+        {
             "id": o.id,
             "numero": o.numero,
             "nome": o.nome_cliente,
             "data_emissao": o.data_emissao,
             "total_geral": o.total_geral,
             "telefone": o.telefone_cliente,
-            "total_servicos": total_servicos,       # <- Novo campo
-            "total_materiais": total_materiais,     # <- Novo campo
-        })
-    return resultado
+            "total_servicos": o.total_servicos,
+            "total_materiais": o.total_materiais,
+        }
+        for o in session.exec(statement).all()
+    ]
 
 @app.get("/api/orcamento-detalhes/{orcamento_id}")
 def get_orcamento_detalhes(
@@ -507,33 +580,109 @@ def get_orcamento_detalhes(
     session: Session = Depends(get_db_session)
 ):
     """ Busca os detalhes de um único orçamento para garantir dados atualizados. """
-    orcamento = session.get(Orcamento, orcamento_id)
+    statement = (
+        select(Orcamento.id, Orcamento.numero, Orcamento.total_geral, *totais_por_tipo())
+        .outerjoin(OrcamentoItem, OrcamentoItem.orcamento_id == Orcamento.id)
+        .where(Orcamento.id == orcamento_id, Orcamento.user_id == user.id)
+        .group_by(Orcamento.id)
+    )
+    orcamento = session.exec(statement).first()
     
-    if not orcamento or orcamento.user_id != user.id:
+    if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado.")
-    
-    # Reutilizamos a mesma lógica de cálculo da lista para consistência
-    total_servicos = 0
-    total_materiais = 0
-    for item in orcamento.itens:
-        quantidade = int(item.get('quantidade', 0))
-        valor = float(item.get('valor', 0))
-        if item.get('tipo') == 'servico':
-            total_servicos += quantidade * valor
-        elif item.get('tipo') == 'material':
-            total_materiais += quantidade * valor
             
     return {
         "id": orcamento.id,
         "numero": orcamento.numero,
         "total_geral": orcamento.total_geral,
-        "total_servicos": total_servicos,
-        "total_materiais": total_materiais,
+        "total_servicos": orcamento.total_servicos,
+        "total_materiais": orcamento.total_materiais,
+    }
+
+@app.get("/api/orcamento-itens/resumo")
+def resumo_itens_orcados(
+    tipo: Optional[str] = Query(default=None, pattern="^(servico|material)$"),
+    item_id: Optional[int] = Query(default=None, description="Só as linhas ligadas a este item do catálogo"),
+    limite: int = Query(default=50, ge=1, le=500),
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Quanto foi orçado de cada serviço/material: em quantos orçamentos aparece,
+    quantidade somada e valor total (quantidade x valor), do maior para o menor.
+    """
+    total = func.sum(OrcamentoItem.quantidade * OrcamentoItem.valor)
+    statement = (
+        select(
+            OrcamentoItem.tipo,
+            OrcamentoItem.nome,
+            func.count(func.distinct(OrcamentoItem.orcamento_id)).label("orcamentos"),
+            func.sum(OrcamentoItem.quantidade).label("quantidade"),
+            total.label("total"),
+        )
+        .join(Orcamento, Orcamento.id == OrcamentoItem.orcamento_id)
+        .where(Orcamento.user_id == user.id)
+        .group_by(OrcamentoItem.tipo, OrcamentoItem.nome)
+        .order_by(total.desc())
+        .limit(limite)
+    )
+    if tipo:
+        statement = statement.where(OrcamentoItem.tipo == tipo)
+    if item_id is not None:
+        statement = statement.where(OrcamentoItem.item_id == item_id)
+    return [linha._asdict() for linha in session.exec(statement).all()]
+
+
+@app.get("/api/dashboard/")
+def dashboard_api(
+    meses: int = Query(default=12, ge=1, le=120, description="Quantos meses (os mais recentes) devolver"),
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Visão geral do negócio: faturamento e quantidade por mês, por status,
+    ticket médio e divisão serviços/materiais. Lê só a tabela ResumoMensal,
+    então não depende de quantos orçamentos o usuário tem.
+    """
+    linhas = session.exec(
+        select(ResumoMensal).where(ResumoMensal.user_id == user.id, ResumoMensal.quantidade > 0)
+    ).all()
+
+    def totais(grupo):
+        quantidade = sum(l.quantidade for l in grupo)
+        total_geral = sum(l.total_geral for l in grupo)
+        return {
+            "quantidade": quantidade,
+            "total_geral": round(total_geral, 2),
+            "total_servicos": round(sum(l.total_servicos for l in grupo), 2),
+            "total_materiais": round(sum(l.total_materiais for l in grupo), 2),
+            "ticket_medio": round(total_geral / quantidade, 2) if quantidade else 0,
+        }
+
+    por_mes, por_status = {}, {}
+    for linha in linhas:
+        por_mes.setdefault(linha.mes, []).append(linha)
+        por_status.setdefault(linha.status, []).append(linha)
+    meses_recentes = sorted(por_mes, reverse=True)[:meses]
+
+    return {
+        "geral": totais(linhas),
+        "por_mes": [{"mes": mes, **totais(por_mes[mes])} for mes in sorted(meses_recentes)],
+        "por_status": [{"status": s, **totais(grupo)} for s, grupo in sorted(por_status.items())],
     }
 
 
 # --- ROTAS DA API PARA ITENS DE CATÁLOGO ---
-@app.post("/api/item/", response_model=Item, status_code=status.HTTP_201_CREATED)
+class ItemCatalogo(BaseModel):
+    """Item como as rotas do catálogo devolvem: sem a coluna interna nome_busca."""
+    id: int
+    tipo: str
+    nome: str
+    valor: float
+    ncm: Optional[str] = None
+    user_id: Optional[int] = None
+
+@app.post("/api/item/", response_model=ItemCatalogo, status_code=status.HTTP_201_CREATED)
 def create_item(
     item: Item,
     current_user: User = Depends(get_current_user),
@@ -545,35 +694,129 @@ def create_item(
         Item.user_id == current_user.id
     )
     existing_item = session.exec(statement).first()
+    item_duplicado = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"O item '{item.nome}' já existe no catálogo de {item.tipo}s."
+    )
 
     if existing_item:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"O item '{item.nome}' já existe no catálogo de {item.tipo}s."
-        )
+        raise item_duplicado
 
     item.user_id = current_user.id
     session.add(item)
-    session.commit()
+    try:
+        marcar_catalogo_alterado(session, current_user.id)
+        session.commit()
+    except IntegrityError:
+        # Outra requisição criou o mesmo item depois da verificação acima (índice único)
+        session.rollback()
+        raise item_duplicado
     session.refresh(item)
+    invalidar_catalogo(current_user.id)
     return item
 
 
+def marcar_catalogo_alterado(session: Session, user_id: int):
+    """Sobe a revisão do catálogo do usuário; chamar na mesma transação que altera os itens."""
+    session.exec(update(User).where(User.id == user_id).values(catalogo_revisao=User.catalogo_revisao + 1))
+
+
+def versao_catalogo(session: Session, user_id: int) -> str:
+    """Versão atual do catálogo, lida do banco: a mesma em todos os workers e reinícios."""
+    revisao = session.exec(select(User.catalogo_revisao).where(User.id == user_id)).first()
+    return str(revisao or 0)
+
+
+def obter_catalogo(session: Session, user_id: int, versao: Optional[str] = None):
+    """
+    Retorna (catalogo, corpo_json) do usuário, vindo do cache em memória quando possível.
+    O cache é por worker: a entrada só vale se foi montada na versão que está no banco
+    (outro worker pode ter alterado o catálogo). Uma única consulta traz serviços e materiais.
+    """
+    versao = versao or versao_catalogo(session, user_id)
+    em_cache = catalogo_cache.get(user_id)
+    if em_cache is not None and em_cache[0]["versao"] == versao:
+        return em_cache
+
+    itens = session.exec(select(Item).where(Item.user_id == user_id).order_by(Item.id)).all()
+    servicos = [i.model_dump(exclude={"nome_busca"}) for i in itens if i.tipo == "servico"]
+    materiais = [i.model_dump(exclude={"nome_busca"}) for i in itens if i.tipo == "material"]
+    catalogo = {"versao": versao, "servicos": servicos, "materiais": materiais}
+
+    em_cache = (catalogo, json.dumps(catalogo, default=str).encode())
+    catalogo_cache.set(user_id, em_cache)
+    return em_cache
+
+@app.get("/api/catalogo/")
+def read_catalogo(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Serviços e materiais em uma única resposta, com ETag = versão do catálogo.
+    O navegador/service worker revalida com If-None-Match e recebe 304 se nada mudou.
+    """
+    versao = versao_catalogo(session, current_user.id)
+    etag = f'"{versao}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    # A versão vem do banco: o 304 sai sem montar o catálogo, em qualquer worker
+    etags_cliente = [e.strip().removeprefix("W/") for e in request.headers.get("if-none-match", "").split(",")]
+    if etag in etags_cliente:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    _, corpo = obter_catalogo(session, current_user.id, versao)
+    return Response(content=corpo, media_type="application/json", headers=headers)
 
-@app.get("/api/servico/", response_model=List[Item])
+@app.get("/api/servico/", response_model=List[ItemCatalogo])
 def read_servicos(current_user: User = Depends(get_current_user),
     session: Session = Depends(get_db_session)
 ):
     
-    statement = select(Item).where(Item.tipo == "servico", Item.user_id == current_user.id)
-    return session.exec(statement).all()
+    catalogo, _ = obter_catalogo(session, current_user.id)
+    return catalogo["servicos"]
 
-@app.get("/api/materiais/", response_model=List[Item])
+@app.get("/api/materiais/", response_model=List[ItemCatalogo])
 def read_materiais(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_db_session)
 ):
-    statement = select(Item).where(Item.tipo == "material", Item.user_id == current_user.id)
+    catalogo, _ = obter_catalogo(session, current_user.id)
+    return catalogo["materiais"]
+
+@app.get("/api/catalogo/busca", response_model=List[ItemCatalogo])
+def buscar_catalogo(
+    q: str = Query(..., min_length=1),
+    tipo: Optional[str] = Query(None),
+    limite: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Busca do seletor de itens (digitar e ir filtrando), por nome ou NCM.
+    Compara contra o nome normalizado, então 'tubulacao' encontra 'Tubulação'.
+    Ordem: nome começa com o termo, depois alguma palavra começa com ele, depois só contém.
+    """
+    termo = normalizar_texto(q)
+    if not termo:
+        return []
+
+    comeca_com = Item.nome_busca.startswith(termo, autoescape=True)
+    palavra_comeca_com = Item.nome_busca.contains(" " + termo, autoescape=True)
+    condicoes = [comeca_com, palavra_comeca_com]
+    # Abaixo de 3 letras o "contém" devolve quase tudo e não aproveita o índice trigram
+    if len(termo) >= 3:
+        condicoes.append(Item.nome_busca.contains(termo, autoescape=True))
+    # Termo só com números/pontos é tratado também como prefixo de NCM
+    if somente_digitos(termo) and not termo.strip("0123456789."):
+        condicoes.append(Item.ncm.startswith(termo, autoescape=True))
+
+    relevancia = case((comeca_com, 0), (palavra_comeca_com, 1), else_=2)
+    statement = select(Item).where(Item.user_id == current_user.id, or_(*condicoes))
+    if tipo:
+        statement = statement.where(Item.tipo == tipo)
+    statement = statement.order_by(relevancia, func.length(Item.nome_busca), Item.nome_busca).limit(limite)
     return session.exec(statement).all()
 
 @app.delete("/api/item/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -582,41 +825,126 @@ def delete_item(item_id: int):
         item = session.get(Item, item_id)
         if not item:
             raise HTTPException(status_code=404, detail="Item não encontrado")
+        dono_id = item.user_id
         session.delete(item)
+        if dono_id is not None:
+            marcar_catalogo_alterado(session, dono_id)
         session.commit()
+        invalidar_catalogo(dono_id)
         return
+
+@app.post("/api/item/importar")
+def importar_itens(
+    arquivo: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Importa o catálogo a partir de uma planilha CSV/XLSX com as colunas tipo, nome, valor e ncm (opcional).
+    As linhas são lidas em fluxo e gravadas em lotes com INSERT ... ON CONFLICT: um item com o
+    mesmo tipo e nome (sem diferenciar maiúsculas) tem valor e NCM atualizados em vez de duplicado.
+    Linhas inválidas não interrompem a importação; voltam no relatório de erros.
+    """
+    if not (arquivo.filename or "").lower().endswith((".csv", ".xlsx")):
+        raise HTTPException(status_code=400, detail="Envie um arquivo .csv ou .xlsx.")
+
+    erros = []
+    total_linhas = 0
+    importados = 0
+
+    def linhas_validas():
+        nonlocal total_linhas
+        for numero, linha in iterar_linhas_planilha(arquivo.file, arquivo.filename):
+            total_linhas += 1
+            try:
+                yield numero, validar_linha_item(linha)
+            except LinhaInvalida as e:
+                erros.append({"linha": numero, "erro": str(e)})
+
+    try:
+        for lote in em_lotes(linhas_validas()):
+            # A mesma chave duas vezes no mesmo INSERT quebra o ON CONFLICT: a última linha vence
+            por_chave = {}
+            for numero, dados in lote:
+                chave = (dados["tipo"], dados["nome"].lower())
+                if chave in por_chave:
+                    erros.append({"linha": por_chave[chave][0], "erro": f"Item repetido no arquivo; substituído pela linha {numero}."})
+                    dados["ncm"] = dados["ncm"] or por_chave[chave][1]["ncm"]
+                por_chave[chave] = (numero, dados)
+
+            # Insert em massa não dispara os eventos do ORM, então o nome_busca é calculado aqui
+            valores = [
+                {**dados, "user_id": current_user.id, "nome_busca": normalizar_texto(dados["nome"])}
+                for _, dados in por_chave.values()
+            ]
+            statement = insert_upsert(session, Item).values(valores)
+            statement = statement.on_conflict_do_update(
+                index_elements=[Item.user_id, Item.tipo, func.lower(Item.nome)],
+                set_={
+                    "nome": statement.excluded.nome,
+                    "nome_busca": statement.excluded.nome_busca,
+                    "valor": statement.excluded.valor,
+                    "ncm": func.coalesce(statement.excluded.ncm, Item.ncm),
+                },
+            )
+            session.exec(statement)
+            importados += len(valores)
+    except LinhaInvalida as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnicodeDecodeError:
+        session.rollback()
+        raise HTTPException(status_code=400, detail="Não foi possível ler o arquivo. Salve o CSV com codificação UTF-8.")
+
+    if importados:
+        marcar_catalogo_alterado(session, current_user.id)
+    session.commit()
+    invalidar_catalogo(current_user.id)
+
+    return {
+        "total_linhas": total_linhas,
+        "importados": importados,
+        "erros": sorted(erros, key=lambda e: e["linha"]),
+    }
     
 @app.get("/orcamento/{orcamento_id}/pdf", response_class=StreamingResponse)
 async def gerar_e_salvar_pdf_protegido(
     orcamento_id: int,
     status: str = Query("Orçamento"), 
-    session: Session = Depends(get_db_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ):
     """
     ESTA ROTA É PROTEGIDA. Apenas o usuário logado pode gerar/regenerar o PDF e o token.
     """
-    statement = select(Orcamento).where(Orcamento.id == orcamento_id, Orcamento.user_id == current_user.id)
-    orcamento = session.exec(statement).first()
+    statement = (
+        select(Orcamento)
+        .options(selectinload(Orcamento.cliente))
+        .where(Orcamento.id == orcamento_id, Orcamento.user_id == current_user.id)
+    )
+    orcamento = (await session.exec(statement)).first()
 
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado.")
     
+    contribuicao_anterior = contribuicao(orcamento)
     orcamento.status = status 
     
     # GARANTE QUE UM TOKEN SECRETO E ÚNICO SEMPRE EXISTA
     if not orcamento.token_visualizacao:
         orcamento.token_visualizacao = secrets.token_urlsafe(16)
         session.add(orcamento)
-        session.commit()
-        session.refresh(orcamento)
+        # O novo status só é gravado junto com o token, então o resumo só muda aqui
+        await atualizar_resumo_async(session, contribuicao_anterior, contribuicao(orcamento))
+        await session.commit()
         
-    user = session.get(User, orcamento.user_id)
-    template_name = user.pdf_template_name
-    pdf_function = PDF_GENERATORS.get(template_name, PDF_GENERATORS["default"])
+    # O orçamento já foi filtrado pelo dono, então o modelo é o do usuário logado
+    template_name = current_user.pdf_template_name
+    pdf_function = registro_pdf.obter(template_name)
     
+    # A geração do PDF é CPU-bound: roda no threadpool para não travar o event loop
     pdf_buffer = io.BytesIO()
-    pdf_function(file_path=pdf_buffer, orcamento=orcamento)
+    await run_in_threadpool(pdf_function, file_path=pdf_buffer, orcamento=orcamento)
     pdf_bytes = pdf_buffer.getvalue()
 
     nome_arquivo = f"{orcamento.status.replace(' ', '_')}_{orcamento.numero}.pdf"
@@ -650,7 +978,7 @@ async def gerar_pdf_relatorio_custo_endpoint(
          raise HTTPException(status_code=400, detail="A análise de custo para este orçamento ainda não foi preenchida.")
 
     pdf_buffer = io.BytesIO()
-    gerar_pdf_relatorio_custo(file_path=pdf_buffer, orcamento=orcamento)
+    registro_pdf.obter("relatorio_custo")(file_path=pdf_buffer, orcamento=orcamento)
     pdf_bytes = pdf_buffer.getvalue()
 
     nome_arquivo = f"Relatorio_Custo_Orc_{orcamento.numero}.pdf"
@@ -675,7 +1003,7 @@ async def get_pdf_publico(token: str, status: str = Query("Orçamento"), session
 
     user = session.get(User, orcamento.user_id)
     template_name = user.pdf_template_name
-    pdf_function = PDF_GENERATORS.get(template_name, PDF_GENERATORS["default"])
+    pdf_function = registro_pdf.obter(template_name)
 
     pdf_buffer = io.BytesIO()
     pdf_function(file_path=pdf_buffer, orcamento=orcamento)
@@ -696,7 +1024,7 @@ def gerar_link_whatsapp(
     session: Session = Depends(get_db_session),
     current_user: User = Depends(get_current_user)
 ):
-    print("STATUS RECEBIDO NO BACKEND:", status)
+    logger.debug("Status do documento recebido: %s", status, extra={"orcamento_id": orcamento_id})
     
     orcamento = session.get(Orcamento, orcamento_id)
     if not orcamento or orcamento.user_id != current_user.id:
@@ -752,8 +1080,9 @@ async def editar_orcamento_page(
     
     # O resto do seu código já estava correto
     return templates.TemplateResponse(
+        request,
         "editar_orcamento.html", 
-        {"request": request, "user": current_user, "orcamento": orcamento, "show_fechamento": show_fechamento_for(current_user),"tem_funcao_analise_custo": current_user.tem_funcao_analise_custo}
+        {"user": current_user, "orcamento": orcamento, "show_fechamento": show_fechamento_for(current_user),"tem_funcao_analise_custo": current_user.tem_funcao_analise_custo}
     )
 
 # SUBSTITUA A FUNÇÃO ATUALIZAR INTEIRA POR ESTA:
@@ -763,21 +1092,22 @@ async def editar_orcamento_page(
 async def atualizar_orcamento_submit(
     request: Request,
     orcamento_id: int,
-    session: Session = Depends(get_db_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(verify_action_permission)
 ):
     form_data = await request.form()
     
-    orcamento_db = session.exec(
+    orcamento_db = (await session.exec(
         select(Orcamento).options(
             selectinload(Orcamento.contatos_extras), 
             selectinload(Orcamento.cliente).selectinload(Cliente.contatos)
         )
         .where(Orcamento.id == orcamento_id, Orcamento.user_id == current_user.id)
-    ).first()
+    )).first()
     
     if not orcamento_db:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado para atualizar")
+    contribuicao_anterior = contribuicao(orcamento_db)
 
     # --- INÍCIO DA REESTRUTURAÇÃO ---
 
@@ -805,18 +1135,14 @@ async def atualizar_orcamento_submit(
         cliente.bairro = form_data.get("bairro")
         cliente.cidade_uf = form_data.get("cidade_uf")
         
-        # AQUI ESTÁ A MUDANÇA CRÍTICA:
-        # Em vez de ler do formulário, nós atualizamos o perfil do cliente com os dados do formulário
-        # mas a lista de contatos do orçamento será sincronizada a partir do perfil JÁ ATUALIZADO.
-        # Nós NÃO lemos mais a lista de contatos do formulário para o perfil.
-        contatos_data = json.loads(form_data.get("contatos", "[]"))
-        cliente.contatos.clear()
-        for c_info in contatos_data:
-            cliente.contatos.append(Contato(nome=c_info['nome'], telefone=c_info['telefone'], email=c_info.get('email')))
-        
+        # A lista do formulário passa a ser a do perfil, e a do orçamento é copiada do perfil JÁ ATUALIZADO.
+        # A gravação (só da diferença) acontece no commit único do fim.
+        contatos_perfil = json.loads(form_data.get("contatos", "[]"))
         session.add(cliente)
-        session.commit()
-        session.refresh(cliente) # Garante que temos os dados mais recentes do cliente na sessão
+    elif orcamento_db.cliente:
+        contatos_perfil = [{campo: getattr(c, campo) for campo in CAMPOS_CONTATO} for c in orcamento_db.cliente.contatos]
+    else:
+        contatos_perfil = []
 
     # 3. Atualiza os dados do orçamento (itens, totais, etc.)
     orcamento_db.numero = form_data.get("numero_orcamento").strip()
@@ -829,22 +1155,29 @@ async def atualizar_orcamento_submit(
     orcamento_db.garantia = form_data.get("garantia")
     orcamento_db.observacoes = form_data.get("observacoes")
 
-    # 4. SINCRONIZAÇÃO FINAL: Limpa os contatos do orçamento e recopia a partir do perfil do cliente (a fonte da verdade)
-    orcamento_db.contatos_extras.clear()
-    if orcamento_db.cliente:
-        for contato_do_perfil in orcamento_db.cliente.contatos:
-            orcamento_db.contatos_extras.append(
-                ContatoOrcamento(
-                    nome=contato_do_perfil.nome,
-                    telefone=contato_do_perfil.telefone,
-                    email=contato_do_perfil.email
-                )
-            )
-
     # --- FIM DA REESTRUTURAÇÃO ---
     
     session.add(orcamento_db)
-    session.commit()
+    try:
+        # Um único flush + commit para cliente, contatos, orçamento, itens e resumo
+        await session.flush()
+        if orcamento_db.cliente and salvar_cliente_flag:
+            await sincronizar_contatos_async(
+                session, Contato, orcamento_db.cliente.id, contatos_perfil, existentes=orcamento_db.cliente.contatos
+            )
+        # 4. SINCRONIZAÇÃO FINAL: os contatos do orçamento ficam iguais aos do perfil do cliente (a fonte da verdade).
+        # Os ids do perfil não valem para ContatoOrcamento, então a correspondência é pelo telefone.
+        await sincronizar_contatos_async(
+            session, ContatoOrcamento, orcamento_db.id,
+            [{campo: c.get(campo) for campo in CAMPOS_CONTATO} for c in contatos_perfil],
+            existentes=orcamento_db.contatos_extras,
+        )
+        await sincronizar_itens_orcamento(session, orcamento_db.id, current_user.id, itens_data)
+        await atualizar_resumo_async(session, contribuicao_anterior, contribuicao(orcamento_db))
+        await session.commit()
+    except IntegrityError:
+        # Só acontece quando o cliente foi renomeado para o nome de outro cliente
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=MSG_CLIENTE_DUPLICADO)
     
     # ... (resto da função de aviso de expiração) ...
     admin_user_env = os.getenv("BASIC_AUTH_USER", "admin")
@@ -867,6 +1200,155 @@ async def atualizar_orcamento_submit(
     )
     
 
+class ItemOrcamentoPatch(BaseModel):
+    tipo: Optional[Literal["servico", "material"]] = None
+    nome: Optional[str] = None
+    # Quantidade inteira, como no formulário e no total_geral (subtotal_item)
+    quantidade: Optional[int] = Field(None, gt=0)
+    valor: Optional[float] = Field(None, ge=0)
+    unidade: Optional[str] = None
+    ncm: Optional[str] = None
+    topicos: Optional[List[str]] = None
+
+class OperacaoItemOrcamento(BaseModel):
+    operacao: Literal["adicionar", "atualizar", "remover"]
+    posicao: Optional[int] = None  # "adicionar" sem posição coloca o item no fim
+    item: Optional[ItemOrcamentoPatch] = None
+
+class OrcamentoPatch(BaseModel):
+    numero: Optional[str] = None
+    descricao_servico: Optional[str] = None
+    condicao_pagamento: Optional[str] = None
+    prazo_entrega: Optional[str] = None
+    garantia: Optional[str] = None
+    observacoes: Optional[str] = None
+    status: Optional[str] = None
+    nome_cliente: Optional[str] = None
+    telefone_cliente: Optional[str] = None
+    cep_cliente: Optional[str] = None
+    logradouro_cliente: Optional[str] = None
+    numero_casa_cliente: Optional[str] = None
+    complemento_cliente: Optional[str] = None
+    bairro_cliente: Optional[str] = None
+    cidade_uf_cliente: Optional[str] = None
+    itens: List[OperacaoItemOrcamento] = []
+
+# Colunas NOT NULL: no PATCH, null ou texto vazio nelas é recusado (o resto aceita null)
+CAMPOS_OBRIGATORIOS_ORCAMENTO = ("numero", "descricao_servico")
+CAMPOS_OBRIGATORIOS_ITEM = ("tipo", "nome", "quantidade", "valor")
+
+def _campos_vazios(campos: dict, obrigatorios) -> List[str]:
+    return [c for c in obrigatorios if c in campos and (campos[c] is None or str(campos[c]).strip() == "")]
+
+def subtotal_item(item: dict) -> float:
+    # Mesma conta do total_geral ao salvar: quantidade inteira x valor
+    return int(item.get('quantidade', 0)) * float(item.get('valor', 0))
+
+@app.patch("/api/orcamentos/{orcamento_id}")
+async def editar_orcamento_parcial(
+    orcamento_id: int,
+    dados: OrcamentoPatch,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(verify_action_permission)
+):
+    """
+    Edição parcial: recebe só os campos alterados e operações por item
+    (adicionar/atualizar/remover o item de uma posição). O total é ajustado pela
+    diferença dos itens mexidos, e só as colunas e linhas de itens afetadas são gravadas.
+    """
+    orcamento_db = (await session.exec(
+        select(Orcamento).where(Orcamento.id == orcamento_id, Orcamento.user_id == current_user.id)
+    )).first()
+    if not orcamento_db:
+        raise HTTPException(status_code=404, detail="Orçamento não encontrado.")
+    contribuicao_anterior = contribuicao(orcamento_db)
+
+    # Campos simples: o ORM só inclui no UPDATE as colunas que realmente mudaram
+    campos_orcamento = dados.model_dump(exclude_unset=True, exclude={"itens"})
+    vazios = _campos_vazios(campos_orcamento, CAMPOS_OBRIGATORIOS_ORCAMENTO)
+    if vazios:
+        raise HTTPException(status_code=400, detail=f"Não podem ficar vazios: {', '.join(vazios)}.")
+    for campo, valor in campos_orcamento.items():
+        setattr(orcamento_db, campo, valor.strip() if campo == "numero" else valor)
+
+    itens = [dict(item) for item in orcamento_db.itens or []]
+    total_geral = orcamento_db.total_geral or 0
+    linhas = OrcamentoItem.orcamento_id == orcamento_id
+    religar_catalogo = False
+
+    for numero_op, op in enumerate(dados.itens, start=1):
+        campos = op.item.model_dump(exclude_unset=True) if op.item else {}
+        posicao = op.posicao
+
+        if op.operacao == "adicionar":
+            posicao = len(itens) if posicao is None else posicao
+            if not 0 <= posicao <= len(itens):
+                raise HTTPException(status_code=400, detail=f"Operação {numero_op}: posição inválida.")
+            faltando = _campos_vazios({c: campos.get(c) for c in CAMPOS_OBRIGATORIOS_ITEM}, CAMPOS_OBRIGATORIOS_ITEM)
+            if faltando:
+                raise HTTPException(status_code=400, detail=f"Operação {numero_op}: informe {', '.join(faltando)}.")
+            novo_item = {k: v for k, v in campos.items() if v is not None}
+            itens.insert(posicao, novo_item)
+            total_geral += subtotal_item(novo_item)
+
+            if posicao < len(itens) - 1:  # Abre espaço empurrando os itens seguintes
+                await session.exec(
+                    update(OrcamentoItem).where(linhas, OrcamentoItem.posicao >= posicao)
+                    .values(posicao=OrcamentoItem.posicao + 1)
+                )
+            linha = montar_linhas_itens(orcamento_id, [novo_item])[0]
+            linha["posicao"] = posicao
+            await session.exec(insert(OrcamentoItem).values(**linha))
+            religar_catalogo = True
+            continue
+
+        if posicao is None or not 0 <= posicao < len(itens):
+            raise HTTPException(status_code=400, detail=f"Operação {numero_op}: posição inválida.")
+
+        if op.operacao == "remover":
+            removido = itens.pop(posicao)
+            total_geral -= subtotal_item(removido)
+            await session.exec(delete(OrcamentoItem).where(linhas, OrcamentoItem.posicao == posicao))
+            if posicao < len(itens):
+                await session.exec(
+                    update(OrcamentoItem).where(linhas, OrcamentoItem.posicao > posicao)
+                    .values(posicao=OrcamentoItem.posicao - 1)
+                )
+
+        else:  # atualizar
+            if not campos:
+                continue
+            vazios = _campos_vazios(campos, CAMPOS_OBRIGATORIOS_ITEM)
+            if vazios:
+                raise HTTPException(status_code=400, detail=f"Operação {numero_op}: {', '.join(vazios)} não pode ficar vazio.")
+            antigo = itens[posicao]
+            atualizado = {**antigo, **campos}
+            itens[posicao] = atualizado
+            total_geral += subtotal_item(atualizado) - subtotal_item(antigo)
+
+            valores = dict(campos)
+            if "quantidade" in valores:
+                valores["quantidade"] = float(valores["quantidade"] or 0)
+            if "valor" in valores:
+                valores["valor"] = float(valores["valor"] or 0)
+            if "tipo" in campos or "nome" in campos:
+                valores["item_id"] = None  # Religado ao catálogo no fim
+                religar_catalogo = True
+            await session.exec(update(OrcamentoItem).where(linhas, OrcamentoItem.posicao == posicao).values(**valores))
+
+    if dados.itens:
+        orcamento_db.itens = itens  # Lista nova: o JSON só é regravado se houve operação de item
+        orcamento_db.total_geral = total_geral
+
+    if religar_catalogo:
+        await ligar_itens_ao_catalogo(session, current_user.id, linhas, OrcamentoItem.item_id.is_(None))
+
+    await atualizar_resumo_async(session, contribuicao_anterior, contribuicao(orcamento_db))
+    await session.commit()
+
+    return {"id": orcamento_db.id, "total_geral": orcamento_db.total_geral, "quantidade_itens": len(orcamento_db.itens or [])}
+
+
 @app.delete("/api/orcamentos/{orcamento_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_orcamento(
     orcamento_id: int, 
@@ -881,10 +1363,117 @@ def deletar_orcamento(
     if orcamento.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado")
         
+    atualizar_resumo(session, contribuicao(orcamento), None)
     session.delete(orcamento)
     session.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+class OperacaoLoteOrcamentos(BaseModel):
+    ids: List[int]
+    operacao: Literal["excluir", "alterar_status", "duplicar"]
+    status: Optional[str] = None  # Obrigatório para "alterar_status"
+
+MAX_ORCAMENTOS_POR_LOTE = 500
+
+# Campos que NÃO são copiados ao duplicar: o clone é um orçamento novo, com número, datas e link próprios
+CAMPOS_NAO_DUPLICADOS = {"id", "numero", "data_emissao", "data_validade", "pdf_url", "token_visualizacao", "status"}
+
+@app.post("/api/orcamentos/lote")
+def operacao_em_lote_orcamentos(
+    dados: OperacaoLoteOrcamentos,
+    current_user: User = Depends(verify_action_permission),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Exclui, muda o status ou duplica vários orçamentos de uma vez.
+    Tudo roda em SQL por conjunto (sem um comando por orçamento) numa única transação,
+    e o filtro pelo dono vai no próprio comando: ids de outros usuários são ignorados.
+    """
+    ids = list(dict.fromkeys(dados.ids))
+    if not ids or len(ids) > MAX_ORCAMENTOS_POR_LOTE:
+        raise HTTPException(status_code=400, detail=f"Informe de 1 a {MAX_ORCAMENTOS_POR_LOTE} orçamentos.")
+    novo_status = (dados.status or "").strip()
+    if dados.operacao == "alterar_status" and not novo_status:
+        raise HTTPException(status_code=400, detail="Informe o novo status.")
+
+    dos_ids = (Orcamento.id.in_(ids)) & (Orcamento.user_id == current_user.id)
+    ids_do_usuario = select(Orcamento.id).where(dos_ids)
+    resultado = {"operacao": dados.operacao}
+
+    if dados.operacao == "excluir":
+        ajustar_resumo_em_massa(session, dos_ids, -1)
+        session.exec(delete(OrcamentoItem).where(OrcamentoItem.orcamento_id.in_(ids_do_usuario)))
+        session.exec(delete(ContatoOrcamento).where(ContatoOrcamento.orcamento_id.in_(ids_do_usuario)))
+        afetados = session.exec(delete(Orcamento).where(dos_ids)).rowcount
+
+    elif dados.operacao == "alterar_status":
+        # Tira a contribuição com o status antigo e soma de novo com o novo
+        ajustar_resumo_em_massa(session, dos_ids, -1)
+        afetados = session.exec(update(Orcamento).where(dos_ids).values(status=novo_status)).rowcount
+        ajustar_resumo_em_massa(session, dos_ids, 1)
+
+    else:  # duplicar
+        colunas = [c for c in Orcamento.__table__.columns if c.name not in CAMPOS_NAO_DUPLICADOS]
+        originais = session.exec(
+            select(Orcamento.id, *colunas).where(dos_ids).order_by(Orcamento.id)
+        ).all()
+        afetados = len(originais)
+
+        if originais:
+            # Números novos e sequenciais, pela mesma regra de /api/proximo-numero/
+            if current_user.contador_orcamento_override is not None:
+                proximo = current_user.contador_orcamento_override
+            else:
+                maior_numero = session.exec(
+                    select(func.max(cast(Orcamento.numero, Integer))).where(Orcamento.user_id == current_user.id)
+                ).one_or_none()
+                proximo = (maior_numero or 0) + 1
+
+            hoje = datetime.now()
+            novos = [
+                {
+                    **{c.name: getattr(original, c.name) for c in colunas},
+                    "numero": str(proximo + posicao).zfill(4),
+                    "data_emissao": hoje.strftime('%d/%m/%Y'),
+                    "data_validade": (hoje + timedelta(days=7)).strftime('%d/%m/%Y'),
+                    "status": "Orçamento",
+                }
+                for posicao, original in enumerate(originais)
+            ]
+            novos_ids = session.exec(
+                insert(Orcamento).returning(Orcamento.id, sort_by_parameter_order=True),
+                params=novos,
+                execution_options={"render_nulls": True},
+            ).scalars().all()
+
+            # Copia contatos e linhas de itens de todos os originais de uma vez (INSERT ... SELECT),
+            # trocando o orcamento_id antigo pelo novo com um CASE
+            mapa_ids = {original.id: novo_id for original, novo_id in zip(originais, novos_ids)}
+            for modelo, campos in (
+                (ContatoOrcamento, ["nome", "telefone", "email"]),
+                (OrcamentoItem, ["posicao", "tipo", "nome", "quantidade", "unidade", "valor", "ncm", "topicos", "item_id"]),
+            ):
+                colunas_copiadas = [getattr(modelo, campo) for campo in campos]
+                session.exec(insert(modelo).from_select(
+                    [*campos, "orcamento_id"],
+                    select(*colunas_copiadas, case(mapa_ids, value=modelo.orcamento_id))
+                    .where(modelo.orcamento_id.in_(mapa_ids)),
+                ))
+
+            ajustar_resumo_em_massa(session, Orcamento.id.in_(novos_ids), 1)
+            if current_user.contador_orcamento_override is not None:
+                session.exec(update(User).where(User.id == current_user.id).values(contador_orcamento_override=None))
+            resultado["novos_ids"] = novos_ids
+
+    if not afetados:
+        session.rollback()
+        raise HTTPException(status_code=404, detail="Nenhum orçamento encontrado.")
+
+    session.commit()
+
+    resultado["afetados"] = afetados
+    return resultado
+
 @app.get("/api/orcamento/{orcamento_id}/analise-custo", status_code=status.HTTP_200_OK)
 def get_dados_analise_custo(
     orcamento_id: int,
@@ -1000,7 +1589,7 @@ class ContatoResponse(BaseModel):
     telefone: str
     email: Optional[str] = None
 
-class ClienteComContatosResponse(BaseModel):
+class ClienteResponse(BaseModel):
     id: Optional[int]
     nome: str
     telefone: Optional[str] = None
@@ -1010,8 +1599,14 @@ class ClienteComContatosResponse(BaseModel):
     complemento: Optional[str] = None
     bairro: Optional[str] = None
     cidade_uf: Optional[str] = None
+
+class ClienteComContatosResponse(ClienteResponse):
     contatos: List[ContatoResponse] = []
 
+class ClienteListaResponse(ClienteResponse):
+    # Só aparece na resposta quando a lista é pedida com incluir_contatos=true
+    contatos: Optional[List[ContatoResponse]] = None
+
 class ContatoUpdate(BaseModel):
     id: Optional[int] = None
     nome: str
@@ -1144,16 +1739,189 @@ def salvar_dados_analise_custo(
     return {"message": "Análise de custo salva com sucesso!"}
 
 
-@app.get("/api/clientes/", response_model=List[ClienteComContatosResponse]) 
+@app.get("/api/clientes/", response_model=List[ClienteListaResponse], response_model_exclude_unset=True) 
 def listar_clientes_api(
+    response: Response,
+    busca: Optional[str] = Query(None),
+    pagina: int = Query(1, ge=1),
+    por_pagina: int = Query(50, ge=1, le=200),
+    incluir_contatos: bool = Query(False),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_db_session)
 ):
-    """Retorna uma lista de todos os clientes associados ao usuário logado."""
-    clientes = session.exec(
-        select(Cliente).options(selectinload(Cliente.contatos)).where(Cliente.user_id == current_user.id).order_by(Cliente.nome) # <--- CORREÇÃO APLICADA
+    """
+    Lista paginada dos clientes do usuário logado, em ordem alfabética.
+    'busca' procura no nome (sem acentos), no telefone e no bairro; os contatos
+    só são carregados com incluir_contatos=true. O total vai no cabeçalho X-Total-Count.
+    """
+    filtros = [Cliente.user_id == current_user.id]
+    if busca and busca.strip():
+        condicoes = [
+            Cliente.nome_key.contains(normalizar_texto(busca), autoescape=True),
+            Cliente.bairro.ilike(f"%{busca.strip()}%"),
+        ]
+        digitos = normalizar_telefone(busca)
+        if len(digitos) >= 3:
+            condicoes.append(Cliente.telefone_key.contains(digitos, autoescape=True))
+        filtros.append(or_(*condicoes))
+
+    total = session.exec(select(func.count()).select_from(Cliente).where(*filtros)).one()
+    response.headers["X-Total-Count"] = str(total)
+
+    statement = (
+        select(Cliente).where(*filtros)
+        .order_by(Cliente.nome, Cliente.id)
+        .offset((pagina - 1) * por_pagina).limit(por_pagina)
+    )
+    if incluir_contatos:
+        statement = statement.options(selectinload(Cliente.contatos))
+    clientes = session.exec(statement).all()
+
+    resultado = []
+    for cliente in clientes:
+        # Monta a resposta campo a campo para não disparar o lazy load de 'contatos'
+        dados = {campo: getattr(cliente, campo) for campo in ClienteResponse.model_fields}
+        if incluir_contatos:
+            dados["contatos"] = [ContatoResponse.model_validate(c.model_dump()) for c in cliente.contatos]
+        resultado.append(ClienteListaResponse(**dados))
+    return resultado
+
+def importar_lote_clientes(session: Session, user_id: int, lote: List[dict], resumo: dict):
+    """
+    Grava um lote de clientes (e contatos) da importação com poucas instruções:
+    1 SELECT indexado para achar os clientes existentes (por nome normalizado ou telefone),
+    1 UPDATE em massa, 1 INSERT em massa com RETURNING, e o mesmo para os contatos.
+    """
+    for registro in lote:
+        registro["nome_key"] = normalizar_texto(registro["dados"]["nome"])
+        registro["telefone_key"] = normalizar_telefone(registro["dados"]["telefone"]) or None
+
+    nome_keys = {r["nome_key"] for r in lote}
+    telefone_keys = {r["telefone_key"] for r in lote if r["telefone_key"]}
+    condicoes = [Cliente.nome_key.in_(nome_keys)]
+    if telefone_keys:
+        condicoes.append(Cliente.telefone_key.in_(telefone_keys))
+    existentes = session.exec(
+        select(Cliente.id, Cliente.nome_key, Cliente.telefone_key)
+        .where(Cliente.user_id == user_id, or_(*condicoes))
+        .order_by(Cliente.id)
     ).all()
-    return clientes
+    # Vários clientes com o mesmo nome ou telefone: fica sempre o mais antigo
+    por_nome, por_telefone = {}, {}
+    for cliente_id, nome_key, telefone_key in existentes:
+        por_nome.setdefault(nome_key, cliente_id)
+        if telefone_key:
+            por_telefone.setdefault(telefone_key, cliente_id)
+
+    novos, atualizacoes = [], []
+    for registro in lote:
+        valores = {**registro["dados"], "nome_key": registro["nome_key"], "telefone_key": registro["telefone_key"]}
+        cliente_id = por_nome.get(registro["nome_key"])
+        if not cliente_id and registro["telefone_key"] in por_telefone:
+            # Reconhecido só pelo telefone: o nome cadastrado fica como está
+            cliente_id = por_telefone[registro["telefone_key"]]
+            del valores["nome"], valores["nome_key"]
+        if cliente_id:
+            # Cliente já cadastrado: só sobrescreve os campos que vieram preenchidos
+            registro["cliente_id"] = cliente_id
+            atualizacoes.append({"id": cliente_id, **{k: v for k, v in valores.items() if v is not None}})
+        else:
+            novos.append((registro, {**valores, "user_id": user_id}))
+
+    if atualizacoes:
+        session.exec(update(Cliente), params=atualizacoes)
+    if novos:
+        ids = session.exec(
+            insert(Cliente).returning(Cliente.id, sort_by_parameter_order=True),
+            params=[valores for _, valores in novos],
+        ).all()
+        for (registro, _), (novo_id,) in zip(novos, ids):
+            registro["cliente_id"] = novo_id
+    resumo["clientes_criados"] += len(novos)
+    resumo["clientes_atualizados"] += len(atualizacoes)
+
+    # Contatos: o mesmo telefone (normalizado) no mesmo cliente é atualizado, não duplicado
+    ids_com_contatos = {r["cliente_id"] for r in lote if r["contatos"]}
+    if not ids_com_contatos:
+        return
+    conhecidos = {
+        (cliente_id, normalizar_telefone(telefone)): contato_id
+        for contato_id, cliente_id, telefone in session.exec(
+            select(Contato.id, Contato.cliente_id, Contato.telefone).where(Contato.cliente_id.in_(ids_com_contatos))
+        ).all()
+    }
+    contatos_novos, contatos_atualizados = [], []
+    for registro in lote:
+        for contato in registro["contatos"]:
+            chave = (registro["cliente_id"], normalizar_telefone(contato["telefone"]))
+            if chave not in conhecidos:
+                conhecidos[chave] = None  # Evita inserir o mesmo contato duas vezes no lote
+                contatos_novos.append({**contato, "cliente_id": registro["cliente_id"]})
+            elif conhecidos[chave]:
+                contatos_atualizados.append({"id": conhecidos[chave], **{k: v for k, v in contato.items() if v}})
+
+    if contatos_atualizados:
+        session.exec(update(Contato), params=contatos_atualizados)
+    if contatos_novos:
+        session.exec(insert(Contato), params=contatos_novos, execution_options={"render_nulls": True})
+    resumo["contatos_criados"] += len(contatos_novos)
+
+@app.post("/api/clientes/importar")
+def importar_clientes(
+    arquivo: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Importa clientes e contatos de um CSV/XLSX ou JSON, criando ou atualizando em lotes.
+    Um cliente já cadastrado é reconhecido pelo nome (sem acentos/maiúsculas) ou pelo telefone.
+    No CSV, várias linhas com o mesmo cliente somam os contatos (colunas contato_nome/telefone/email);
+    linhas com o mesmo telefone e outro nome também viram um cliente só, com o nome da primeira.
+    """
+    if not (arquivo.filename or "").lower().endswith((".csv", ".xlsx", ".json")):
+        raise HTTPException(status_code=400, detail="Envie um arquivo .csv, .xlsx ou .json.")
+
+    erros = []
+    total_linhas = 0
+    # Junta as linhas do mesmo cliente antes de gravar (o arquivo pode repeti-lo para listar contatos)
+    agrupados = {}
+    por_telefone = {}
+    try:
+        for numero, registro in iterar_clientes_arquivo(arquivo.file, arquivo.filename):
+            total_linhas += 1
+            try:
+                dados, contatos = validar_cliente(registro)
+            except LinhaInvalida as e:
+                erros.append({"linha": numero, "erro": str(e)})
+                continue
+            chave = normalizar_texto(dados["nome"])
+            telefone = normalizar_telefone(dados["telefone"])
+            if chave not in agrupados and telefone in por_telefone:
+                # Mesmo telefone com outro nome ("J. Silva"): soma ao cliente da primeira linha, sem trocar o nome
+                chave = por_telefone[telefone]
+                erros.append({
+                    "linha": numero,
+                    "erro": f"Telefone já usado por '{agrupados[chave]['dados']['nome']}' no arquivo; linha somada a esse cliente.",
+                })
+                dados.pop("nome")
+            if chave in agrupados:
+                agrupados[chave]["dados"].update({k: v for k, v in dados.items() if v})
+                agrupados[chave]["contatos"].extend(contatos)
+            else:
+                agrupados[chave] = {"linha": numero, "dados": dados, "contatos": contatos}
+            if telefone:
+                por_telefone.setdefault(telefone, chave)
+    except LinhaInvalida as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Não foi possível ler o arquivo. Salve o CSV com codificação UTF-8.")
+
+    resumo = {"clientes_criados": 0, "clientes_atualizados": 0, "contatos_criados": 0}
+    for lote in em_lotes(agrupados.values()):
+        importar_lote_clientes(session, current_user.id, lote, resumo)
+    session.commit()
+
+    return {"total_linhas": total_linhas, **resumo, "erros": erros}
 
 @app.get("/api/clientes/{cliente_id}", response_model=ClienteComContatosResponse)
 def obter_cliente_api(
@@ -1213,35 +1981,20 @@ def atualizar_cliente(
         if key != "contatos": # O campo 'contatos' será tratado separadamente
             setattr(cliente_db, key, value)
 
-
- 
-    contatos_recebidos = {c.id for c in cliente_update_data.contatos if c.id}
-    contatos_no_banco = {c.id for c in cliente_db.contatos}
-    
-    # Apaga contatos que não vieram na lista
-    for contato in list(cliente_db.contatos):
-        if contato.id not in contatos_recebidos:
-            session.delete(contato)
-
-    # Atualiza contatos existentes ou cria novos
-    for contato_data in cliente_update_data.contatos:
-        if contato_data.id: # Se tem ID, atualiza
-            contato_existente = session.get(Contato, contato_data.id)
-            if contato_existente:
-                contato_existente.nome = contato_data.nome
-                contato_existente.telefone = contato_data.telefone
-                contato_existente.email = contato_data.email
-        else: # Se não tem ID, cria um novo
-            novo_contato = Contato(
-                nome=contato_data.nome,
-                telefone=contato_data.telefone,
-                email=contato_data.email,
-                cliente_id=cliente_db.id
-            )
-            session.add(novo_contato)
-
     session.add(cliente_db)
-    session.commit()
+    try:
+        session.flush()
+        # Contatos: só a diferença (novos, alterados e removidos) vai ao banco, em lote.
+        # Ids de contatos de outro cliente não casam e viram contatos novos.
+        sincronizar_contatos(
+            session, Contato, cliente_db.id,
+            [c.model_dump() for c in cliente_update_data.contatos],
+            existentes=cliente_db.contatos,
+        )
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=MSG_CLIENTE_DUPLICADO)
     session.refresh(cliente_db)
 
     return cliente_db
@@ -1322,7 +2075,7 @@ def update_user_template(
         )
 
     # 3. Verifica se o template enviado é válido
-    if new_template not in PDF_GENERATORS:
+    if new_template not in registro_pdf.nomes():
         raise HTTPException(status_code=400, detail="Modelo de PDF inválido.")
 
     # 4. Atualiza o campo no objeto do usuário administrador
@@ -1331,6 +2084,7 @@ def update_user_template(
     # 5. Adiciona à sessão e salva no banco de dados
     session.add(current_user)
     session.commit()
+    invalidar_usuario(current_user.id)
     
     # 6. Retorna uma mensagem de sucesso
     return {"message": f"Seu modelo de PDF foi atualizado para '{new_template.capitalize()}'!"}
@@ -1370,6 +2124,58 @@ def admin_list_users(
     return users
 
 
+@app.get("/api/admin/pool")
+def admin_metricas_pool(current_user: User = Depends(get_current_user)):
+    """Perfil, configuração e uso dos pools de conexão (para dimensionar o pool com dados)."""
+    admin_user_env = os.getenv("BASIC_AUTH_USER", "admin")
+    if current_user.username != admin_user_env:
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+    return estado_pool()
+
+
+# Token do /metrics (o Prometheus manda 'Authorization: Bearer <token>'). Sem ele a rota
+# não responde: o app é público e as métricas mostram tráfego, pool e o processo.
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")
+
+
+@app.get("/metrics", include_in_schema=False)
+def metricas_prometheus(authorization: Optional[str] = Header(None)):
+    """Métricas no formato de texto do Prometheus (somando todos os workers, se houver METRICAS_DIR)."""
+    if not METRICAS_TOKEN:
+        raise HTTPException(status_code=404, detail="Métricas desativadas (defina METRICAS_TOKEN).")
+    if not secrets.compare_digest(authorization or "", f"Bearer {METRICAS_TOKEN}"):
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+    return Response(texto_prometheus(series_agregadas()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/admin/pdf-templates")
+def admin_modelos_pdf(current_user: User = Depends(get_current_user)):
+    """Modelos de PDF disponíveis e os que estão carregados (aquecidos) neste processo."""
+    admin_user_env = os.getenv("BASIC_AUTH_USER", "admin")
+    if current_user.username != admin_user_env:
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+    return registro_pdf.estado()
+
+
+@app.delete("/api/admin/pdf-templates/{nome}", status_code=status.HTTP_204_NO_CONTENT)
+def admin_descartar_modelo_pdf(nome: str, current_user: User = Depends(get_current_user)):
+    """Descarta um modelo carregado (libera a memória; o próximo PDF o importa de novo)."""
+    admin_user_env = os.getenv("BASIC_AUTH_USER", "admin")
+    if current_user.username != admin_user_env:
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+    if not registro_pdf.descartar(nome):
+        raise HTTPException(status_code=404, detail="Modelo não carregado.")
+
+
+@app.get("/api/admin/inicializacao")
+def admin_tempos_inicializacao(current_user: User = Depends(get_current_user)):
+    """Tempos do último cold start deste processo, em segundos desde o início da importação do app."""
+    admin_user_env = os.getenv("BASIC_AUTH_USER", "admin")
+    if current_user.username != admin_user_env:
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+    return TEMPOS
+
+
 @app.get("/api/admin/user/{user_id}/status", response_model=UserAdminView)
 def admin_get_user_status(
     user_id: int,
@@ -1438,6 +2244,7 @@ def admin_update_user_access(
         
     session.add(user_to_update)
     session.commit()
+    invalidar_usuario(user_to_update.id)
     return {"message": message}
 
 @app.delete("/api/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1461,6 +2268,7 @@ def delete_user(
 
     session.delete(user_to_delete)
     session.commit()
+    invalidar_usuario(user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @app.get("/api/cliente/verificar/")
@@ -1471,35 +2279,11 @@ def verificar_cliente_existente(
 ):
     """
     Verifica se um cliente com um nome específico já existe para o usuário logado.
-    A busca não diferencia maiúsculas de minúsculas.
-    """
-    cliente_existente = session.exec(
-        select(Cliente).where(
-            func.lower(Cliente.nome) == func.lower(nome),
-            Cliente.user_id == current_user.id
-        )
-    ).first()
-    
-    if cliente_existente:
-        # Se encontrou, retorna o cliente existente para o frontend
-        return cliente_existente
-    
-    # Se não encontrou, retorna um objeto vazio para indicar que o nome está livre
-    return {}
-
-@app.get("/api/cliente/verificar/")
-def verificar_cliente_existente(
-    nome: str = Query(..., min_length=3),
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_db_session)
-):
-    """
-    Verifica se um cliente com um nome específico já existe para o usuário logado.
-    A busca não diferencia maiúsculas de minúsculas.
+    A busca usa o nome normalizado: não diferencia maiúsculas, acentos nem espaços extras.
     """
     cliente_existente = session.exec(
         select(Cliente).where(
-            func.lower(Cliente.nome) == func.lower(nome),
+            Cliente.nome_key == normalizar_texto(nome),
             Cliente.user_id == current_user.id
         )
     ).first()
@@ -1551,4 +2335,8 @@ def get_orcamento_emails(
         for contato_orc in orcamento.contatos_extras:
             adicionar_email_se_unico(contato_orc.nome, contato_orc.email)
             
-    return emails_finais
\ No newline at end of file
+    return emails_finais
+
+
+# Fim da importação do módulo (as rotas já estão todas registradas)
+marcar("importacao")
@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+from typing import Any, Optional
+
+from sqlmodel import Session
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import User
+
+
+class TTLCache:
+    """
+    Cache simples em memória, com tempo de vida por entrada.
+    É por processo: com vários workers cada um tem o seu, e o TTL limita
+    por quanto tempo um dado invalidado em outro worker ainda pode aparecer.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._dados = {}
+        self._lock = threading.Lock()  # As rotas 'def' rodam no threadpool
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entrada = self._dados.get(key)
+            if entrada is None:
+                return None
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._dados[key]
+                return None
+            return valor
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._dados) >= self.max_entries and key not in self._dados:
+                # Cheio: descarta a entrada que expira primeiro
+                mais_antiga = min(self._dados, key=lambda k: self._dados[k][0])
+                del self._dados[mais_antiga]
+            self._dados[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._dados.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+
+# --- CACHE DO USUÁRIO AUTENTICADO ---
+# Guarda só a identidade (nunca o hash da senha), indexada pelo user_id da sessão, e só
+# serve às leituras (ver app.get_current_user). Plano, expiração e o contador de
+# orçamentos ficam de fora: mudam em outro worker sem que este saiba, então são lidos
+# do banco quando alguém os acessa (o ORM carrega os campos que não vieram do cache).
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+user_cache = TTLCache(ttl=USER_CACHE_TTL)
+
+CAMPOS_CACHE_USUARIO = (
+    "id",
+    "username",
+    "pdf_template_name",
+    "tem_funcao_analise_custo",
+)
+CAMPOS_FORA_DO_CACHE = [coluna for coluna in User.__table__.columns.keys() if coluna not in CAMPOS_CACHE_USUARIO]
+
+
+def guardar_usuario_no_cache(user: User):
+    user_cache.set(user.id, {campo: getattr(user, campo) for campo in CAMPOS_CACHE_USUARIO})
+
+
+def buscar_usuario_no_cache(user_id: int, session: Session) -> Optional[User]:
+    """
+    Reconstrói o User a partir do cache e o anexa à sessão SEM ir ao banco.
+    O objeto volta 'limpo', então as rotas podem alterá-lo e dar commit normalmente;
+    campos fora do cache (ex.: hashed_password, plano, contador) são carregados sob demanda.
+    """
+    dados = user_cache.get(user_id)
+    if dados is None:
+        return None
+    user = User(**dados)
+    make_transient_to_detached(user)
+    user = session.merge(user, load=False)
+    # O construtor preencheu o resto com os defaults do modelo (ex.: plano_ilimitado=False);
+    # expirados, esses campos são lidos do banco no primeiro acesso
+    session.expire(user, CAMPOS_FORA_DO_CACHE)
+    return user
+
+
+def invalidar_usuario(user_id: int):
+    user_cache.invalidate(user_id)
+
+
+# --- CACHE DO CATÁLOGO (serviços + materiais) ---
+# Indexado por user_id. Cada entrada guarda a versão em que foi montada e só é usada se
+# ainda bater com User.catalogo_revisao no banco (app.obter_catalogo), então vale com
+# vários workers; invalidar_catalogo apenas libera a memória no worker que alterou.
+CATALOGO_CACHE_TTL = float(os.getenv("CATALOGO_CACHE_TTL", "300"))
+catalogo_cache = TTLCache(ttl=CATALOGO_CACHE_TTL)
+
+
+def invalidar_catalogo(user_id: int):
+    catalogo_cache.invalidate(user_id)
@@ -0,0 +1,276 @@
+"""
+Teste de carga local: simula o fluxo real de quem usa o app pelo celular e mede
+quantos usuários simultâneos uma instância aguenta.
+
+Cada usuário virtual faz login e repete, até o tempo do nível acabar:
+listar os orçamentos, salvar um orçamento novo, abrir o PDF, gerar os links do
+WhatsApp e abrir o link público (como o cliente faria).
+
+Uso (com o app rodando em outro terminal, apontando para o mesmo banco):
+
+    DATABASE_URL=sqlite:///carga.db gunicorn app:app
+    DATABASE_URL=sqlite:///carga.db python carga.py --semear 20 --niveis 1,5,10,20 --duracao 30
+
+Para cada nível de concorrência o relatório mostra a vazão (fluxos completos e
+requisições por segundo) e os percentis p50/p95/p99 de cada etapa.
+"""
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+PREFIXO_USUARIO = "carga"
+SENHA_PADRAO = "carga-local"
+# Histórico de cada usuário semeado: a listagem não começa vazia
+ORCAMENTOS_POR_USUARIO = 30
+CLIENTES_POR_USUARIO = 10
+ETAPAS = ("login", "listar", "salvar", "pdf", "whatsapp", "publico")
+STATUS_WHATSAPP = ("Orçamento", "Nota de Serviço")
+
+SERVICOS = [("Pintura de parede", "m²", 18.5), ("Assentamento de piso", "m²", 42.0), ("Instalação elétrica", "un", 120.0)]
+MATERIAIS = [("Tinta acrílica 18L", "un", 389.9), ("Argamassa AC-II", "sc", 32.5), ("Areia média", "m³", 150.0)]
+
+_LINK_PUBLICO = re.compile(r"/orcamento/publico/[\w-]+\?status=\S+")
+
+
+# --- USUÁRIOS SINTÉTICOS ---
+def semear_usuarios(quantidade: int, senha: str = SENHA_PADRAO, prefixo: str = PREFIXO_USUARIO, semente: int = 42) -> List[str]:
+    """
+    Recria os usuários do teste no banco de DATABASE_URL com o gerador de dados
+    sintéticos (catálogo, clientes e um histórico de orçamentos para a listagem).
+    Devolve os usernames.
+    """
+    from sqlalchemy import update
+    from sqlmodel import Session
+
+    from models import User
+    from database import engine
+    from dados_sinteticos import gerar_dados
+
+    gerar_dados(quantidade, ORCAMENTOS_POR_USUARIO, CLIENTES_POR_USUARIO, semente, prefixo, senha, apagar_antes=True)
+    # O gerador sorteia assinaturas vencidas; aqui todo mundo precisa conseguir salvar
+    with Session(engine) as session:
+        session.exec(update(User).where(User.username.in_(_usernames(quantidade, prefixo))).values(plano_ilimitado=True))
+        session.commit()
+    return _usernames(quantidade, prefixo)
+
+
+def _usernames(quantidade: int, prefixo: str) -> List[str]:
+    return [f"{prefixo}_{indice:04d}" for indice in range(1, quantidade + 1)]
+
+
+# --- MEDIÇÕES ---
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil pelo método do posto mais próximo (valores já ordenados)."""
+    if not valores:
+        return None
+    return valores[max(1, math.ceil(len(valores) * p / 100)) - 1]
+
+
+class Resultado:
+    """Tempos por etapa e erros de um nível de concorrência."""
+
+    def __init__(self, concorrencia: int):
+        self.concorrencia = concorrencia
+        self.tempos: Dict[str, List[float]] = defaultdict(list)
+        self.erros: Dict[str, int] = defaultdict(int)
+        self.fluxos = 0
+        self.requisicoes = 0
+        self.duracao = 0.0
+
+    def registrar(self, etapa: str, segundos: float, ok: bool):
+        self.requisicoes += 1
+        if ok:
+            self.tempos[etapa].append(segundos)
+        else:
+            self.erros[etapa] += 1
+
+    def resumo(self) -> dict:
+        etapas = {}
+        for etapa in ETAPAS:
+            tempos = sorted(self.tempos.get(etapa, []))
+            etapas[etapa] = {
+                "n": len(tempos),
+                "erros": self.erros.get(etapa, 0),
+                **{f"p{p}_ms": _ms(percentil(tempos, p)) for p in (50, 95, 99)},
+            }
+        return {
+            "concorrencia": self.concorrencia,
+            "duracao_s": round(self.duracao, 2),
+            "fluxos": self.fluxos,
+            "fluxos_por_s": round(self.fluxos / self.duracao, 2) if self.duracao else 0,
+            "requisicoes_por_s": round(self.requisicoes / self.duracao, 2) if self.duracao else 0,
+            "etapas": etapas,
+        }
+
+
+def _ms(segundos: Optional[float]) -> Optional[float]:
+    return None if segundos is None else round(segundos * 1000, 1)
+
+
+# --- USUÁRIO VIRTUAL ---
+class UsuarioVirtual:
+    def __init__(
+        self, url: str, username: str, senha: str, resultado: Resultado, numero: int,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.username = username
+        self.senha = senha
+        self.resultado = resultado
+        self.numero = numero
+        self.sequencia = 0
+        # 'transport' permite rodar o fluxo dentro do processo (httpx.ASGITransport), como nos testes
+        self.cliente = httpx.AsyncClient(base_url=url, timeout=60, follow_redirects=False, transport=transport)
+        self.cliente_publico = httpx.AsyncClient(base_url=url, timeout=60, transport=transport)  # Sem a sessão do usuário
+        self.aleatorio = random.Random(numero)
+
+    async def _medir(
+        self, etapa: str, metodo: str, caminho: str, esperado=(200,), cliente: Optional[httpx.AsyncClient] = None, **kwargs
+    ) -> Optional[httpx.Response]:
+        inicio = time.perf_counter()
+        try:
+            resposta = await (cliente or self.cliente).request(metodo, caminho, **kwargs)
+        except httpx.HTTPError:
+            self.resultado.registrar(etapa, time.perf_counter() - inicio, False)
+            return None
+        ok = resposta.status_code in esperado
+        self.resultado.registrar(etapa, time.perf_counter() - inicio, ok)
+        return resposta if ok else None
+
+    async def login(self) -> bool:
+        resposta = await self._medir(
+            "login", "POST", "/login", esperado=(302,), data={"username": self.username, "password": self.senha}
+        )
+        return resposta is not None and resposta.headers.get("location") == "/"
+
+    def _formulario(self, numero_orcamento: str) -> dict:
+        itens = [
+            {"tipo": tipo, "nome": nome, "unidade": unidade, "valor": valor, "quantidade": self.aleatorio.randint(1, 40)}
+            for tipo, catalogo in (("servico", SERVICOS), ("material", MATERIAIS))
+            for nome, unidade, valor in self.aleatorio.sample(catalogo, 2)
+        ]
+        return {
+            "nome": f"Cliente Carga {self.numero}-{self.sequencia}",
+            "telefone": f"19 9{self.aleatorio.randint(1000, 9999)}-{self.aleatorio.randint(1000, 9999)}",
+            "numero_orcamento": numero_orcamento,
+            "descricao_servico": "Reforma simulada pelo teste de carga",
+            "condicao_pagamento": "50% na aprovação, 50% na entrega",
+            "itens": json.dumps(itens),
+            "contatos": "[]",
+        }
+
+    async def fluxo(self) -> bool:
+        """Um ciclo completo; False se alguma etapa falhou (o resto do ciclo é pulado)."""
+        self.sequencia += 1
+        if await self._medir("listar", "GET", "/api/orcamentos/") is None:
+            return False
+
+        numero_orcamento = f"C{self.numero:03d}{self.sequencia:05d}"
+        if await self._medir("salvar", "POST", "/salvar-orcamento/", data=self._formulario(numero_orcamento)) is None:
+            return False
+
+        # O app recarrega a lista depois de salvar; é daí que sai o id do orçamento novo
+        lista = await self._medir("listar", "GET", "/api/orcamentos/")
+        if lista is None:
+            return False
+        orcamento_id = next((o["id"] for o in lista.json() if o["numero"] == numero_orcamento), None)
+        if orcamento_id is None:
+            return False
+
+        # Abrir o PDF cria o token do link público
+        if await self._medir("pdf", "GET", f"/orcamento/{orcamento_id}/pdf") is None:
+            return False
+
+        link = None
+        for status in STATUS_WHATSAPP:
+            resposta = await self._medir("whatsapp", "GET", f"/orcamento/{orcamento_id}/whatsapp", params={"status": status})
+            if resposta is None:
+                return False
+            encontrado = _LINK_PUBLICO.search(resposta.json()["whatsapp_message"])
+            link = link or (encontrado and encontrado.group(0))
+        if not link:
+            return False
+
+        # O cliente do orçamento abre o link, sem login
+        return await self._medir("publico", "GET", link, cliente=self.cliente_publico) is not None
+
+    async def rodar(self, ate: float):
+        try:
+            if not await self.login():
+                return
+            while time.monotonic() < ate:
+                if await self.fluxo():
+                    self.resultado.fluxos += 1
+        finally:
+            await self.cliente.aclose()
+            await self.cliente_publico.aclose()
+
+
+async def rodar_nivel(
+    url: str, usuarios: List[str], senha: str, concorrencia: int, duracao: float,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Resultado:
+    resultado = Resultado(concorrencia)
+    inicio = time.monotonic()
+    virtuais = [
+        UsuarioVirtual(url, usuarios[indice % len(usuarios)], senha, resultado, indice + 1, transport)
+        for indice in range(concorrencia)
+    ]
+    await asyncio.gather(*(virtual.rodar(inicio + duracao) for virtual in virtuais))
+    resultado.duracao = time.monotonic() - inicio
+    return resultado
+
+
+# --- RELATÓRIO ---
+def imprimir_resumo(resumo: dict):
+    print(
+        f"\n== {resumo['concorrencia']} usuário(s) simultâneo(s): {resumo['fluxos']} fluxo(s) em {resumo['duracao_s']}s"
+        f" -> {resumo['fluxos_por_s']} fluxos/s, {resumo['requisicoes_por_s']} req/s"
+    )
+    print(f"{'etapa':<10}{'n':>7}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for etapa, dados in resumo["etapas"].items():
+        valores = [dados[chave] for chave in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{etapa:<10}{dados['n']:>7}{dados['erros']:>7}" + "".join(f"{'-' if v is None else v:>10}" for v in valores))
+
+
+async def principal(argumentos):
+    if argumentos.semear:
+        usuarios = semear_usuarios(argumentos.semear, argumentos.senha, argumentos.prefixo, argumentos.semente)
+        print(f"{len(usuarios)} usuário(s) sintético(s) prontos no banco.")
+    else:
+        usuarios = _usernames(argumentos.usuarios, argumentos.prefixo)
+
+    resumos = []
+    for concorrencia in argumentos.niveis:
+        resultado = await rodar_nivel(argumentos.url, usuarios, argumentos.senha, concorrencia, argumentos.duracao)
+        resumos.append(resultado.resumo())
+        imprimir_resumo(resumos[-1])
+
+    if argumentos.saida:
+        with open(argumentos.saida, "w") as f:
+            json.dump(resumos, f, indent=2, ensure_ascii=False)
+
+
+def _niveis(texto: str) -> List[int]:
+    return [int(nivel) for nivel in texto.split(",") if nivel.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga do fluxo de orçamentos contra uma instância local.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Endereço da instância (padrão: %(default)s)")
+    parser.add_argument("--niveis", type=_niveis, default=[1, 5, 10, 20], help="Concorrências, separadas por vírgula")
+    parser.add_argument("--duracao", type=float, default=30, help="Segundos em cada nível (padrão: %(default)s)")
+    parser.add_argument("--semear", type=int, default=0, metavar="N", help="Cria N usuários sintéticos no DATABASE_URL antes")
+    parser.add_argument("--semente", type=int, default=42, help="Semente dos dados semeados (padrão: %(default)s)")
+    parser.add_argument("--usuarios", type=int, default=20, help="Usuários já semeados a usar, se não for semear")
+    parser.add_argument("--prefixo", default=PREFIXO_USUARIO, help="Prefixo dos usernames sintéticos")
+    parser.add_argument("--senha", default=SENHA_PADRAO, help="Senha dos usuários sintéticos")
+    parser.add_argument("--saida", help="Arquivo JSON com o resumo de cada nível")
+    asyncio.run(principal(parser.parse_args()))
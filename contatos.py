@@ -0,0 +1,97 @@
+"""
+Sincronização de listas de contatos por diferença: Contato (perfil do cliente) e
+ContatoOrcamento (cópia dos contatos dentro do orçamento).
+
+Em vez de apagar e recriar todos os contatos a cada salvamento, compara a lista recebida
+com a gravada e só manda ao banco o que mudou: um INSERT em lote para os novos, um UPDATE
+em lote (por id) para os alterados e um DELETE para os que saíram.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+
+from models import Contato, ContatoOrcamento
+from normalizacao import normalizar_telefone
+
+CAMPOS_CONTATO = ("nome", "telefone", "email")
+
+# Coluna que liga cada tabela de contatos ao "dono" (cliente ou orçamento)
+COLUNA_DONO = {Contato: "cliente_id", ContatoOrcamento: "orcamento_id"}
+
+
+def diferenca_contatos(existentes, recebidos: List[dict]) -> Tuple[List[dict], List[dict], List[int]]:
+    """
+    Compara os contatos gravados (objetos ou linhas com id, nome, telefone, email) com a
+    lista recebida. Um contato recebido corresponde a um gravado pelo id, se vier um id
+    deste mesmo dono, ou senão pelo telefone normalizado.
+    Devolve (novos, alterados, ids_removidos); contatos iguais não geram nada.
+    """
+    livres = {c.id: c for c in existentes}
+    por_telefone = {}
+    for c in existentes:
+        chave = normalizar_telefone(c.telefone)
+        if chave:
+            por_telefone.setdefault(chave, []).append(c.id)
+
+    novos, alterados = [], []
+    for recebido in recebidos:
+        dados = {campo: recebido.get(campo) for campo in CAMPOS_CONTATO}
+        existente = livres.pop(recebido.get("id"), None)
+        if existente is None:
+            for contato_id in por_telefone.get(normalizar_telefone(dados["telefone"]), []):
+                if contato_id in livres:
+                    existente = livres.pop(contato_id)
+                    break
+
+        if existente is None:
+            novos.append(dados)
+        elif any(getattr(existente, campo) != dados[campo] for campo in CAMPOS_CONTATO):
+            alterados.append({"id": existente.id, **dados})
+    return novos, alterados, list(livres)
+
+
+def _consulta_existentes(modelo, dono_id: int):
+    return select(modelo.id, modelo.nome, modelo.telefone, modelo.email).where(
+        getattr(modelo, COLUNA_DONO[modelo]) == dono_id
+    )
+
+
+def _instrucoes(modelo, dono_id: int, existentes, recebidos: List[dict]) -> list:
+    """Lista de (statement, params) que levam os contatos gravados até a lista recebida."""
+    novos, alterados, removidos = diferenca_contatos(existentes, recebidos)
+    coluna_dono = COLUNA_DONO[modelo]
+    instrucoes = []
+    if removidos:
+        instrucoes.append((
+            delete(modelo)
+            .where(modelo.id.in_(removidos), getattr(modelo, coluna_dono) == dono_id)
+            .execution_options(synchronize_session=False),
+            None,
+        ))
+    if alterados:
+        instrucoes.append((update(modelo), alterados))
+    if novos:
+        instrucoes.append((
+            insert(modelo).execution_options(render_nulls=True),
+            [{**contato, coluna_dono: dono_id} for contato in novos],
+        ))
+    return instrucoes
+
+
+def sincronizar_contatos(session, modelo, dono_id: int, recebidos: List[dict], existentes: Optional[list] = None):
+    """
+    Deixa os contatos de 'dono_id' iguais a 'recebidos'. Se os contatos gravados já
+    estiverem carregados, passe-os em 'existentes' para evitar o SELECT. Não faz commit.
+    """
+    if existentes is None:
+        existentes = session.exec(_consulta_existentes(modelo, dono_id)).all()
+    for statement, params in _instrucoes(modelo, dono_id, existentes, recebidos):
+        session.exec(statement, params=params)
+
+
+async def sincronizar_contatos_async(session, modelo, dono_id: int, recebidos: List[dict], existentes: Optional[list] = None):
+    """Versão de sincronizar_contatos para a AsyncSession."""
+    if existentes is None:
+        existentes = (await session.exec(_consulta_existentes(modelo, dono_id))).all()
+    for statement, params in _instrucoes(modelo, dono_id, existentes, recebidos):
+        await session.exec(statement, params=params)
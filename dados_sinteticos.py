@@ -0,0 +1,379 @@
+"""
+Gerador de dados sintéticos para benchmarks e testes de desempenho.
+
+Cria N usuários com M orçamentos cada (mais catálogo, clientes com contatos,
+linhas de OrcamentoItem e o resumo mensal) no banco de DATABASE_URL, com INSERTs
+em lote. A mesma semente gera sempre os mesmos dados, então duas medições feitas
+em bancos gerados com a mesma semente são comparáveis.
+
+    DATABASE_URL=sqlite:///bench.db python dados_sinteticos.py --usuarios 50 --orcamentos 200 --semente 42
+
+Só o hash da senha muda de uma execução para outra (o bcrypt sorteia o sal).
+"""
+import json
+import time
+import random
+import argparse
+from datetime import date, datetime, time as hora, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlmodel import Session
+
+from models import (
+    ChaveIdempotencia, Cliente, Contato, ContatoOrcamento, Item, Orcamento, OrcamentoItem, ResumoMensal, User,
+)
+from normalizacao import normalizar_texto, normalizar_telefone
+from importacao import TAMANHO_LOTE, em_lotes
+from resumo import STATUS_PADRAO, reconstruir_resumo
+
+PREFIXO_USUARIO = "sintetico"
+SENHA_PADRAO = "sintetico"
+# As datas saem desta base, não de hoje: senão o mesmo seed daria meses diferentes no resumo
+DATA_BASE = date(2026, 1, 1)
+DIAS_DE_HISTORICO = 365
+# Usuários gravados por transação (cada grupo leva catálogo, clientes e orçamentos deles)
+USUARIOS_POR_TRANSACAO = 20
+
+CAMPOS_ANALISE_CUSTO = (
+    "valor_obra_total", "percentual_imposto_servico", "percentual_imposto_material", "custo_mao_de_obra",
+    "custo_materiais", "despesas_extras", "lucro_previsto", "valor_dizimo",
+)
+
+STATUS = (STATUS_PADRAO, STATUS_PADRAO, STATUS_PADRAO, "Nota de Serviço")
+
+# (nome, unidade, valor de referência, tópicos)
+SERVICOS = [
+    ("Pintura de parede", "m²", 18.0, ["Lixamento", "Massa corrida", "Duas demãos de tinta"]),
+    ("Assentamento de piso", "m²", 45.0, ["Nivelamento do contrapiso", "Rejunte"]),
+    ("Reboco", "m²", 32.0, []),
+    ("Concretagem de laje", "m³", 380.0, ["Montagem de formas", "Lançamento e adensamento", "Cura"]),
+    ("Instalação de tomada", "un", 60.0, []),
+    ("Troca de disjuntor", "un", 90.0, []),
+    ("Instalação hidráulica", "m", 55.0, ["Tubulação PVC", "Teste de estanqueidade"]),
+    ("Impermeabilização", "m²", 70.0, ["Limpeza da superfície", "Manta asfáltica", "Proteção mecânica"]),
+    ("Demolição de alvenaria", "m³", 120.0, []),
+    ("Mão de obra de ajudante", "h", 25.0, []),
+]
+# (nome, unidade, valor de referência, NCM)
+MATERIAIS = [
+    ("Tinta acrílica 18L", "un", 390.0, "3209.10.10"),
+    ("Massa corrida 25kg", "un", 95.0, "3214.90.00"),
+    ("Argamassa AC-II 20kg", "sc", 32.0, "3824.50.00"),
+    ("Cimento CP-II 50kg", "sc", 38.0, "2523.29.10"),
+    ("Areia média", "m³", 150.0, "2505.10.00"),
+    ("Brita 1", "m³", 160.0, "2517.10.00"),
+    ("Piso cerâmico 60x60", "m²", 49.9, "6907.21.00"),
+    ("Tubo PVC 25mm 6m", "un", 28.0, "3917.23.00"),
+    ("Fio flexível 2,5mm 100m", "un", 210.0, "8544.49.00"),
+    ("Disjuntor bipolar 40A", "un", 65.0, "8536.20.00"),
+    ("Manta asfáltica 4mm", "m²", 42.0, "6807.10.00"),
+]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elaine", "Fábio", "Gabriela", "Heitor", "Íris", "João", "Larissa", "Márcio"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Pereira", "Almeida", "Conceição", "Araújo", "Gonçalves", "Ribeiro"]
+CIDADES = ["Araras/SP", "Limeira/SP", "Caçador/SC", "Campinas/SP", "Piracicaba/SP", "Rio Claro/SP"]
+BAIRROS = ["Centro", "Jardim Europa", "Vila Nova", "Parque Industrial", "São João"]
+CONDICOES = ["À vista", "50% na aprovação, 50% na entrega", "30 dias", None]
+
+
+def _telefone(aleatorio: random.Random) -> str:
+    return f"({aleatorio.choice(['19', '49', '11'])}) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}"
+
+
+def _nome_pessoa(aleatorio: random.Random) -> str:
+    return f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}"
+
+
+def _inserir(session: Session, modelo, linhas: List[dict]) -> List[int]:
+    """INSERT em lote devolvendo os ids na ordem das linhas (Postgres e SQLite)."""
+    ids = []
+    for lote in em_lotes(linhas, TAMANHO_LOTE):
+        statement = insert(modelo).returning(modelo.id, sort_by_parameter_order=True)
+        ids.extend(session.exec(statement, params=lote).scalars())
+    return ids
+
+
+def _inserir_sem_retorno(session: Session, modelo, linhas: List[dict]):
+    for lote in em_lotes(linhas, TAMANHO_LOTE):
+        # render_nulls: linhas com campos vazios vão no mesmo INSERT que as demais
+        session.exec(insert(modelo), params=lote, execution_options={"render_nulls": True})
+
+
+class GeradorDados:
+    """Monta e grava os dados de cada usuário; toda escolha vem do mesmo random.Random(semente)."""
+
+    def __init__(
+        self, semente: int, orcamentos: int, clientes: int, prefixo: str = PREFIXO_USUARIO,
+        modelos_pdf: Optional[List[str]] = None,
+    ):
+        self.aleatorio = random.Random(semente)
+        self.orcamentos = orcamentos
+        self.clientes = clientes
+        self.prefixo = prefixo
+        self.modelos_pdf = modelos_pdf or ["apresentacao"]
+        self.totais: Dict[str, int] = {}
+
+    def _contar(self, nome: str, quantidade: int):
+        self.totais[nome] = self.totais.get(nome, 0) + quantidade
+
+    def usuario(self, indice: int, senha_hash: str) -> dict:
+        plano = self.aleatorio.random()
+        return {
+            "username": f"{self.prefixo}_{indice:04d}",
+            "hashed_password": senha_hash,
+            "pdf_template_name": self.modelos_pdf[indice % len(self.modelos_pdf)],
+            # Maioria com plano ilimitado; alguns com assinatura a vencer (entram no aviso de expiração)
+            "plano_ilimitado": plano < 0.7,
+            "data_expiracao": None if plano < 0.7 else datetime.combine(
+                DATA_BASE + timedelta(days=self.aleatorio.randint(-30, 400)), hora(), tzinfo=timezone.utc
+            ),
+            "tem_funcao_analise_custo": self.aleatorio.random() < 0.3,
+        }
+
+    def catalogo(self, user_id: int) -> List[dict]:
+        linhas = []
+        for nome, unidade, valor, _ in SERVICOS:
+            linhas.append({"tipo": "servico", "nome": nome, "valor": self._variar(valor), "ncm": None})
+        for nome, unidade, valor, ncm in MATERIAIS:
+            linhas.append({"tipo": "material", "nome": nome, "valor": self._variar(valor), "ncm": ncm})
+        for linha in linhas:
+            linha.update(user_id=user_id, nome_busca=normalizar_texto(linha["nome"]))
+        return linhas
+
+    def cliente(self, user_id: int, indice: int) -> dict:
+        nome = f"{_nome_pessoa(self.aleatorio)} {indice + 1}"  # O número garante nome_key único por usuário
+        telefone = _telefone(self.aleatorio)
+        return {
+            "user_id": user_id,
+            "nome": nome,
+            "nome_key": normalizar_texto(nome),
+            "telefone": telefone,
+            "telefone_key": normalizar_telefone(telefone) or None,
+            "cep": f"{self.aleatorio.randint(13000, 89999)}-{self.aleatorio.randint(0, 999):03d}",
+            "logradouro": f"Rua {self.aleatorio.choice(SOBRENOMES)}",
+            "numero_casa": str(self.aleatorio.randint(1, 2500)),
+            "complemento": self.aleatorio.choice([None, None, "Casa 2", "Apto 31"]),
+            "bairro": self.aleatorio.choice(BAIRROS),
+            "cidade_uf": self.aleatorio.choice(CIDADES),
+        }
+
+    def contatos(self, dono: str, dono_id: int, quantidade: int) -> List[dict]:
+        return [
+            {
+                dono: dono_id,
+                "nome": _nome_pessoa(self.aleatorio),
+                "telefone": _telefone(self.aleatorio),
+                "email": self.aleatorio.choice([None, f"contato{dono_id}_{indice}@exemplo.com.br"]),
+            }
+            for indice in range(quantidade)
+        ]
+
+    def itens_orcamento(self, catalogo: List[dict]) -> List[dict]:
+        itens = []
+        for tipo, base in (("servico", SERVICOS), ("material", MATERIAIS)):
+            for nome, unidade, _, extra in self.aleatorio.sample(base, self.aleatorio.randint(1, 5)):
+                valor = next(i["valor"] for i in catalogo if i["tipo"] == tipo and i["nome"] == nome)
+                item = {"tipo": tipo, "nome": nome, "quantidade": self.aleatorio.randint(1, 60), "valor": valor, "unidade": unidade}
+                if tipo == "servico" and extra:
+                    item["topicos"] = extra[: self.aleatorio.randint(1, len(extra))]
+                elif tipo == "material":
+                    item["ncm"] = extra
+                itens.append(item)
+        self.aleatorio.shuffle(itens)
+        return itens
+
+    def orcamento(self, user: dict, user_id: int, indice: int, catalogo: List[dict], cliente: Optional[dict]) -> dict:
+        itens = self.itens_orcamento(catalogo)
+        # Mesma conta do salvar-orcamento (quantidades inteiras)
+        total = round(sum(int(i["quantidade"]) * float(i["valor"]) for i in itens), 2)
+        emissao = DATA_BASE - timedelta(days=self.aleatorio.randint(0, DIAS_DE_HISTORICO))
+        cliente = cliente or {}
+        orcamento = {
+            "user_id": user_id,
+            "cliente_id": cliente.get("id"),
+            "numero": f"{indice + 1:04d}",
+            "descricao_servico": f"Obra {indice + 1}: {itens[0]['nome'].lower()} e serviços relacionados",
+            "itens": itens,
+            "total_geral": total,
+            "data_emissao": emissao.strftime("%d/%m/%Y"),
+            "data_validade": (emissao + timedelta(days=7)).strftime("%d/%m/%Y"),
+            "status": self.aleatorio.choice(STATUS),
+            "nome_cliente": cliente.get("nome") or _nome_pessoa(self.aleatorio),
+            "telefone_cliente": cliente.get("telefone") or _telefone(self.aleatorio),
+            "cep_cliente": cliente.get("cep"),
+            "logradouro_cliente": cliente.get("logradouro"),
+            "numero_casa_cliente": cliente.get("numero_casa"),
+            "complemento_cliente": cliente.get("complemento"),
+            "bairro_cliente": cliente.get("bairro"),
+            "cidade_uf_cliente": cliente.get("cidade_uf"),
+            "condicao_pagamento": self._condicao_pagamento(total),
+            "prazo_entrega": self.aleatorio.choice(["15 dias", "30 dias", "A combinar", None]),
+            "garantia": self.aleatorio.choice(["90 dias", "1 ano", None]),
+            "observacoes": self.aleatorio.choice([None, None, "Material por conta do cliente."]),
+            **dict.fromkeys(CAMPOS_ANALISE_CUSTO),  # O INSERT em lote usa as colunas da primeira linha
+        }
+        if user["tem_funcao_analise_custo"] and self.aleatorio.random() < 0.5:
+            orcamento.update(self._analise_custo(itens, total))
+        return orcamento
+
+    def _condicao_pagamento(self, total: float) -> Optional[str]:
+        condicao = self.aleatorio.choice(CONDICOES + ["parcelas"])
+        if condicao != "parcelas":
+            return condicao
+        # Formato de grupos de parcelas que os modelos de PDF entendem
+        entrada = round(total * 0.4, 2)
+        return json.dumps([[
+            {"descricao": "Entrada", "valor": entrada, "desconto": 0},
+            {"descricao": "Na entrega", "valor": round(total - entrada, 2), "desconto": 0},
+        ]])
+
+    def _analise_custo(self, itens: List[dict], total: float) -> dict:
+        """Mesma conta de salvar_dados_analise_custo, com custos e despesas sorteados."""
+        servicos = sum(i["valor"] * i["quantidade"] for i in itens if i["tipo"] == "servico")
+        materiais = sum(i["valor"] * i["quantidade"] for i in itens if i["tipo"] == "material")
+        imposto_servico = self.aleatorio.choice([0.0, 6.0, 11.0])
+        imposto_material = self.aleatorio.choice([0.0, 4.0])
+        mao_de_obra = round(servicos * self.aleatorio.uniform(0.3, 0.6), 2)
+        custo_materiais = round(materiais * self.aleatorio.uniform(0.6, 0.9), 2)
+        despesas = [
+            {"descricao": descricao, "valor": round(self.aleatorio.uniform(20, 400), 2)}
+            for descricao in self.aleatorio.sample(["Combustível", "Alimentação", "Caçamba", "Aluguel de andaime"], self.aleatorio.randint(0, 3))
+        ]
+        receita_liquida = total - servicos * imposto_servico / 100 - materiais * imposto_material / 100
+        lucro = receita_liquida - (mao_de_obra + custo_materiais + sum(d["valor"] for d in despesas))
+        return {
+            "valor_obra_total": total,
+            "percentual_imposto_servico": imposto_servico,
+            "percentual_imposto_material": imposto_material,
+            "custo_mao_de_obra": mao_de_obra,
+            "custo_materiais": custo_materiais,
+            "despesas_extras": despesas,
+            "lucro_previsto": lucro,
+            "valor_dizimo": lucro * 0.10 if lucro > 0 else 0,
+        }
+
+    def _variar(self, valor: float) -> float:
+        return round(valor * self.aleatorio.uniform(0.85, 1.25), 2)
+
+    def gravar_grupo(self, session: Session, indices: List[int], senha_hash: str):
+        """Gera e grava um grupo de usuários com tudo o que é deles (uma transação)."""
+        usuarios = [self.usuario(indice, senha_hash) for indice in indices]
+        user_ids = _inserir(session, User, usuarios)
+
+        catalogos = {user_id: self.catalogo(user_id) for user_id in user_ids}
+        item_ids = _inserir(session, Item, [linha for catalogo in catalogos.values() for linha in catalogo])
+        ids = iter(item_ids)
+        for catalogo in catalogos.values():
+            for linha in catalogo:
+                linha["id"] = next(ids)
+
+        clientes = {user_id: [self.cliente(user_id, indice) for indice in range(self.clientes)] for user_id in user_ids}
+        todos_clientes = [cliente for lista in clientes.values() for cliente in lista]
+        for cliente, cliente_id in zip(todos_clientes, _inserir(session, Cliente, todos_clientes)):
+            cliente["id"] = cliente_id
+        contatos = [
+            contato for cliente in todos_clientes
+            for contato in self.contatos("cliente_id", cliente["id"], self.aleatorio.randint(0, 3))
+        ]
+        _inserir_sem_retorno(session, Contato, contatos)
+
+        orcamentos = []
+        for user, user_id in zip(usuarios, user_ids):
+            for indice in range(self.orcamentos):
+                # Parte dos orçamentos sem cliente cadastrado (só os dados copiados no orçamento)
+                cliente = self.aleatorio.choice(clientes[user_id]) if clientes[user_id] and self.aleatorio.random() < 0.8 else None
+                orcamentos.append(self.orcamento(user, user_id, indice, catalogos[user_id], cliente))
+        orcamento_ids = _inserir(session, Orcamento, orcamentos)
+
+        linhas, extras = [], []
+        for orcamento, orcamento_id in zip(orcamentos, orcamento_ids):
+            catalogo = {(i["tipo"], i["nome"].lower()): i["id"] for i in catalogos[orcamento["user_id"]]}
+            for posicao, item in enumerate(orcamento["itens"]):
+                linhas.append({
+                    "orcamento_id": orcamento_id,
+                    "posicao": posicao,
+                    "tipo": item["tipo"],
+                    "nome": item["nome"],
+                    "quantidade": float(item["quantidade"]),
+                    "unidade": item.get("unidade"),
+                    "valor": float(item["valor"]),
+                    "ncm": item.get("ncm"),
+                    "topicos": item.get("topicos"),
+                    "item_id": catalogo.get((item["tipo"], item["nome"].lower())),
+                })
+            if self.aleatorio.random() < 0.2:
+                extras.extend(self.contatos("orcamento_id", orcamento_id, self.aleatorio.randint(1, 2)))
+        _inserir_sem_retorno(session, OrcamentoItem, linhas)
+        _inserir_sem_retorno(session, ContatoOrcamento, extras)
+
+        for user_id in user_ids:
+            reconstruir_resumo(session, user_id)
+
+        self._contar("usuarios", len(user_ids))
+        self._contar("itens_catalogo", len(item_ids))
+        self._contar("clientes", len(todos_clientes))
+        self._contar("contatos", len(contatos))
+        self._contar("orcamentos", len(orcamento_ids))
+        self._contar("linhas_itens", len(linhas))
+        self._contar("contatos_orcamento", len(extras))
+
+
+def apagar_usuarios(session: Session, prefixo: str) -> int:
+    """Remove os usuários '<prefixo>_*' e tudo o que é deles (para gerar de novo com a mesma semente)."""
+    user_ids = select(User.id).where(User.username.like(f"{prefixo}\\_%", escape="\\"))
+    orcamento_ids = select(Orcamento.id).where(Orcamento.user_id.in_(user_ids))
+    cliente_ids = select(Cliente.id).where(Cliente.user_id.in_(user_ids))
+    for statement in (
+        delete(OrcamentoItem).where(OrcamentoItem.orcamento_id.in_(orcamento_ids)),
+        delete(ContatoOrcamento).where(ContatoOrcamento.orcamento_id.in_(orcamento_ids)),
+        delete(Orcamento).where(Orcamento.user_id.in_(user_ids)),
+        delete(Contato).where(Contato.cliente_id.in_(cliente_ids)),
+        delete(Cliente).where(Cliente.user_id.in_(user_ids)),
+        delete(Item).where(Item.user_id.in_(user_ids)),
+        delete(ResumoMensal).where(ResumoMensal.user_id.in_(user_ids)),
+        delete(ChaveIdempotencia).where(ChaveIdempotencia.user_id.in_(user_ids)),
+    ):
+        session.exec(statement)
+    return session.exec(delete(User).where(User.id.in_(user_ids))).rowcount
+
+
+def gerar_dados(
+    usuarios: int, orcamentos: int, clientes: int = 20, semente: int = 42, prefixo: str = PREFIXO_USUARIO,
+    senha: str = SENHA_PADRAO, apagar_antes: bool = False,
+) -> Dict[str, int]:
+    """Gera os dados no banco de DATABASE_URL e devolve quantas linhas de cada tipo foram criadas."""
+    from database import engine
+    from security import get_password_hash
+    from pdf_models.registro import registro_pdf
+
+    gerador = GeradorDados(semente, orcamentos, clientes, prefixo, registro_pdf.nomes())
+    senha_hash = get_password_hash(senha)  # O bcrypt é lento de propósito: um hash serve para todos
+    with Session(engine) as session:
+        if apagar_antes:
+            apagar_usuarios(session, prefixo)
+            session.commit()
+        indices = list(range(1, usuarios + 1))
+        for grupo in em_lotes(indices, USUARIOS_POR_TRANSACAO):
+            gerador.gravar_grupo(session, grupo, senha_hash)
+            session.commit()
+    return gerador.totais
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera usuários, clientes, catálogos e orçamentos sintéticos no DATABASE_URL.")
+    parser.add_argument("--usuarios", type=int, default=10, help="Quantidade de usuários (padrão: %(default)s)")
+    parser.add_argument("--orcamentos", type=int, default=50, help="Orçamentos por usuário (padrão: %(default)s)")
+    parser.add_argument("--clientes", type=int, default=20, help="Clientes por usuário (padrão: %(default)s)")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (padrão: %(default)s)")
+    parser.add_argument("--prefixo", default=PREFIXO_USUARIO, help="Prefixo dos usernames (padrão: %(default)s)")
+    parser.add_argument("--senha", default=SENHA_PADRAO, help="Senha de todos os usuários gerados")
+    parser.add_argument("--apagar-antes", action="store_true", help="Apaga os usuários com o mesmo prefixo antes de gerar")
+    argumentos = parser.parse_args()
+
+    inicio = time.perf_counter()
+    totais = gerar_dados(
+        argumentos.usuarios, argumentos.orcamentos, argumentos.clientes, argumentos.semente,
+        argumentos.prefixo, argumentos.senha, argumentos.apagar_antes,
+    )
+    print(", ".join(f"{nome}: {quantidade}" for nome, quantidade in totais.items()))
+    print(f"Gerado em {time.perf_counter() - inicio:.1f}s.")
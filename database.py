@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from uuid import uuid4
+from dotenv import load_dotenv
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.dialects import postgresql, sqlite
+
+load_dotenv()
+
+# --- BANCO DE DADOS ---
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise RuntimeError("DATABASE_URL não definida no arquivo .env")
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+
+def montar_url_async(url: str) -> str:
+    """Converte a URL síncrona para o driver assíncrono equivalente (asyncpg/aiosqlite)."""
+    if url.startswith("postgresql+psycopg2://"):
+        url = url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    elif url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    elif url.startswith("sqlite://"):
+        url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    # O asyncpg não entende 'sslmode' (padrão do Supabase), só 'ssl'
+    return url.replace("sslmode=", "ssl=")
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or montar_url_async(DATABASE_URL)
+
+# --- POOL DE CONEXÕES ---
+# Perfis prontos, escolhidos por DB_POOL_PROFILE. Cada valor ainda pode ser sobrescrito
+# individualmente (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_POOL_TIMEOUT).
+#
+# Os valores são por engine e por processo: cada worker do gunicorn tem o engine síncrono e
+# o assíncrono, então o teto de conexões com o banco é
+#   2 x (pool_size + max_overflow) x workers
+# Na máquina do fly.toml (1 CPU, 1 GB -> 3 workers): padrao 2 x 7 x 3 = 42, pgbouncer
+# 2 x 10 x 3 = 60 (no PgBouncer, não no Postgres), economico 2 x 5 x 3 = 30. O Postgres
+# aceita 100 por padrão (menos no plano gratuito do Supabase): ao aumentar os workers
+# (WEB_CONCURRENCY) ou o pool, confira a conta; o gunicorn a mostra no log ao subir.
+PERFIS_POOL = {
+    # Conexão direta ao Postgres: pre_ping contra conexões derrubadas pelo servidor
+    "padrao": {"pool_size": 5, "max_overflow": 2, "pool_recycle": 300, "pool_pre_ping": True, "pool_timeout": 30},
+    # PgBouncer em modo transação (pooler do Supabase na porta 6543): quem segura as conexões
+    # com o Postgres é o PgBouncer, então o pool local é pequeno e sem o SELECT 1 do pre_ping
+    "pgbouncer": {"pool_size": 5, "max_overflow": 5, "pool_recycle": 1800, "pool_pre_ping": False, "pool_timeout": 10},
+    # Máquina pequena que escala a zero: poucas conexões abertas, pre_ping mantido
+    "economico": {"pool_size": 2, "max_overflow": 3, "pool_recycle": 300, "pool_pre_ping": True, "pool_timeout": 30},
+}
+
+
+def _perfil_padrao(url: str) -> str:
+    # A porta 6543 é a do pooler do Supabase em modo transação
+    return "pgbouncer" if ":6543/" in url else "padrao"
+
+
+def configuracao_pool(url: str) -> dict:
+    """Parâmetros do pool para a URL: perfil de DB_POOL_PROFILE + ajustes individuais do ambiente."""
+    nome_perfil = os.getenv("DB_POOL_PROFILE") or _perfil_padrao(url)
+    if nome_perfil not in PERFIS_POOL:
+        raise RuntimeError(f"DB_POOL_PROFILE inválido: '{nome_perfil}'. Use um de: {', '.join(PERFIS_POOL)}.")
+    config = dict(PERFIS_POOL[nome_perfil])
+    for variavel, campo, tipo in (
+        ("DB_POOL_SIZE", "pool_size", int),
+        ("DB_MAX_OVERFLOW", "max_overflow", int),
+        ("DB_POOL_RECYCLE", "pool_recycle", int),
+        ("DB_POOL_TIMEOUT", "pool_timeout", float),
+    ):
+        if os.getenv(variavel):
+            config[campo] = tipo(os.getenv(variavel))
+    if os.getenv("DB_POOL_PRE_PING"):
+        config["pool_pre_ping"] = os.getenv("DB_POOL_PRE_PING").lower() in ("1", "true", "sim", "yes")
+    return {"perfil": nome_perfil, **config}
+
+
+def conexoes_por_processo(config: dict) -> int:
+    """Teto de conexões abertas por um processo: os dois engines com o pool e o overflow cheios."""
+    return 2 * (config["pool_size"] + config["max_overflow"])
+
+
+class MetricasPool:
+    """Contadores de um pool, alimentados pelos eventos do SQLAlchemy e pela medição da espera."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.conexoes_abertas = 0   # Conexões novas abertas com o banco
+        self.checkouts = 0          # Conexões entregues às requisições
+        self.invalidacoes = 0       # Conexões descartadas (inclui as reprovadas no pre_ping)
+        self.timeouts = 0           # Requisições que desistiram de esperar uma conexão livre
+        self.espera_total = 0.0     # Segundos somados esperando uma conexão do pool
+        self.espera_maxima = 0.0
+
+    def somar(self, campo: str, valor=1):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + valor)
+
+    def registrar_espera(self, segundos: float):
+        with self._lock:
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+
+class _MedirEspera:
+    """Mede quanto tempo cada pedido de conexão fica esperando no pool (inclui abrir uma nova)."""
+
+    metricas: MetricasPool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.somar("timeouts")
+            raise
+        finally:
+            self.metricas.registrar_espera(time.perf_counter() - inicio)
+
+
+def _criar_classe_pool(base, metricas: MetricasPool):
+    # Mesmo módulo da classe original: o logger do pool continua em 'sqlalchemy.pool.*'
+    return type(f"{base.__name__}Medido", (_MedirEspera, base), {"metricas": metricas, "__module__": base.__module__})
+
+
+def _registrar_eventos_pool(engine_alvo, metricas: MetricasPool):
+    event.listen(engine_alvo, "connect", lambda *_: metricas.somar("conexoes_abertas"))
+    event.listen(engine_alvo, "checkout", lambda *_: metricas.somar("checkouts"))
+    event.listen(engine_alvo, "invalidate", lambda *_: metricas.somar("invalidacoes"))
+
+
+CONFIG_POOL = configuracao_pool(DATABASE_URL)
+_parametros_pool = {campo: valor for campo, valor in CONFIG_POOL.items() if campo != "perfil"}
+METRICAS_POOL = {"sync": MetricasPool(), "async": MetricasPool()}
+
+_connect_args_async = {}
+if CONFIG_POOL["perfil"] == "pgbouncer" and ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+    # O PgBouncer em modo transação não mantém prepared statements entre transações:
+    # desliga os caches e usa nomes únicos para não colidir com os de outra conexão
+    _connect_args_async = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+# Engine síncrono: continua sendo usado pelas rotas 'def', pelo Alembic e por scripts
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=_criar_classe_pool(QueuePool, METRICAS_POOL["sync"]),
+    **_parametros_pool,
+)
+
+# Engine assíncrono: usado pelas rotas 'async def' para não travar o event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=_criar_classe_pool(AsyncAdaptedQueuePool, METRICAS_POOL["async"]),
+    connect_args=_connect_args_async,
+    **_parametros_pool,
+)
+
+_registrar_eventos_pool(engine, METRICAS_POOL["sync"])
+_registrar_eventos_pool(async_engine.sync_engine, METRICAS_POOL["async"])
+
+
+def estado_pool() -> dict:
+    """Configuração e números atuais dos dois pools (para a rota de métricas)."""
+    estado = {"perfil": CONFIG_POOL["perfil"], "configuracao": _parametros_pool, "pools": {}}
+    for nome, engine_alvo in (("sync", engine), ("async", async_engine.sync_engine)):
+        pool, metricas = engine_alvo.pool, METRICAS_POOL[nome]
+        estado["pools"][nome] = {
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "livres": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "conexoes_abertas": metricas.conexoes_abertas,
+            "checkouts": metricas.checkouts,
+            "invalidacoes": metricas.invalidacoes,
+            "timeouts": metricas.timeouts,
+            "espera_total_s": round(metricas.espera_total, 6),
+            "espera_media_ms": round(1000 * metricas.espera_total / metricas.checkouts, 3) if metricas.checkouts else 0,
+            "espera_maxima_ms": round(1000 * metricas.espera_maxima, 3),
+        }
+    return estado
+
+
+# expire_on_commit=False: depois do commit os objetos continuam legíveis sem
+# disparar um lazy load (que não é permitido fora do greenlet do asyncio)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def get_db_session():
+    """Cria e fornece uma sessão de banco de dados para uma rota."""
+    with Session(engine) as session:
+        yield session
+
+
+async def get_async_session():
+    """Versão assíncrona de get_db_session, para as rotas 'async def'."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def insert_upsert(session, model):
+    """
+    Retorna o insert() específico do dialeto em uso, que tem
+    on_conflict_do_update / on_conflict_do_nothing (Postgres e SQLite).
+    """
+    dialeto = session.get_bind().dialect.name
+    if dialeto == "postgresql":
+        return postgresql.insert(model)
+    if dialeto == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Upsert não suportado para o banco '{dialeto}'.")
+
+
+@contextmanager
+def contar_consultas(*engines):
+    """
+    Registra os comandos SQL enviados ao banco dentro do bloco, para medir quantas
+    idas ao banco uma operação faz (COMMIT/ROLLBACK entram na lista também):
+
+        with contar_consultas() as comandos:
+            ...
+        print(len(comandos))
+
+    Sem argumentos, observa os dois engines da aplicação.
+    """
+    alvos = [getattr(e, "sync_engine", e) for e in engines or (engine, async_engine)]
+    comandos = []
+
+    def ao_executar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    def ao_commit(conn):
+        comandos.append("COMMIT")
+
+    def ao_rollback(conn):
+        comandos.append("ROLLBACK")
+
+    ouvintes = [("before_cursor_execute", ao_executar), ("commit", ao_commit), ("rollback", ao_rollback)]
+    for alvo in alvos:
+        for nome, funcao in ouvintes:
+            event.listen(alvo, nome, funcao)
+    try:
+        yield comandos
+    finally:
+        for alvo in alvos:
+            for nome, funcao in ouvintes:
+                event.remove(alvo, nome, funcao)
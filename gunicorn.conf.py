@@ -0,0 +1,153 @@
+# Configuração de produção: gunicorn com workers do uvicorn.
+# O gunicorn lê este arquivo sozinho quando roda na pasta do projeto:
+#   gunicorn app:app
+# Para desenvolvimento continua valendo: uvicorn app:app --reload
+import gc
+import os
+import tempfile
+
+# --- ENDEREÇO ---
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Cada worker grava seus números aqui e o /metrics soma todos (ver metricas.py).
+# Precisa estar no ambiente antes do app ser importado (preload), por isso fica no topo.
+os.environ.setdefault(
+    "METRICAS_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "orcamento_metricas"),
+)
+
+# --- WORKERS ---
+try:
+    import uvicorn_worker  # noqa: F401  (pacote oficial; o uvicorn.workers está depreciado)
+    worker_class = "uvicorn_worker.UvicornWorker"
+except ImportError:
+    worker_class = "uvicorn.workers.UvicornWorker"
+
+# Memória que cada worker costuma ocupar depois de gerar alguns PDFs, e quanto da
+# máquina pode ir para os workers (o resto fica para o master e o sistema)
+MEMORIA_POR_WORKER_MB = int(os.getenv("MEMORIA_POR_WORKER_MB", "250"))
+FRACAO_MEMORIA_WEB = float(os.getenv("FRACAO_MEMORIA_WEB", "0.75"))
+
+
+def _ler(caminho):
+    try:
+        with open(caminho) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpus_disponiveis() -> float:
+    """CPUs que o processo pode usar (respeita a cota do cgroup, se houver)."""
+    cota = _ler("/sys/fs/cgroup/cpu.max")  # cgroup v2: "<cota> <período>" ou "max <período>"
+    if cota and not cota.startswith("max"):
+        limite, periodo = cota.split()
+        return max(int(limite) / int(periodo), 1)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memoria_disponivel_mb() -> int:
+    """Limite de memória do container (cgroup v2/v1) ou a memória física da máquina."""
+    for caminho in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        valor = _ler(caminho)
+        # 'max' (v2) ou um número absurdo (v1) quer dizer "sem limite"
+        if valor and valor.isdigit() and int(valor) < 1 << 50:
+            return int(valor) // (1024 * 1024)
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+
+
+def calcular_workers() -> int:
+    """O menor entre a regra da CPU (2 x CPUs + 1) e o que cabe no orçamento de memória."""
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    por_cpu = int(2 * cpus_disponiveis()) + 1
+    por_memoria = int(memoria_disponivel_mb() * FRACAO_MEMORIA_WEB) // MEMORIA_POR_WORKER_MB
+    return max(1, min(por_cpu, por_memoria))
+
+
+# Vários workers são seguros para os caches em memória de cada um (cache.py): o que o
+# cache não guarda (plano, validade, contador de orçamentos) e a revisão do catálogo são
+# lidos do banco, então o que um worker grava os outros enxergam na requisição seguinte. Cada worker, porém, abre o seu pool de
+# conexões; a conta total está junto de PERFIS_POOL (database.py)
+workers = calcular_workers()
+
+# --- PRELOAD ---
+# O app é importado uma vez no master; os workers nascem por fork e compartilham
+# (copy-on-write) os módulos importados, as fontes e as imagens decodificadas dos modelos
+preload_app = True
+
+# Modelos de PDF aquecidos no master: "todos", "" (nenhum) ou nomes separados por vírgula
+PDF_TEMPLATES_PRELOAD = os.getenv("PDF_TEMPLATES_PRELOAD", "todos")
+
+# --- RECICLAGEM ---
+# O fpdf fragmenta a memória a cada PDF; depois de N requisições o worker termina as que
+# estão em andamento e é trocado por um novo (o jitter evita que todos reciclem juntos)
+max_requests = int(os.getenv("MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "100"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Um PDF grande pode levar alguns segundos; o timeout só derruba worker travado
+timeout = int(os.getenv("TIMEOUT", "120"))
+keepalive = 5
+
+# O heartbeat dos workers em disco fica lento em overlayfs (Docker); /dev/shm é memória
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def on_starting(server):
+    from metricas import limpar_diretorio
+
+    limpar_diretorio()
+
+
+def when_ready(server):
+    """Roda no master, com o app já importado, antes de criar os workers."""
+    import app as aplicacao
+    from database import engine, async_engine, CONFIG_POOL, conexoes_por_processo
+    from pdf_models.registro import registro_pdf
+
+    aplicacao.preparar_aplicacao()
+
+    if PDF_TEMPLATES_PRELOAD == "todos":
+        nomes = registro_pdf.nomes()
+    else:
+        nomes = [nome.strip() for nome in PDF_TEMPLATES_PRELOAD.split(",") if nome.strip()]
+    aquecidos = registro_pdf.aquecer(nomes)
+
+    # As conexões abertas pelo master não podem ser herdadas pelos workers
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+
+    # Tira os objetos já criados do alcance do coletor de lixo: sem isso cada coleta
+    # nos workers escreve nesses objetos e desfaz o compartilhamento das páginas
+    gc.freeze()
+    server.log.info(
+        "Preload pronto: %s worker(s); modelos de PDF aquecidos: %s",
+        workers, ", ".join(aquecidos) or "nenhum",
+    )
+    server.log.info(
+        "Pool '%s': até %s conexões com o banco (%s por worker)",
+        CONFIG_POOL["perfil"], conexoes_por_processo(CONFIG_POOL) * workers, conexoes_por_processo(CONFIG_POOL),
+    )
+
+
+def post_fork(server, worker):
+    # Garantia extra: o worker começa com pools vazios, sem fechar nada que seja do master
+    from database import engine, async_engine
+    from logs import configurar_logs
+
+    # A thread que escreve os logs não sobrevive ao fork: cada worker liga a sua
+    configurar_logs()
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    # Os contadores do worker que saiu (reciclado ou caído) continuam somando no /metrics
+    from metricas import encerrar_processo
+
+    encerrar_processo(worker.pid)
@@ -0,0 +1,67 @@
+"""
+Chaves de idempotência para rotas que criam registros (ex.: POST /salvar-orcamento/).
+
+O cliente manda um cabeçalho 'Idempotency-Key' único por tentativa de salvar e o repete
+nos reenvios. A primeira requisição grava a resposta junto com os dados, na mesma
+transação; as repetições devolvem essa resposta sem executar nada de novo.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete
+from sqlmodel import select
+
+from models import ChaveIdempotencia
+
+CABECALHO_IDEMPOTENCIA = "Idempotency-Key"
+IDEMPOTENCIA_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCIA_TTL_HORAS", "24")))
+
+# A limpeza das chaves vencidas roda no máximo uma vez por intervalo, por processo
+INTERVALO_LIMPEZA = 3600
+_ultima_limpeza = 0.0
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def buscar_resposta_salva(session, user_id: int, chave: str) -> Optional[JSONResponse]:
+    """Resposta gravada para esta chave (se ainda dentro do TTL), pronta para ser devolvida."""
+    registro = (await session.exec(
+        select(ChaveIdempotencia).where(
+            ChaveIdempotencia.user_id == user_id,
+            ChaveIdempotencia.chave == chave,
+            ChaveIdempotencia.criado_em > _agora() - IDEMPOTENCIA_TTL,
+        )
+    )).first()
+    if registro is None:
+        return None
+    return JSONResponse(
+        status_code=registro.status_code,
+        content=registro.resposta,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def registrar_resposta(session, user_id: int, chave: str, status_code: int, conteudo: dict):
+    """
+    Grava a resposta na transação corrente (o commit é de quem chamou).
+    Se a chave já existir, o commit falha com IntegrityError: outra requisição com a mesma
+    chave chegou primeiro, e quem chamou deve devolver a resposta dela.
+    """
+    session.add(ChaveIdempotencia(
+        user_id=user_id, chave=chave, status_code=status_code, resposta=conteudo, criado_em=_agora()
+    ))
+    await limpar_expiradas(session)
+
+
+async def limpar_expiradas(session):
+    """Apaga as chaves vencidas de todos os usuários (no máximo uma vez por INTERVALO_LIMPEZA)."""
+    global _ultima_limpeza
+    if time.monotonic() - _ultima_limpeza < INTERVALO_LIMPEZA:
+        return
+    _ultima_limpeza = time.monotonic()
+    await session.exec(delete(ChaveIdempotencia).where(ChaveIdempotencia.criado_em <= _agora() - IDEMPOTENCIA_TTL))
@@ -0,0 +1,165 @@
+import io
+import re
+import csv
+import itertools
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+
+from normalizacao import normalizar_texto, somente_digitos
+
+# Quantas linhas vão em cada INSERT ... ON CONFLICT
+TAMANHO_LOTE = 500
+
+TIPOS_ITEM = {"servico": "servico", "servicos": "servico", "material": "material", "materiais": "material"}
+
+
+class LinhaInvalida(ValueError):
+    """Erro de validação de uma linha da planilha (vai para o relatório, não aborta a importação)."""
+
+
+def iterar_linhas_planilha(arquivo, nome_arquivo: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Lê um CSV ou XLSX linha a linha (sem carregar o arquivo inteiro em memória)
+    e devolve (numero_da_linha, {coluna_normalizada: valor}).
+    A primeira linha é o cabeçalho; os nomes das colunas são normalizados ("Valor (R$)" -> "valor (r$)").
+    """
+    if nome_arquivo.lower().endswith(".xlsx"):
+        linhas = _linhas_xlsx(arquivo)
+    else:
+        linhas = _linhas_csv(arquivo)
+
+    cabecalho = next(linhas, None)
+    if not cabecalho:
+        return
+    colunas = [normalizar_texto(str(c or "")) for c in cabecalho]
+
+    for numero, valores in enumerate(linhas, start=2):
+        if not any(str(v or "").strip() for v in valores):
+            continue  # Ignora linhas em branco
+        yield numero, dict(zip(colunas, valores))
+
+
+def _linhas_csv(arquivo) -> Iterator[list]:
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    primeira = texto.readline()
+    # Planilhas exportadas pelo Excel em português costumam usar ';'
+    delimitador = ";" if primeira.count(";") > primeira.count(",") else ","
+    return csv.reader(itertools.chain([primeira], texto), delimiter=delimitador)
+
+
+def _linhas_xlsx(arquivo) -> Iterator[list]:
+    from openpyxl import load_workbook  # Import tardio: só quem importa XLSX paga o custo
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # No modo read_only as partes do arquivo são lidas sob demanda: um .xlsx corrompido
+    # pode falhar na abertura ou no meio das linhas
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True).active
+        for linha in planilha.iter_rows(values_only=True):
+            yield list(linha)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        raise LinhaInvalida("Não foi possível ler a planilha. Confira se o arquivo é um .xlsx válido.")
+
+
+def converter_valor(bruto) -> float:
+    """Aceita número da planilha, '1234.56', '1.234,56' ou 'R$ 1.234,56'."""
+    if isinstance(bruto, (int, float)):
+        return float(bruto)
+    texto = str(bruto or "").replace("R$", "").strip()
+    if not texto:
+        raise LinhaInvalida("Valor não informado.")
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        raise LinhaInvalida(f"Valor inválido: '{bruto}'.")
+
+
+def formatar_ncm(bruto) -> Optional[str]:
+    """Valida o NCM (8 dígitos) e devolve no formato usado pelo formulário: 1234.56.78."""
+    texto = str(bruto or "").strip()
+    if not texto:
+        return None
+    digitos = somente_digitos(texto)
+    if len(digitos) != 8 or not re.fullmatch(r"[\d.\s-]+", texto):
+        raise LinhaInvalida(f"NCM inválido: '{bruto}'. Use 8 dígitos, ex.: 1234.56.78.")
+    return f"{digitos[:4]}.{digitos[4:6]}.{digitos[6:]}"
+
+
+def validar_linha_item(linha: dict) -> dict:
+    """Converte uma linha da planilha nos campos de Item (tipo, nome, valor, ncm)."""
+    tipo = TIPOS_ITEM.get(normalizar_texto(str(linha.get("tipo") or "")))
+    if not tipo:
+        raise LinhaInvalida(f"Tipo inválido: '{linha.get('tipo') or ''}'. Use 'servico' ou 'material'.")
+
+    nome = re.sub(r"\s+", " ", str(linha.get("nome") or "")).strip()
+    if not nome:
+        raise LinhaInvalida("Nome não informado.")
+
+    valor = converter_valor(linha.get("valor"))
+    if valor < 0:
+        raise LinhaInvalida("O valor não pode ser negativo.")
+
+    return {"tipo": tipo, "nome": nome, "valor": valor, "ncm": formatar_ncm(linha.get("ncm"))}
+
+
+def em_lotes(iteravel, tamanho: int = TAMANHO_LOTE) -> Iterator[List]:
+    iterador = iter(iteravel)
+    while lote := list(itertools.islice(iterador, tamanho)):
+        yield lote
+
+
+# --- CLIENTES ---
+CAMPOS_CLIENTE = ("nome", "telefone", "cep", "logradouro", "numero_casa", "complemento", "bairro", "cidade_uf")
+
+
+def iterar_clientes_arquivo(arquivo, nome_arquivo: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Lê clientes de um CSV/XLSX (uma linha por cliente ou por contato, com as colunas
+    contato_nome, contato_telefone, contato_email) ou de um JSON (lista de clientes,
+    cada um com uma lista 'contatos'). Devolve (numero, dados_brutos).
+    """
+    if nome_arquivo.lower().endswith(".json"):
+        import json
+
+        try:
+            registros = json.load(arquivo)
+        except ValueError:
+            raise LinhaInvalida("JSON inválido.")
+        if not isinstance(registros, list):
+            raise LinhaInvalida("O JSON deve ser uma lista de clientes.")
+        for numero, registro in enumerate(registros, start=1):
+            yield numero, registro if isinstance(registro, dict) else {}
+        return
+
+    for numero, linha in iterar_linhas_planilha(arquivo, nome_arquivo):
+        contato = {
+            "nome": linha.get("contato_nome"),
+            "telefone": linha.get("contato_telefone"),
+            "email": linha.get("contato_email"),
+        }
+        linha["contatos"] = [contato] if any(contato.values()) else []
+        yield numero, linha
+
+
+def _texto(valor) -> Optional[str]:
+    texto = re.sub(r"\s+", " ", str(valor)).strip() if valor is not None else ""
+    return texto or None
+
+
+def validar_cliente(registro: dict) -> Tuple[dict, List[dict]]:
+    """Converte um registro bruto em (campos do Cliente, lista de contatos)."""
+    dados = {campo: _texto(registro.get(campo)) for campo in CAMPOS_CLIENTE}
+    if not dados["nome"]:
+        raise LinhaInvalida("Nome do cliente não informado.")
+
+    contatos = []
+    for contato in registro.get("contatos") or []:
+        if not isinstance(contato, dict):
+            raise LinhaInvalida("Contato em formato inválido.")
+        nome, telefone, email = _texto(contato.get("nome")), _texto(contato.get("telefone")), _texto(contato.get("email"))
+        if not telefone:
+            raise LinhaInvalida(f"Contato '{nome or ''}' sem telefone.")
+        contatos.append({"nome": nome or dados["nome"], "telefone": telefone, "email": email})
+    return dados, contatos
@@ -0,0 +1,97 @@
+import re
+import time
+import logging
+from pathlib import Path
+from typing import Set
+
+# Marcado quando este módulo é importado, que é a primeira coisa que o app.py faz:
+# todas as medições abaixo contam a partir daqui (o boot do interpretador fica de fora)
+INICIO = time.perf_counter()
+
+# Segundos desde INICIO em que cada etapa terminou: importacao, startup, primeira_resposta
+TEMPOS = {}
+
+logger = logging.getLogger(__name__)
+
+PASTA_MIGRACOES = Path(__file__).parent / "alembic" / "versions"
+
+_REVISAO = re.compile(r"^revision(?::[^=]*)?=\s*['\"](\w+)['\"]", re.MULTILINE)
+_REVISAO_ANTERIOR = re.compile(r"^down_revision(?::[^=]*)?=(.*)$", re.MULTILINE)
+
+
+def marcar(etapa: str) -> float:
+    TEMPOS[etapa] = round(time.perf_counter() - INICIO, 4)
+    return TEMPOS[etapa]
+
+
+def revisoes_head(pasta: Path = PASTA_MIGRACOES) -> Set[str]:
+    """
+    Revisões 'head' do Alembic, lidas direto dos arquivos de migração.
+    Carregar o ScriptDirectory do Alembic importa todas as migrações e custa mais
+    do que o próprio create_all que esta verificação quer evitar.
+    """
+    revisoes, anteriores = set(), set()
+    for arquivo in pasta.glob("*.py"):
+        codigo = arquivo.read_text(encoding="utf-8")
+        revisao = _REVISAO.search(codigo)
+        if not revisao:
+            continue
+        revisoes.add(revisao.group(1))
+        anterior = _REVISAO_ANTERIOR.search(codigo)
+        if anterior:
+            # Migrações de merge têm uma tupla de revisões anteriores
+            anteriores.update(re.findall(r"['\"](\w+)['\"]", anterior.group(1)))
+    return revisoes - anteriores
+
+
+def esquema_em_dia(conn) -> bool:
+    """True se o banco já está na(s) revisão(ões) head: nesse caso o create_all é desnecessário."""
+    from sqlalchemy import text
+
+    try:
+        versoes = {linha[0] for linha in conn.execute(text("SELECT version_num FROM alembic_version"))}
+    except Exception:
+        # Banco sem Alembic (ex.: criado só pelo create_all): não dá para afirmar nada
+        conn.rollback()
+        return False
+    return bool(versoes) and versoes == revisoes_head()
+
+
+class MedirPrimeiraResposta:
+    """
+    Middleware ASGI que registra quando a primeira resposta começou a ser enviada
+    (o "time to first response" de uma máquina que acabou de acordar). Depois disso
+    só repassa as chamadas, sem custo.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "primeira_resposta" in TEMPOS:
+            return await self.app(scope, receive, send)
+
+        inicio_requisicao = time.perf_counter()
+
+        def registrar():
+            if "primeira_resposta" in TEMPOS:
+                return
+            marcar("primeira_resposta")
+            TEMPOS["primeira_requisicao"] = round(time.perf_counter() - inicio_requisicao, 4)
+            logger.info(
+                "Primeira resposta (%s) %.3fs após o início; a requisição levou %.3fs",
+                scope["path"], TEMPOS["primeira_resposta"], TEMPOS["primeira_requisicao"],
+                extra={"tempos": dict(TEMPOS)},
+            )
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                registrar()
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # Se a rota estourou uma exceção, o 500 é enviado pelo middleware de erro do
+            # Starlette, que fica por fora deste: a resposta sai logo em seguida
+            registrar()
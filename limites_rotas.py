@@ -0,0 +1,423 @@
+"""
+Limites de consultas ao banco e de tempo por rota.
+
+Passa por todas as rotas do app.py num banco semeado com dados_sinteticos.py e
+falha se alguma fizer mais comandos SQL (COMMIT/ROLLBACK incluídos) ou demorar
+mais que o limite dela. Na falha, imprime os comandos da rota: um N+1 novo, um
+selectinload quebrado ou um commit a mais aparecem ali antes do deploy.
+
+    python -m pytest tests/test_limites_rotas.py   # um teste por rota, na suíte normal
+    python limites_rotas.py                        # tabela com todas as rotas, banco SQLite temporário
+    DATABASE_URL=... python limites_rotas.py --usar-banco
+
+Rota nova sem limite definido em LIMITES também é falha. Os limites de consultas
+são os números atuais: se uma mudança baixar a contagem, baixe o limite junto.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import itertools
+from statistics import median
+from typing import Callable, Dict, List, Optional
+
+USUARIO_PREFIXO = "limites"
+USUARIO_SENHA = "limites"
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "limites")
+# Cada caso começa com os caches do processo vazios (cache.py). Rotas repetíveis rodam uma
+# vez a frio e depois N vezes a quente: as consultas contadas são as da pior chamada (em
+# geral a fria) e o tempo é a mediana das quentes (a fria paga importações, modelo de PDF...)
+REPETICOES = 3
+
+# Teto de tempo por tipo de rota (ms): folgado para não falhar por ruído da máquina;
+# o que este script pega de verdade é o número de consultas. Na suíte do pytest o tempo
+# só é conferido com LIMITES_TEMPO=1 (ver tests/test_limites_rotas.py)
+MS_API = 300
+MS_PAGINA = 500
+MS_PDF = 5000
+
+# (método, rota) -> (máximo de comandos SQL, máximo de ms)
+LIMITES: Dict[tuple, tuple] = {
+    ("POST", "/login"): (2, MS_API),
+    ("GET", "/login"): (0, MS_PAGINA),
+    ("GET", "/visualizar-pdf"): (0, MS_PAGINA),
+    ("GET", "/sw.js"): (0, MS_API),
+    ("GET", "/"): (2, MS_PAGINA),
+    ("GET", "/orcamentos"): (2, MS_PAGINA),
+    ("POST", "/salvar-orcamento/"): (12, MS_API),
+    ("GET", "/api/orcamentos/"): (3, MS_API),
+    ("GET", "/api/orcamento-detalhes/{orcamento_id}"): (3, MS_API),
+    ("GET", "/api/orcamento-itens/resumo"): (3, MS_API),
+    ("GET", "/api/dashboard/"): (3, MS_API),
+    ("POST", "/api/item/"): (8, MS_API),
+    ("GET", "/api/catalogo/"): (4, MS_API),
+    ("GET", "/api/servico/"): (4, MS_API),
+    ("GET", "/api/materiais/"): (4, MS_API),
+    ("GET", "/api/catalogo/busca"): (3, MS_API),
+    ("DELETE", "/api/item/{item_id}"): (4, MS_API),
+    ("POST", "/api/item/importar"): (6, MS_API),
+    ("GET", "/orcamento/{orcamento_id}/pdf"): (5, MS_PDF),
+    ("GET", "/orcamento/{orcamento_id}/relatorio-custo"): (3, MS_PDF),
+    ("GET", "/orcamento/publico/{token}"): (4, MS_PDF),
+    ("GET", "/orcamento/{orcamento_id}/whatsapp"): (4, MS_API),
+    ("GET", "/editar-orcamento/{orcamento_id}"): (6, MS_PAGINA),
+    ("POST", "/atualizar-orcamento/{orcamento_id}"): (13, MS_API),
+    ("PATCH", "/api/orcamentos/{orcamento_id}"): (8, MS_API),
+    ("DELETE", "/api/orcamentos/{orcamento_id}"): (9, MS_API),
+    ("POST", "/api/orcamentos/lote"): (5, MS_API),
+    ("GET", "/api/orcamento/{orcamento_id}/analise-custo"): (3, MS_API),
+    ("GET", "/api/proximo-numero/"): (3, MS_API),
+    ("POST", "/api/resetar-contador/"): (3, MS_API),
+    ("POST", "/api/users/"): (4, MS_API),
+    ("GET", "/api/orcamento/{orcamento_id}/contatos"): (5, MS_API),
+    ("POST", "/api/orcamento/{orcamento_id}/analise-custo"): (4, MS_API),
+    ("GET", "/api/clientes/"): (5, MS_API),
+    ("POST", "/api/clientes/importar"): (6, MS_API),
+    ("GET", "/api/clientes/{cliente_id}"): (4, MS_API),
+    ("DELETE", "/api/clientes/{cliente_id}"): (8, MS_API),
+    ("PUT", "/api/clientes/{cliente_id}"): (10, MS_API),
+    ("POST", "/orcamento/{orcamento_id}/email/link"): (4, MS_API),
+    ("POST", "/api/user/update-template"): (4, MS_API),
+    ("GET", "/api/users/"): (3, MS_API),
+    ("GET", "/api/admin/users/"): (3, MS_API),
+    ("GET", "/api/admin/pool"): (2, MS_API),
+    ("GET", "/metrics"): (0, MS_API),
+    ("GET", "/api/admin/pdf-templates"): (2, MS_API),
+    ("DELETE", "/api/admin/pdf-templates/{nome}"): (2, MS_API),
+    ("GET", "/api/admin/inicializacao"): (2, MS_API),
+    ("GET", "/api/admin/user/{user_id}/status"): (3, MS_API),
+    ("POST", "/api/admin/user/update-access"): (6, MS_API),
+    ("DELETE", "/api/users/{user_id}"): (7, MS_API),
+    ("GET", "/api/cliente/verificar/"): (3, MS_API),
+    ("GET", "/api/orcamento/{orcamento_id}/emails"): (5, MS_API),
+    ("GET", "/logout"): (0, MS_API),
+}
+
+
+class Caso:
+    """
+    Uma chamada a uma rota. 'montar' recebe o contexto (ids do banco semeado) e
+    devolve a URL e os argumentos do request; é chamada a cada repetição.
+    """
+
+    def __init__(
+        self, metodo: str, rota: str, montar: Callable[[dict], tuple], status: int = 200,
+        cliente: str = "usuario", repetir: bool = True, guardar: Optional[Callable[[dict, object], None]] = None,
+    ):
+        self.metodo = metodo
+        self.rota = rota
+        self.montar = montar
+        self.status = status
+        self.cliente = cliente  # "usuario", "admin" ou "anonimo"
+        self.repetir = repetir  # False para rotas que apagam ou criam algo único
+        self.guardar = guardar  # Guarda no contexto algo da resposta (ex.: id criado) para um caso seguinte
+
+
+def _url(caminho: str, **kwargs) -> Callable[[dict], tuple]:
+    """
+    Caso simples: a rota com os ids do contexto ('{orcamento_id}' etc.) e os kwargs do request.
+    Os campos de formulário ('data') também podem citar o contexto.
+    """
+
+    def montar(ctx: dict) -> tuple:
+        argumentos = dict(kwargs)
+        if "data" in argumentos:
+            argumentos["data"] = {chave: str(valor).format(**ctx) for chave, valor in argumentos["data"].items()}
+        return caminho.format(**ctx), argumentos
+
+    return montar
+
+
+_sequencia = itertools.count(1)
+
+
+def _formulario_orcamento(ctx: dict) -> dict:
+    import json
+
+    itens = [
+        {"tipo": "servico", "nome": "Pintura de parede", "quantidade": 40, "valor": 18.0, "unidade": "m²",
+         "topicos": ["Lixamento", "Duas demãos de tinta"]},
+        {"tipo": "material", "nome": "Tinta acrílica 18L", "quantidade": 3, "valor": 390.0, "ncm": "3209.10.10"},
+    ]
+    return {
+        "nome": ctx["cliente_nome"], "telefone": "19 99999-0000", "numero_orcamento": f"L{next(_sequencia):04d}",
+        "descricao_servico": "Pintura", "condicao_pagamento": "À vista", "itens": json.dumps(itens),
+        "contatos": json.dumps([{"nome": "Ana", "telefone": "19 98888-0000", "email": "ana@exemplo.com.br"}]),
+        "cliente_id": str(ctx["cliente_id"]), "salvar_cliente": "on",
+    }
+
+
+def _planilha_itens(ctx: dict) -> dict:
+    conteudo = "tipo,nome,valor,ncm\nmaterial,Cimento CP-II 50kg,39.90,2523.29.10\nservico,Reboco,33,\n"
+    return {"files": {"arquivo": ("itens.csv", conteudo.encode(), "text/csv")}}
+
+
+def _planilha_clientes(ctx: dict) -> dict:
+    conteudo = "nome,telefone,contato_nome,contato_telefone\nCliente Importado,19 97777-0000,Bia,19 96666-0000\n"
+    return {"files": {"arquivo": ("clientes.csv", conteudo.encode(), "text/csv")}}
+
+
+ANALISE_CUSTO = {
+    "valor_obra_total": 2000, "percentual_imposto_servico": 6, "percentual_imposto_material": 0,
+    "custo_mao_de_obra": 600, "custo_materiais": 700, "despesas_extras": [{"descricao": "Caçamba", "valor": 250}],
+}
+
+# O status vai no nome do arquivo (Content-Disposition), e o TestClient só decodifica cabeçalhos em UTF-8
+STATUS_ASCII = {"status": "Orcamento"}
+
+# Em ordem: o que apaga ou encerra a sessão fica depois do que usa o mesmo objeto
+CASOS: List[Caso] = [
+    Caso("POST", "/login", lambda ctx: ("/login", {"data": ctx["credenciais"]}), status=302),
+    Caso("GET", "/login", _url("/login")),
+    Caso("GET", "/visualizar-pdf", _url("/visualizar-pdf")),
+    Caso("GET", "/sw.js", _url("/sw.js")),
+    Caso("GET", "/", _url("/")),
+    Caso("GET", "/orcamentos", _url("/orcamentos")),
+    Caso("POST", "/salvar-orcamento/", lambda ctx: ("/salvar-orcamento/", {"data": _formulario_orcamento(ctx)})),
+    Caso("GET", "/api/orcamentos/", _url("/api/orcamentos/")),
+    Caso("GET", "/api/orcamento-detalhes/{orcamento_id}", _url("/api/orcamento-detalhes/{orcamento_id}")),
+    Caso("GET", "/api/orcamento-itens/resumo", _url("/api/orcamento-itens/resumo", params={"tipo": "material"})),
+    Caso("GET", "/api/dashboard/", _url("/api/dashboard/")),
+    Caso("POST", "/api/item/", lambda ctx: (
+        "/api/item/", {"json": {"tipo": "material", "nome": f"Item limites {next(_sequencia)}", "valor": 10, "ncm": "3209.10.10"}}
+    ), status=201),
+    Caso("GET", "/api/catalogo/", _url("/api/catalogo/")),
+    Caso("GET", "/api/servico/", _url("/api/servico/")),
+    Caso("GET", "/api/materiais/", _url("/api/materiais/")),
+    Caso("GET", "/api/catalogo/busca", _url("/api/catalogo/busca", params={"q": "tin"})),
+    Caso("DELETE", "/api/item/{item_id}", _url("/api/item/{item_id}"), status=204, repetir=False),
+    Caso("POST", "/api/item/importar", lambda ctx: ("/api/item/importar", _planilha_itens(ctx))),
+    Caso("GET", "/orcamento/{orcamento_id}/pdf", _url("/orcamento/{orcamento_id}/pdf", params=STATUS_ASCII)),
+    Caso("GET", "/orcamento/{orcamento_id}/relatorio-custo", _url("/orcamento/{orcamento_id}/relatorio-custo")),
+    Caso("GET", "/orcamento/publico/{token}", _url("/orcamento/publico/{token}", params=STATUS_ASCII), cliente="anonimo"),
+    Caso("GET", "/orcamento/{orcamento_id}/whatsapp", _url("/orcamento/{orcamento_id}/whatsapp", params={"status": "Nota de Serviço"})),
+    Caso("GET", "/editar-orcamento/{orcamento_id}", _url("/editar-orcamento/{orcamento_id}")),
+    Caso("POST", "/atualizar-orcamento/{orcamento_id}", lambda ctx: (
+        f"/atualizar-orcamento/{ctx['orcamento_id']}", {"data": _formulario_orcamento(ctx)}
+    )),
+    Caso("PATCH", "/api/orcamentos/{orcamento_id}", _url(
+        "/api/orcamentos/{orcamento_id}",
+        json={"observacoes": "Alterado", "itens": [{"operacao": "atualizar", "posicao": 0, "item": {"quantidade": 5}}]},
+    )),
+    Caso("POST", "/api/orcamentos/lote", lambda ctx: (
+        "/api/orcamentos/lote", {"json": {"ids": ctx["orcamentos_lote"], "operacao": "alterar_status", "status": "Nota de Serviço"}}
+    )),
+    Caso("GET", "/api/orcamento/{orcamento_id}/analise-custo", _url("/api/orcamento/{orcamento_id}/analise-custo")),
+    Caso("POST", "/api/orcamento/{orcamento_id}/analise-custo", _url("/api/orcamento/{orcamento_id}/analise-custo", json=ANALISE_CUSTO)),
+    Caso("GET", "/api/proximo-numero/", _url("/api/proximo-numero/")),
+    Caso("GET", "/api/orcamento/{orcamento_id}/contatos", _url("/api/orcamento/{orcamento_id}/contatos")),
+    Caso("GET", "/api/orcamento/{orcamento_id}/emails", _url("/api/orcamento/{orcamento_id}/emails")),
+    Caso("POST", "/orcamento/{orcamento_id}/email/link", _url("/orcamento/{orcamento_id}/email/link", data={"destinatario": "ana@exemplo.com.br"})),
+    Caso("GET", "/api/clientes/", _url("/api/clientes/", params={"incluir_contatos": "true"})),
+    Caso("GET", "/api/clientes/{cliente_id}", _url("/api/clientes/{cliente_id}")),
+    Caso("PUT", "/api/clientes/{cliente_id}", lambda ctx: (f"/api/clientes/{ctx['cliente_id']}", {"json": {
+        "nome": ctx["cliente_nome"], "telefone": "19 95555-0000",
+        "contatos": [{"nome": "Carlos", "telefone": "19 94444-0000"}, {"nome": "Dora", "telefone": "19 93333-0000"}],
+    }})),
+    Caso("GET", "/api/cliente/verificar/", lambda ctx: ("/api/cliente/verificar/", {"params": {"nome": ctx["cliente_nome"]}})),
+    Caso("POST", "/api/clientes/importar", lambda ctx: ("/api/clientes/importar", _planilha_clientes(ctx))),
+    Caso("DELETE", "/api/clientes/{cliente_id}", _url("/api/clientes/{cliente_removivel_id}"), status=204, repetir=False),
+    Caso("DELETE", "/api/orcamentos/{orcamento_id}", _url("/api/orcamentos/{orcamento_removivel_id}"), status=204, repetir=False),
+    Caso("POST", "/api/resetar-contador/", _url("/api/resetar-contador/", data={"proximo_numero_desejado": 100})),
+    # --- Administração ---
+    Caso("POST", "/api/users/", lambda ctx: ("/api/users/", {"data": {
+        "username": f"{USUARIO_PREFIXO}_removivel", "password": "x", "pdf_template_name": "apresentacao",
+    }}), status=201, cliente="admin", repetir=False, guardar=lambda ctx, resposta: _guardar_usuario_removivel(ctx)),
+    Caso("POST", "/api/user/update-template", _url("/api/user/update-template", data={"new_template": "joao"}), cliente="admin"),
+    Caso("GET", "/api/users/", _url("/api/users/"), cliente="admin"),
+    Caso("GET", "/api/admin/users/", _url("/api/admin/users/"), cliente="admin"),
+    Caso("GET", "/api/admin/pool", _url("/api/admin/pool"), cliente="admin"),
+    Caso("GET", "/metrics", lambda ctx: ("/metrics", {"headers": {"Authorization": f"Bearer {METRICAS_TOKEN}"}}), cliente="anonimo"),
+    Caso("GET", "/api/admin/pdf-templates", _url("/api/admin/pdf-templates"), cliente="admin"),
+    Caso("DELETE", "/api/admin/pdf-templates/{nome}", _url("/api/admin/pdf-templates/cacador"), status=204, cliente="admin", repetir=False),
+    Caso("GET", "/api/admin/inicializacao", _url("/api/admin/inicializacao"), cliente="admin"),
+    Caso("GET", "/api/admin/user/{user_id}/status", _url("/api/admin/user/{user_id}/status"), cliente="admin"),
+    Caso("POST", "/api/admin/user/update-access", _url(
+        "/api/admin/user/update-access", data={"user_id": "{user_id}", "action": "monthly"},
+    ), cliente="admin"),
+    Caso("DELETE", "/api/users/{user_id}", lambda ctx: (f"/api/users/{ctx['usuario_removivel_id']}", {}), status=204, cliente="admin", repetir=False),
+    Caso("GET", "/logout", _url("/logout"), status=302, repetir=False),
+]
+
+
+# --- PREPARAÇÃO ---
+def semear(orcamentos: int) -> dict:
+    """Usuário sintético com histórico e as permissões que as rotas pedem; devolve o contexto dos casos."""
+    from sqlalchemy import update
+    from sqlmodel import Session, select
+
+    from models import Cliente, Orcamento, User
+    from database import engine
+    from dados_sinteticos import gerar_dados
+
+    gerar_dados(1, orcamentos, 10, semente=42, prefixo=USUARIO_PREFIXO, senha=USUARIO_SENHA, apagar_antes=True)
+    username = f"{USUARIO_PREFIXO}_0001"
+    with Session(engine) as session:
+        session.exec(update(User).where(User.username == username).values(plano_ilimitado=True, tem_funcao_analise_custo=True))
+        session.commit()
+        user_id = session.exec(select(User.id).where(User.username == username)).one()
+        orcamento_ids = session.exec(select(Orcamento.id).where(Orcamento.user_id == user_id).order_by(Orcamento.id)).all()
+        # O cliente do orçamento medido: atualizar com "salvar_cliente" mexe no perfil dele
+        cliente = session.exec(
+            select(Cliente.id, Cliente.nome).join(Orcamento, Orcamento.cliente_id == Cliente.id).where(Orcamento.id == orcamento_ids[0])
+        ).one()
+        clientes = session.exec(select(Cliente.id).where(Cliente.user_id == user_id).order_by(Cliente.id)).all()
+    return {
+        "credenciais": {"username": username, "password": USUARIO_SENHA},
+        "user_id": user_id,
+        "orcamento_id": orcamento_ids[0],
+        "orcamentos_lote": orcamento_ids[1:6],
+        "orcamento_removivel_id": orcamento_ids[-1],
+        "cliente_id": cliente[0],
+        "cliente_nome": cliente[1],
+        "cliente_removivel_id": next(id_ for id_ in reversed(clientes) if id_ != cliente[0]),
+    }
+
+
+def preparar_casos(clientes: dict, ctx: dict):
+    """O que as rotas medidas esperam já existir: token do link público, análise de custo, item e usuário a apagar."""
+    usuario, admin = clientes["usuario"], clientes["admin"]
+    _verificar(usuario.post("/login", data=ctx["credenciais"], follow_redirects=False), 302)
+    _verificar(admin.post("/login", data={
+        "username": os.getenv("BASIC_AUTH_USER", "admin"), "password": os.getenv("BASIC_AUTH_PASS", "secret"),
+    }, follow_redirects=False), 302)
+    _verificar(usuario.post(f"/api/orcamento/{ctx['orcamento_id']}/analise-custo", json=ANALISE_CUSTO))
+    _verificar(usuario.get(f"/orcamento/{ctx['orcamento_id']}/pdf", params=STATUS_ASCII))
+    ctx["item_id"] = _verificar(usuario.post("/api/item/", json={"tipo": "servico", "nome": "Item a apagar", "valor": 1}), 201).json()["id"]
+
+    from sqlmodel import Session, select
+
+    from models import Orcamento
+    from database import engine
+
+    with Session(engine) as session:
+        ctx["token"] = session.exec(select(Orcamento.token_visualizacao).where(Orcamento.id == ctx["orcamento_id"])).one()
+
+
+def _guardar_usuario_removivel(ctx: dict):
+    # A criação só devolve uma mensagem; o id sai do banco
+    from sqlmodel import Session, select
+
+    from models import User
+    from database import engine
+
+    with Session(engine) as session:
+        ctx["usuario_removivel_id"] = session.exec(select(User.id).where(User.username == f"{USUARIO_PREFIXO}_removivel")).one()
+
+
+def _verificar(resposta, status: int = 200):
+    if resposta.status_code != status:
+        raise SystemExit(f"Preparação falhou: {resposta.request.method} {resposta.request.url} -> {resposta.status_code} {resposta.text[:300]}")
+    return resposta
+
+
+# --- MEDIÇÃO ---
+def _chamar(cliente, caso: Caso, ctx: dict):
+    from database import contar_consultas
+
+    url, kwargs = caso.montar(ctx)
+    with contar_consultas() as comandos:
+        inicio = time.perf_counter()
+        resposta = cliente.request(caso.metodo, url, follow_redirects=False, **kwargs)
+        segundos = time.perf_counter() - inicio
+    return resposta, list(comandos), segundos
+
+
+def _esvaziar_caches():
+    from cache import user_cache, catalogo_cache
+
+    user_cache.clear()
+    catalogo_cache.clear()
+
+
+def medir(caso: Caso, clientes: dict, ctx: dict) -> dict:
+    cliente = clientes[caso.cliente]
+    _esvaziar_caches()
+    execucoes = [_chamar(cliente, caso, ctx) for _ in range(1 + REPETICOES if caso.repetir else 1)]
+    resposta, comandos, _ = max(execucoes, key=lambda execucao: len(execucao[1]))
+    if caso.guardar and resposta.status_code == caso.status:
+        caso.guardar(ctx, resposta)
+    quentes = execucoes[1:] or execucoes
+    return {
+        "status": resposta.status_code,
+        "corpo": resposta.text[:300],
+        "consultas": len(comandos),
+        "comandos": comandos,
+        "ms": median(segundos for *_, segundos in quentes) * 1000,
+    }
+
+
+def conferir(caso: Caso, resultado: dict, tempo: bool = True) -> List[str]:
+    """O que passou do limite (ou o status errado) numa medição de medir(); tempo=False ignora o teto de ms."""
+    maximo_consultas, maximo_ms = LIMITES.get((caso.metodo, caso.rota), (0, 0))
+    erros = []
+    if resultado["status"] != caso.status:
+        erros.append(f"status {resultado['status']} (esperado {caso.status}): {resultado['corpo']}")
+    if resultado["consultas"] > maximo_consultas:
+        erros.append(f"{resultado['consultas']} comandos SQL, limite {maximo_consultas}")
+    if tempo and resultado["ms"] > maximo_ms:
+        erros.append(f"{resultado['ms']:.0f} ms, limite {maximo_ms} ms")
+    return erros
+
+
+def verificar_cobertura(app) -> List[str]:
+    """Rotas do app sem limite em LIMITES e limites de rotas que não existem mais."""
+    from fastapi.routing import APIRoute
+
+    rotas = {(metodo, rota.path) for rota in app.routes if isinstance(rota, APIRoute) for metodo in rota.methods}
+    cobertas = {(caso.metodo, caso.rota) for caso in CASOS}
+    problemas = [f"{metodo} {rota}: rota sem limite em LIMITES" for metodo, rota in sorted(rotas - set(LIMITES))]
+    problemas += [f"{metodo} {rota}: limite de uma rota que não existe" for metodo, rota in sorted(set(LIMITES) - rotas)]
+    problemas += [f"{metodo} {rota}: nenhum caso chama esta rota" for metodo, rota in sorted(rotas - cobertas)]
+    return problemas
+
+
+def executar(orcamentos: int, mostrar_comandos: bool) -> int:
+    import app as aplicacao
+    from fastapi.testclient import TestClient
+
+    falhas = verificar_cobertura(aplicacao.app)
+    with TestClient(aplicacao.app) as usuario:  # O primeiro cliente roda o lifespan (tabelas, usuário admin)
+        clientes = {"usuario": usuario, "admin": TestClient(aplicacao.app), "anonimo": TestClient(aplicacao.app)}
+        ctx = semear(orcamentos)
+        preparar_casos(clientes, ctx)
+
+        print(f"{'rota':<58}{'consultas':>11}{'ms':>16}")
+        for caso in CASOS:
+            maximo_consultas, maximo_ms = LIMITES.get((caso.metodo, caso.rota), (0, 0))
+            resultado = medir(caso, clientes, ctx)
+            erros = conferir(caso, resultado)
+
+            nome = f"{caso.metodo} {caso.rota}"
+            marca = "FALHOU" if erros else "ok"
+            print(f"{nome:<58}{resultado['consultas']:>5}/{maximo_consultas:<5}{resultado['ms']:>8.0f}/{maximo_ms:<7}{marca}")
+            if erros or mostrar_comandos:
+                for erro in erros:
+                    print(f"    ! {erro}")
+                for numero, comando in enumerate(resultado["comandos"], 1):
+                    print(f"    {numero:>2}. {' '.join(comando.split())[:200]}")
+            falhas += [f"{nome}: {erro}" for erro in erros]
+
+    if falhas:
+        print(f"\n{len(falhas)} falha(s):")
+        for falha in falhas:
+            print(f"  - {falha}")
+        return 1
+    print("\nTodas as rotas dentro dos limites.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confere o limite de consultas SQL e de tempo de cada rota do app.")
+    parser.add_argument("--usar-banco", action="store_true", help="Usa o DATABASE_URL do ambiente em vez de um SQLite temporário")
+    parser.add_argument("--orcamentos", type=int, default=30, help="Orçamentos do usuário semeado (padrão: %(default)s)")
+    parser.add_argument("--comandos", action="store_true", help="Mostra os comandos SQL de todas as rotas, não só das que falharem")
+    argumentos = parser.parse_args()
+
+    # Antes de importar o app: o banco é escolhido na importação do database.py
+    if not argumentos.usar_banco:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'limites.db')}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["METRICAS_TOKEN"] = METRICAS_TOKEN
+    sys.exit(executar(argumentos.orcamentos, argumentos.comandos))
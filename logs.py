@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# --- LOGS ESTRUTURADOS ---
+# Uma linha JSON por evento em stdout. Quem chama o logger só enfileira: a escrita
+# (que pode bloquear se o stdout estiver lento) fica numa thread separada (QueueListener).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" em produção; "texto" é mais fácil de ler no terminal durante o desenvolvimento
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json")
+# Bibliotecas que falam demais em INFO (pool do SQLAlchemy, cliente HTTP)
+LOG_LEVEL_BIBLIOTECAS = os.getenv("LOG_LEVEL_BIBLIOTECAS", "WARNING").upper()
+BIBLIOTECAS = ("sqlalchemy", "httpx", "httpcore")
+
+# Id da requisição em andamento: entra em todos os logs emitidos durante ela
+id_requisicao: ContextVar[Optional[str]] = ContextVar("id_requisicao", default=None)
+
+# Atributos que todo LogRecord tem; o resto veio de extra={...} e vai para o JSON
+# (color_message é o extra que o uvicorn manda com códigos de cor do terminal)
+_CAMPOS_PADRAO = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "color_message"}
+
+
+def _extras(record: logging.LogRecord) -> dict:
+    return {
+        chave: valor for chave, valor in vars(record).items()
+        if chave not in _CAMPOS_PADRAO and not chave.startswith("_") and valor is not None
+    }
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extras(record),
+        }
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FormatadorTexto(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        texto = f"{record.levelname:<8} {record.name}: {record.getMessage()}"
+        extras = " ".join(f"{chave}={valor}" for chave, valor in _extras(record).items())
+        if extras:
+            texto = f"{texto} [{extras}]"
+        if record.exc_info:
+            texto = f"{texto}\n{self.formatException(record.exc_info)}"
+        return texto
+
+
+class AdicionarIdRequisicao(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = id_requisicao.get()
+        return True
+
+
+_ouvinte: Optional[logging.handlers.QueueListener] = None
+_pid_configurado: Optional[int] = None
+
+
+def configurar_logs():
+    """
+    Liga o logger raiz à fila. Uma vez por processo: num worker criado por fork
+    a thread de escrita do master não existe, então ela é criada de novo.
+    """
+    global _ouvinte, _pid_configurado
+    if _pid_configurado == os.getpid():
+        return
+    _pid_configurado = os.getpid()
+
+    fila = queue.SimpleQueue()
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(logging.Formatter("%(message)s"))  # A linha já chega formatada pela fila
+    _ouvinte = logging.handlers.QueueListener(fila, saida)
+    _ouvinte.start()
+
+    # A formatação acontece antes de enfileirar, na thread de quem logou: o id da
+    # requisição (contextvar) e o traceback só existem ali
+    enfileirar = logging.handlers.QueueHandler(fila)
+    enfileirar.setFormatter(FormatadorJSON() if LOG_FORMATO == "json" else FormatadorTexto())
+    enfileirar.addFilter(AdicionarIdRequisicao())
+
+    raiz = logging.getLogger()
+    raiz.handlers = [enfileirar]
+    raiz.setLevel(LOG_LEVEL)
+    for nome in BIBLIOTECAS:
+        logging.getLogger(nome).setLevel(LOG_LEVEL_BIBLIOTECAS)
+
+    # Os logs do uvicorn passam pelo mesmo caminho; o log de acesso dele é
+    # substituído pelo nosso (um JSON por requisição, com tempo de banco e usuário)
+    for nome in ("uvicorn", "uvicorn.error"):
+        logger = logging.getLogger(nome)
+        logger.handlers = []
+        logger.propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+
+def _encerrar_logs():
+    # Só a thread criada neste processo: depois do fork a do master não existe aqui
+    if _ouvinte is not None and _pid_configurado == os.getpid():
+        _ouvinte.stop()
+
+
+atexit.register(_encerrar_logs)
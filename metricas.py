@@ -0,0 +1,387 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+
+from logs import id_requisicao
+
+# --- MÉTRICAS NO FORMATO DO PROMETHEUS ---
+# Sem dependências: contadores e histogramas em memória, expostos em texto em /metrics.
+#
+# Com vários workers (gunicorn) cada processo tem os seus números. Se METRICAS_DIR
+# estiver definido (o gunicorn.conf.py define), cada worker grava um retrato em
+# METRICAS_DIR/<pid>.json e o /metrics soma os retratos de todos.
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_PDF_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_BYTES = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# nome -> (tipo, ajuda, limites do histograma)
+FAMILIAS = {
+    "http_requisicoes_total": ("counter", "Requisições HTTP por rota, método e status.", None),
+    "http_requisicao_segundos": ("histogram", "Duração das requisições HTTP por rota.", LIMITES_SEGUNDOS),
+    "db_consultas_por_requisicao": ("histogram", "Comandos SQL enviados ao banco por requisição.", LIMITES_CONSULTAS),
+    "pdf_render_segundos": ("histogram", "Tempo de geração do PDF por modelo.", LIMITES_PDF_SEGUNDOS),
+    "pdf_tamanho_bytes": ("histogram", "Tamanho do PDF gerado por modelo.", LIMITES_BYTES),
+    "pdf_modelos_total": ("counter", "Pedidos de modelo ao registro: já carregado (acerto) ou importado.", None),
+    "pdf_cache_imagens_total": ("counter", "Imagens dos modelos: da memória, do cache em disco ou decodificadas.", None),
+    "db_pool_conexoes": ("gauge", "Conexões do pool por estado.", None),
+    "db_pool_eventos_total": ("counter", "Eventos do pool de conexões.", None),
+    "db_pool_espera_segundos_total": ("counter", "Tempo somado esperando uma conexão livre no pool.", None),
+    "db_n_mais_1_total": ("counter", "Requisições em que a mesma consulta se repetiu N_MAIS_1_REPETICOES vezes ou mais.", None),
+}
+
+log_acesso = logging.getLogger("acesso")
+log_consultas = logging.getLogger("consultas")
+
+# --- DIAGNÓSTICO DE CONSULTAS ---
+# Desligados por padrão; em staging basta definir as variáveis de ambiente.
+# Consulta acima deste tempo vai para o log com os parâmetros (0 desliga)
+CONSULTA_LENTA_MS = float(os.getenv("CONSULTA_LENTA_MS", "0"))
+# Mesma consulta (mesmo SQL, parâmetros diferentes) repetida tantas vezes numa
+# requisição é provavelmente um lazy load dentro de um loop (0 desliga)
+N_MAIS_1_REPETICOES = int(os.getenv("N_MAIS_1_REPETICOES", "0"))
+LIMITE_TEXTO_LOG = 1000
+
+METRICAS_DIR = os.getenv("METRICAS_DIR")
+INTERVALO_RETRATO = 1.0
+ARQUIVO_ENCERRADOS = "encerrados.json"
+
+
+def _rotulos(**rotulos) -> str:
+    return ",".join(f'{chave}="{_escapar(str(valor))}"' for chave, valor in rotulos.items())
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metricas:
+    """Séries por família: {nome: {rótulos: valor}}; histogramas guardam [contagens..., soma]."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # As rotas 'def' e os PDFs rodam no threadpool
+        self.series: Dict[str, Dict[str, object]] = {nome: {} for nome in FAMILIAS}
+        self._ultimo_retrato = 0.0
+        self._retrato_agendado = False
+
+    def somar(self, nome: str, valor: float = 1, **rotulos):
+        chave = _rotulos(**rotulos)
+        with self._lock:
+            serie = self.series[nome]
+            serie[chave] = serie.get(chave, 0) + valor
+
+    def definir(self, nome: str, valor: float, **rotulos):
+        with self._lock:
+            self.series[nome][_rotulos(**rotulos)] = valor
+
+    def observar(self, nome: str, valor: float, **rotulos):
+        limites = FAMILIAS[nome][2]
+        chave = _rotulos(**rotulos)
+        with self._lock:
+            serie = self.series[nome]
+            contagens = serie.get(chave)
+            if contagens is None:
+                # Uma posição por limite, mais o +Inf e a soma no final
+                contagens = serie[chave] = [0] * (len(limites) + 2)
+            contagens[bisect_left(limites, valor)] += 1
+            contagens[-1] += valor
+
+    def retrato(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self.series))
+
+    # --- VÁRIOS PROCESSOS ---
+    def gravar_retrato(self, forcar: bool = False):
+        """Grava os números deste processo em METRICAS_DIR (no máximo uma vez por INTERVALO_RETRATO)."""
+        if not METRICAS_DIR:
+            return
+        espera = self._ultimo_retrato + INTERVALO_RETRATO - time.monotonic()
+        if espera > 0 and not forcar:
+            # Gravado há pouco: agenda para o fim do intervalo, senão as últimas
+            # requisições antes de o worker ficar ocioso não apareceriam no /metrics
+            if not self._retrato_agendado:
+                self._retrato_agendado = True
+                asyncio.get_running_loop().call_later(espera, self.gravar_retrato, True)
+            return
+        self._retrato_agendado = False
+        self._ultimo_retrato = time.monotonic()
+        atualizar_pool()
+        _gravar_json(os.path.join(METRICAS_DIR, f"{os.getpid()}.json"), self.retrato())
+
+
+def _gravar_json(caminho: str, dados: dict):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w") as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)  # Atômico: quem lê nunca pega um arquivo pela metade
+
+
+def _ler_json(caminho: str) -> Optional[dict]:
+    try:
+        with open(caminho) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _somar_series(destino: dict, origem: dict, incluir_gauges: bool = True):
+    for nome, serie in origem.items():
+        if nome not in FAMILIAS or (FAMILIAS[nome][0] == "gauge" and not incluir_gauges):
+            continue
+        alvo = destino.setdefault(nome, {})
+        for chave, valor in serie.items():
+            if isinstance(valor, list):
+                atual = alvo.setdefault(chave, [0] * len(valor))
+                alvo[chave] = [a + b for a, b in zip(atual, valor)]
+            else:
+                alvo[chave] = alvo.get(chave, 0) + valor
+
+
+def encerrar_processo(pid: int):
+    """
+    Chamado pelo master quando um worker sai (reciclagem, queda): soma os contadores
+    dele em ARQUIVO_ENCERRADOS, para os totais não voltarem atrás. Os gauges morrem junto.
+    """
+    if not METRICAS_DIR:
+        return
+    arquivo = os.path.join(METRICAS_DIR, f"{pid}.json")
+    dados = _ler_json(arquivo)
+    if dados is None:
+        return
+    caminho_encerrados = os.path.join(METRICAS_DIR, ARQUIVO_ENCERRADOS)
+    encerrados = _ler_json(caminho_encerrados) or {}
+    _somar_series(encerrados, dados, incluir_gauges=False)
+    _gravar_json(caminho_encerrados, encerrados)
+    os.remove(arquivo)
+
+
+def limpar_diretorio():
+    """Apaga os retratos de uma execução anterior (chamado pelo master ao subir)."""
+    if METRICAS_DIR and os.path.isdir(METRICAS_DIR):
+        for nome in os.listdir(METRICAS_DIR):
+            os.remove(os.path.join(METRICAS_DIR, nome))
+
+
+def series_agregadas() -> dict:
+    """Números deste processo, ou a soma de todos os workers quando há METRICAS_DIR."""
+    atualizar_pool()
+    if not METRICAS_DIR:
+        return metricas.retrato()
+    metricas.gravar_retrato(forcar=True)
+    total = {}
+    for nome in os.listdir(METRICAS_DIR):
+        if nome.endswith(".json"):
+            dados = _ler_json(os.path.join(METRICAS_DIR, nome))
+            if dados:
+                _somar_series(total, dados)
+    return total
+
+
+def texto_prometheus(series: dict) -> str:
+    linhas = []
+    for nome, (tipo, ajuda, limites) in FAMILIAS.items():
+        serie = series.get(nome) or {}
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for chave, valor in sorted(serie.items()):
+            if tipo != "histogram":
+                linhas.append(f"{nome}{{{chave}}} {_numero(valor)}" if chave else f"{nome} {_numero(valor)}")
+                continue
+            separador = "," if chave else ""
+            acumulado = 0
+            for limite, contagem in zip(limites + ("+Inf",), valor[:-1]):
+                acumulado += contagem
+                linhas.append(f'{nome}_bucket{{{chave}{separador}le="{limite}"}} {acumulado}')
+            linhas.append(f"{nome}_sum{{{chave}}} {_numero(valor[-1])}" if chave else f"{nome}_sum {_numero(valor[-1])}")
+            linhas.append(f"{nome}_count{{{chave}}} {acumulado}" if chave else f"{nome}_count {acumulado}")
+    return "\n".join(linhas) + "\n"
+
+
+def _numero(valor) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+metricas = Metricas()
+
+
+# --- POOL DE CONEXÕES ---
+def atualizar_pool():
+    from database import estado_pool
+
+    for pool, dados in estado_pool()["pools"].items():
+        for estado in ("tamanho", "em_uso", "livres", "overflow"):
+            metricas.definir("db_pool_conexoes", dados[estado], pool=pool, estado=estado)
+        for evento in ("conexoes_abertas", "checkouts", "invalidacoes", "timeouts"):
+            # Contadores do próprio pool: valor absoluto deste processo
+            metricas.definir("db_pool_eventos_total", dados[evento], pool=pool, evento=evento)
+        metricas.definir("db_pool_espera_segundos_total", dados["espera_total_s"], pool=pool)
+
+
+# --- CONSULTAS POR REQUISIÇÃO ---
+class ConsultasRequisicao:
+    """Consultas feitas durante uma requisição: quantidade, tempo e, se ligado, quantas vezes cada SQL se repetiu."""
+
+    __slots__ = ("quantidade", "segundos", "formas")
+
+    def __init__(self):
+        self.quantidade = 0
+        self.segundos = 0.0
+        self.formas: Optional[Dict[str, int]] = {} if N_MAIS_1_REPETICOES else None
+
+    def repetidas(self) -> Dict[str, int]:
+        """SQL -> repetições, só as que passaram de N_MAIS_1_REPETICOES."""
+        if not self.formas:
+            return {}
+        return {sql: vezes for sql, vezes in self.formas.items() if vezes >= N_MAIS_1_REPETICOES}
+
+
+# O run_in_threadpool copia o contexto, então as rotas 'def' somam no mesmo objeto
+consultas_requisicao: ContextVar[Optional[ConsultasRequisicao]] = ContextVar("consultas_requisicao", default=None)
+
+# Listas de placeholders do IN (...) expandido: o tamanho muda com a quantidade de valores
+_LISTA_PLACEHOLDERS = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)\s*,?)+\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def forma_sql(statement: str) -> str:
+    """SQL sem as diferenças que não mudam a consulta (tamanho do IN, espaços)."""
+    return _ESPACOS.sub(" ", _LISTA_PLACEHOLDERS.sub("(?)", statement)).strip()
+
+
+def _resumir(valor) -> str:
+    texto = repr(valor)
+    return texto if len(texto) <= LIMITE_TEXTO_LOG else texto[:LIMITE_TEXTO_LOG] + "..."
+
+
+def _antes_da_consulta(conn, *_):
+    if CONSULTA_LENTA_MS or consultas_requisicao.get() is not None:
+        conn.info["inicio_consulta"] = time.perf_counter()
+
+
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop("inicio_consulta", None)
+    if inicio is None:
+        return
+    duracao = time.perf_counter() - inicio
+    consultas = consultas_requisicao.get()
+    if consultas is not None:
+        consultas.quantidade += 1
+        consultas.segundos += duracao
+        if consultas.formas is not None:
+            forma = forma_sql(statement)
+            consultas.formas[forma] = consultas.formas.get(forma, 0) + 1
+    if CONSULTA_LENTA_MS and duracao * 1000 >= CONSULTA_LENTA_MS:
+        log_consultas.warning(
+            "Consulta lenta: %.1f ms", duracao * 1000,
+            extra={
+                "duracao_ms": round(duracao * 1000, 2),
+                "sql": forma_sql(statement)[:LIMITE_TEXTO_LOG],
+                "parametros": _resumir(parameters),
+                "executemany": executemany or None,
+            },
+        )
+
+
+def registrar_contagem_consultas(*engines):
+    from sqlalchemy import event
+
+    for engine_alvo in engines:
+        alvo = getattr(engine_alvo, "sync_engine", engine_alvo)
+        event.listen(alvo, "before_cursor_execute", _antes_da_consulta)
+        event.listen(alvo, "after_cursor_execute", _depois_da_consulta)
+
+
+# --- MIDDLEWARE ---
+def _rota(scope, root_path_original: str) -> str:
+    rota = getattr(scope.get("route"), "path", None)
+    if rota:
+        return rota
+    # Montagens (ex.: /static) não marcam a rota, mas acrescentam o prefixo ao root_path
+    prefixo = scope.get("root_path", "")[len(root_path_original):]
+    return f"{prefixo}/{{path}}" if prefixo else "nao_encontrada"
+
+
+def _id_recebido(scope) -> Optional[str]:
+    """X-Request-ID vindo do proxy, se for curto e seguro para ir para o log."""
+    for nome, valor in scope["headers"]:
+        if nome == b"x-request-id":
+            valor = valor.decode("latin-1")
+            if 0 < len(valor) <= 64 and valor.replace("-", "").replace("_", "").isalnum():
+                return valor
+    return None
+
+
+class MedirRequisicoes:
+    """
+    Instrumentação de cada requisição: métricas por rota (o modelo da rota, não a URL,
+    para não explodir os rótulos) e uma linha de log de acesso com id, usuário, status,
+    duração e tempo/quantidade de consultas ao banco.
+    """
+
+    def __init__(self, app, ignorar: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.ignorar = ignorar
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.ignorar:
+            return await self.app(scope, receive, send)
+
+        inicio = time.perf_counter()
+        root_path = scope.get("root_path", "")
+        status = [500]  # Se a rota estourar uma exceção, quem responde é o middleware de erro
+        consultas = ConsultasRequisicao()
+        token_consultas = consultas_requisicao.set(consultas)
+        request_id = _id_recebido(scope) or uuid4().hex
+        token_id = id_requisicao.set(request_id)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = mensagem["status"]
+                mensagem.setdefault("headers", [])
+                mensagem["headers"] = [*mensagem["headers"], (b"x-request-id", request_id.encode())]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            rota = _rota(scope, root_path)
+            metodo = scope["method"]
+            metricas.somar("http_requisicoes_total", metodo=metodo, rota=rota, status=status[0])
+            metricas.observar("http_requisicao_segundos", duracao, metodo=metodo, rota=rota)
+            metricas.observar("db_consultas_por_requisicao", consultas.quantidade, metodo=metodo, rota=rota)
+            log_acesso.log(
+                logging.ERROR if status[0] >= 500 else logging.INFO,
+                "%s %s %s", metodo, scope["path"], status[0],
+                extra={
+                    "request_id": request_id,
+                    "user_id": (scope.get("session") or {}).get("user_id"),
+                    "metodo": metodo,
+                    "rota": rota,
+                    "status": status[0],
+                    "duracao_ms": round(duracao * 1000, 2),
+                    "db_ms": round(consultas.segundos * 1000, 2),
+                    "consultas": consultas.quantidade,
+                },
+            )
+            repetidas = consultas.repetidas()
+            if repetidas:
+                metricas.somar("db_n_mais_1_total", metodo=metodo, rota=rota)
+            for sql, vezes in repetidas.items():
+                log_consultas.warning(
+                    "Provável N+1: a mesma consulta rodou %d vezes em %s %s", vezes, metodo, rota,
+                    extra={"rota": rota, "repeticoes": vezes, "sql": sql[:LIMITE_TEXTO_LOG]},
+                )
+            consultas_requisicao.reset(token_consultas)
+            id_requisicao.reset(token_id)
+            metricas.gravar_retrato()
@@ -1,19 +1,38 @@
 from typing import Optional, List, Any
 from sqlmodel import Field, SQLModel, JSON, Column, Relationship
+from sqlalchemy import DateTime, Index, event, text
 from datetime import datetime
 import json
 
-# --- Modelo Item (Sem alterações) ---
+from normalizacao import normalizar_texto, normalizar_telefone
+
+# --- Modelo Item ---
 class Item(SQLModel, table=True):
+    # Índices da busca por prefixo (o índice trigram do Postgres fica na migração, pois depende do pg_trgm)
+    __table_args__ = (
+        Index("ix_item_user_id_nome_busca", "user_id", "nome_busca", postgresql_ops={"nome_busca": "varchar_pattern_ops"}),
+        Index("ix_item_user_id_ncm", "user_id", "ncm", postgresql_ops={"ncm": "varchar_pattern_ops"}),
+        # Um nome por tipo no catálogo de cada usuário (sem diferenciar maiúsculas); alvo do upsert da importação
+        Index("uq_item_user_id_tipo_nome", "user_id", "tipo", text("lower(nome)"), unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     tipo: str
     nome: str
     valor: float
     ncm: Optional[str] = Field(default=None, index=True)
+    # Nome normalizado (sem acentos, minúsculo) para a busca; preenchido automaticamente
+    nome_busca: Optional[str] = Field(default=None)
     user_id: Optional[int] = Field(default=None, foreign_key="user.id")
     user: Optional["User"] = Relationship(back_populates="itens")
 
 
+@event.listens_for(Item, "before_insert")
+@event.listens_for(Item, "before_update")
+def preencher_nome_busca(mapper, connection, item: Item):
+    item.nome_busca = normalizar_texto(item.nome)
+
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
@@ -27,6 +46,9 @@ class User(SQLModel, table=True):
     tem_funcao_analise_custo: bool = Field(default=False)
 
     contador_orcamento_override: Optional[int] = Field(default=None)
+    # Sobe a cada mudança no catálogo (mesma transação); é a versão/ETag do /api/catalogo/
+    # e diz a qualquer worker se o catálogo que ele tem em memória ainda vale
+    catalogo_revisao: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     
     # --- Relacionamentos existentes (não mude) ---
     itens: List["Item"] = Relationship(back_populates="user")
@@ -36,8 +58,19 @@ class User(SQLModel, table=True):
 # --- Modelo Cliente ---
 
 class Cliente(SQLModel, table=True):
+    # Índices usados para achar um cliente já cadastrado pelo nome ou pelo telefone (importação, deduplicação)
+    __table_args__ = (
+        # Um cliente por nome normalizado em cada usuário; alvo do upsert ao salvar orçamentos
+        Index("uq_cliente_user_id_nome_key", "user_id", "nome_key", unique=True),
+        Index("ix_cliente_user_id_telefone_key", "user_id", "telefone_key"),
+        Index("ix_cliente_user_id_nome", "user_id", "nome"),  # Listagem paginada em ordem alfabética
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     nome: str
+    # Chaves normalizadas para deduplicação; preenchidas automaticamente
+    nome_key: Optional[str] = Field(default=None)
+    telefone_key: Optional[str] = Field(default=None)
     telefone: Optional[str] = Field(default=None)
     cep: Optional[str] = Field(default=None)
     logradouro: Optional[str] = Field(default=None)
@@ -52,6 +85,13 @@ class Cliente(SQLModel, table=True):
 
     contatos: List["Contato"] = Relationship(back_populates="cliente", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
+
+@event.listens_for(Cliente, "before_insert")
+@event.listens_for(Cliente, "before_update")
+def preencher_chaves_cliente(mapper, connection, cliente: Cliente):
+    cliente.nome_key = normalizar_texto(cliente.nome)
+    cliente.telefone_key = normalizar_telefone(cliente.telefone) or None
+
 # --- Modelo Orcamento (Atualizado) ---
 class Orcamento(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -77,6 +117,8 @@ class Orcamento(SQLModel, table=True):
     observacoes: Optional[str] = Field(default=None)
     status: Optional[str] = Field(default="Orçamento", index=True)
     contatos_extras: List["ContatoOrcamento"] = Relationship(back_populates="orcamento", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    # Cópia relacional de 'itens' (o JSON continua sendo o que os PDFs leem)
+    linhas_itens: List["OrcamentoItem"] = Relationship(back_populates="orcamento", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     despesas_extras: Optional[Any] = Field(default=None, sa_column=Column(JSON))
 
     valor_obra_total: Optional[float] = Field(default=None)
@@ -119,7 +161,7 @@ class Contato(SQLModel, table=True):
     email: Optional[str] = Field(default=None)
     
     # Chave estrangeira para ligar o contato ao cliente.
-    cliente_id: Optional[int] = Field(default=None, foreign_key="cliente.id")
+    cliente_id: Optional[int] = Field(default=None, foreign_key="cliente.id", index=True)
     
     # A Relação que permite, a partir de um Contato,
     # saber a qual Cliente ele pertence.
@@ -132,7 +174,59 @@ class ContatoOrcamento(SQLModel, table=True):
     email: Optional[str] = Field(default=None)
 
     orcamento_id: Optional[int] = Field(default=None, foreign_key="orcamento.id")
-    orcamento: Optional["Orcamento"] = Relationship(back_populates="contatos_extras")    
+    orcamento: Optional["Orcamento"] = Relationship(back_populates="contatos_extras")
 
 
- 
\ No newline at end of file
+# --- Modelo OrcamentoItem ---
+# Uma linha por item do orçamento, gravada junto com o JSON 'Orcamento.itens'.
+# Serve para relatórios em SQL (quais orçamentos usam o material X, total por serviço, etc.)
+class OrcamentoItem(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_orcamentoitem_orcamento_id_posicao", "orcamento_id", "posicao"),
+        Index("ix_orcamentoitem_tipo_nome", "tipo", "nome"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    posicao: int  # Ordem do item dentro do orçamento (0, 1, 2...)
+    tipo: str
+    nome: str
+    quantidade: float
+    unidade: Optional[str] = Field(default=None)
+    valor: float
+    ncm: Optional[str] = Field(default=None)
+    topicos: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
+
+    orcamento_id: int = Field(foreign_key="orcamento.id", ondelete="CASCADE")
+    orcamento: Optional["Orcamento"] = Relationship(back_populates="linhas_itens")
+
+    # Item do catálogo com o mesmo tipo e nome, se existir
+    item_id: Optional[int] = Field(default=None, foreign_key="item.id", ondelete="SET NULL", index=True)
+
+
+# --- Modelo ResumoMensal ---
+# Totais dos orçamentos por usuário, mês de emissão e status, mantidos incrementalmente
+# pelas rotas que criam/alteram/apagam orçamentos (ver resumo.py). Alimenta o dashboard.
+class ResumoMensal(SQLModel, table=True):
+    __table_args__ = (
+        Index("uq_resumomensal_user_id_mes_status", "user_id", "mes", "status", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", ondelete="CASCADE")  # Vai junto quando o usuário é apagado
+    mes: str  # "AAAA-MM", a partir de Orcamento.data_emissao
+    status: str
+    quantidade: int = Field(default=0)
+    total_geral: float = Field(default=0)
+    total_servicos: float = Field(default=0)
+    total_materiais: float = Field(default=0)
+
+
+# --- Modelo ChaveIdempotencia ---
+# Resposta já enviada para um 'Idempotency-Key' (ex.: o celular reenviou o mesmo "Salvar").
+# Entradas expiram após IDEMPOTENCIA_TTL_HORAS e são apagadas por idempotencia.limpar_expiradas.
+class ChaveIdempotencia(SQLModel, table=True):
+    user_id: int = Field(foreign_key="user.id", primary_key=True, ondelete="CASCADE")
+    chave: str = Field(primary_key=True, max_length=128)
+    status_code: int
+    resposta: Any = Field(sa_column=Column(JSON))
+    criado_em: datetime = Field(sa_type=DateTime(timezone=True), index=True)
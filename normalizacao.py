@@ -0,0 +1,27 @@
+import re
+import unicodedata
+from typing import Optional
+
+
+def normalizar_texto(texto: Optional[str]) -> str:
+    """
+    Forma canônica usada em buscas e comparações de nomes:
+    minúsculas, sem acentos e com espaços colapsados ("  Tubulação  PVC" -> "tubulacao pvc").
+    """
+    if not texto:
+        return ""
+    sem_acentos = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in sem_acentos if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sem_acentos).strip().lower()
+
+
+def somente_digitos(texto: Optional[str]) -> str:
+    return "".join(filter(str.isdigit, texto or ""))
+
+
+def normalizar_telefone(telefone: Optional[str]) -> str:
+    """Só os dígitos do telefone, sem o código do país: '+55 (19) 99999-0000' -> '19999990000'."""
+    digitos = somente_digitos(telefone)
+    if digitos.startswith("55") and len(digitos) in (12, 13):
+        digitos = digitos[2:]
+    return digitos
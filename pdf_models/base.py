@@ -0,0 +1,117 @@
+import os
+import pickle
+import hashlib
+import threading
+
+from fpdf import FPDF
+
+from metricas import metricas
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+# Imagens já decodificadas, em disco: sobrevivem ao restart (a máquina escala a zero).
+# O Dockerfile preenche esta pasta no build com 'python -m pdf_models.base'.
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(BASE_DIR, '.cache', 'pdf_imagens'))
+
+
+class PDFBase(FPDF):
+    """
+    FPDF que guarda as imagens fixas do modelo (fundo, logo) já decodificadas.
+    O fpdf 1.7 decodifica o PNG de novo a cada documento, e um fundo de página
+    inteira com transparência leva segundos; aqui isso acontece uma vez por processo.
+
+    O cache é da classe do modelo: quando o registro descarta um modelo ocioso,
+    a classe e as imagens dela vão embora juntas.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.imagens_decodificadas = {}
+        cls._lock_imagens = threading.Lock()
+
+    @classmethod
+    def tamanho_recursos(cls) -> int:
+        """Bytes das imagens decodificadas guardadas por este modelo."""
+        return sum(len(info['data']) + len(info.get('smask', b'')) for info in cls.imagens_decodificadas.values())
+
+    def _parsepng(self, name):
+        return self._decodificar(name, super()._parsepng)
+
+    def _parsejpg(self, name):
+        return self._decodificar(name, super()._parsejpg)
+
+    @classmethod
+    def aquecer(cls, caminhos) -> int:
+        """Decodifica as imagens de antemão (ex.: no master do gunicorn, antes do fork dos workers)."""
+        pdf = FPDF()
+        decodificadores = {'png': pdf._parsepng, 'jpg': pdf._parsejpg, 'jpeg': pdf._parsejpg}
+        aquecidas = 0
+        for caminho in caminhos:
+            decodificador = decodificadores.get(caminho.lower().rsplit('.', 1)[-1])
+            if decodificador and os.path.isfile(caminho):
+                cls._decodificar(caminho, decodificador)
+                aquecidas += 1
+        return aquecidas
+
+    @classmethod
+    def _decodificar(cls, name, decodificador):
+        # Só os arquivos do projeto: imagens temporárias (ex.: QR Code do PIX) mudam a cada PDF
+        if not os.path.realpath(name).startswith(STATIC_DIR + os.sep):
+            return decodificador(name)
+        info = cls.imagens_decodificadas.get(name)
+        if info is not None:
+            metricas.somar("pdf_cache_imagens_total", resultado="memoria")
+        else:
+            with cls._lock_imagens:
+                info = cls.imagens_decodificadas.get(name)
+                if info is None:
+                    info = decodificar_com_cache(name, decodificador)
+                    cls.imagens_decodificadas[name] = info
+        # Cópia rasa: o fpdf grava 'i'/'n' e apaga 'data'/'smask' do dicionário ao fechar o documento
+        return dict(info)
+
+
+def _arquivo_cache(caminho: str) -> str:
+    # Tamanho e data de modificação na chave: trocar a imagem invalida o cache sozinho
+    estado = os.stat(caminho)
+    chave = f"{os.path.relpath(os.path.realpath(caminho), BASE_DIR)}:{estado.st_size}:{estado.st_mtime_ns}"
+    return os.path.join(PDF_CACHE_DIR, hashlib.sha1(chave.encode()).hexdigest() + '.pkl')
+
+
+def decodificar_com_cache(caminho: str, decodificador) -> dict:
+    """Lê a imagem decodificada do cache em disco ou decodifica e grava (se a pasta for gravável)."""
+    arquivo = _arquivo_cache(caminho)
+    try:
+        with open(arquivo, 'rb') as f:
+            info = pickle.load(f)
+        metricas.somar("pdf_cache_imagens_total", resultado="disco")
+        return info
+    except (OSError, pickle.PickleError, EOFError):
+        pass
+    info = decodificador(caminho)
+    metricas.somar("pdf_cache_imagens_total", resultado="decodificada")
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        temporario = f"{arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as f:
+            pickle.dump(info, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, arquivo)  # Atômico: outro worker nunca lê um arquivo pela metade
+    except OSError:
+        pass
+    return info
+
+
+if __name__ == '__main__':
+    # Pré-decodifica todas as imagens dos modelos (usado no build da imagem Docker)
+    pdf = FPDF()
+    for pasta, _, arquivos in os.walk(STATIC_DIR):
+        for nome in sorted(arquivos):
+            caminho = os.path.join(pasta, nome)
+            extensao = nome.lower().rsplit('.', 1)[-1]
+            if extensao == 'png':
+                decodificar_com_cache(caminho, pdf._parsepng)
+            elif extensao in ('jpg', 'jpeg'):
+                decodificar_com_cache(caminho, pdf._parsejpg)
+            else:
+                continue
+            print(f"Decodificada: {os.path.relpath(caminho, BASE_DIR)}")
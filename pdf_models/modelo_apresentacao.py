@@ -1,5 +1,5 @@
 import os, qrcode, tempfile
-from fpdf import FPDF
+from pdf_models.base import PDFBase
 from models import Orcamento
 from io import BytesIO
 from pixqrcode import PixQrCode
@@ -53,7 +53,7 @@ def format_brl_cacador(value): # Renomeado para evitar conflitos se você import
         return "R$ 0,00"
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-class ApresentacaoPDF(FPDF):
+class ApresentacaoPDF(PDFBase):
     def __init__(self, *args, orcamento: Orcamento, **kwargs):
         super().__init__(*args, **kwargs)
         self.add_font("DejaVu", "", "fonts/DejaVuSans.ttf", uni=True)
@@ -1,5 +1,5 @@
 import os, qrcode, tempfile, json, re, html
-from fpdf import FPDF
+from pdf_models.base import PDFBase
 from models import Orcamento
 from io import BytesIO
 from pixqrcode import PixQrCode
@@ -27,7 +27,7 @@ def clean_text(text):
     # Retorna o texto puro, sem tentar converter para latin-1
     return str(text)
 
-class CacadorPDF(FPDF):
+class CacadorPDF(PDFBase):
     def __init__(self, *args, orcamento: Orcamento, **kwargs):
         super().__init__(*args, **kwargs)
         self.orcamento = orcamento
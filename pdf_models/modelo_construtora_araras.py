@@ -1,5 +1,5 @@
 import os, qrcode, tempfile, json, re
-from fpdf import FPDF
+from pdf_models.base import PDFBase
 from models import Orcamento
 from io import BytesIO
 from pixqrcode import PixQrCode
@@ -26,7 +26,7 @@ def format_brl_construtora_araras(value): # Renomeado para evitar conflitos se v
         return "R$ 0,00"
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-class Construtora_ArarasPDF(FPDF):
+class Construtora_ArarasPDF(PDFBase):
     def __init__(self, *args, orcamento: Orcamento, **kwargs):
         super().__init__(*args, **kwargs)
         self.add_font("DejaVu", "", "fonts/DejaVuSans.ttf", uni=True)
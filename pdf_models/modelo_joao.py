@@ -1,7 +1,7 @@
 import os
 import re
 import json
-from fpdf import FPDF
+from pdf_models.base import PDFBase
 from models import Orcamento
 
 
@@ -20,7 +20,7 @@ TABLE_TOTAL_WIDTH = sum(TABLE_COL_WIDTHS)
 def format_brl(value):
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X",".")
 
-class JoaoPDF(FPDF):
+class JoaoPDF(PDFBase):
     def __init__(self, *args, orcamento: Orcamento, **kwargs):
         super().__init__(*args, **kwargs)
         self.add_font("DejaVu", "", "fonts/DejaVuSans.ttf", uni=True)
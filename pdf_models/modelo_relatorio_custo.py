@@ -1,6 +1,6 @@
 # Em: pdf_models/modelo_relatorio_custo.py
 
-from fpdf import FPDF
+from pdf_models.base import PDFBase
 from models import Orcamento
 import os
 from datetime import datetime
@@ -18,7 +18,7 @@ def format_brl_relatorio(value):
         return f"(R$ {abs(value):,.2f})".replace(",", "X").replace(".", ",").replace("X", ".")
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-class RelatorioCustoPDF(FPDF):
+class RelatorioCustoPDF(PDFBase):
     def __init__(self, *args, orcamento: Orcamento, **kwargs):
         super().__init__(*args, **kwargs)
         self.orcamento = orcamento
@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import logging
+import pkgutil
+import importlib
+import threading
+from functools import wraps
+from importlib.metadata import entry_points
+from typing import Callable, Dict, List, Optional
+
+from metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+# Grupo de entry points para modelos instalados como pacote à parte:
+#   [project.entry-points."orcamento.pdf_templates"]
+#   minha_empresa = "meu_pacote.pdf:gerar_pdf"
+GRUPO_ENTRY_POINTS = "orcamento.pdf_templates"
+
+MODELO_PADRAO = "apresentacao"
+# Modelos usados pela aplicação mas que o usuário não escolhe como modelo de orçamento
+MODELOS_INTERNOS = {"relatorio_custo"}
+
+# Modelo sem uso há mais tempo que isso é descartado (módulo, classes e imagens decodificadas). 0 desliga.
+PDF_TEMPLATE_OCIOSO = float(os.getenv("PDF_TEMPLATE_OCIOSO_MIN", "60")) * 60
+INTERVALO_LIMPEZA = 60
+
+
+def medir_geracao(nome: str, funcao: Callable) -> Callable:
+    """Envolve a função geradora para registrar tempo e tamanho do PDF (métricas em /metrics)."""
+
+    @wraps(funcao)
+    def gerar(*args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        metricas.observar("pdf_render_segundos", time.perf_counter() - inicio, modelo=nome)
+        destino = kwargs.get("file_path", args[0] if args else None)
+        if hasattr(destino, "getbuffer"):
+            metricas.observar("pdf_tamanho_bytes", destino.getbuffer().nbytes, modelo=nome)
+        return resultado
+
+    return gerar
+
+
+class ModeloCarregado:
+    def __init__(self, nome: str, modulo, funcao: Callable, segundos_carga: float):
+        self.nome = nome
+        self.modulo = modulo
+        self.funcao = funcao
+        self.segundos_carga = segundos_carga
+        self.carregado_em = time.monotonic()
+        self.ultimo_uso = self.carregado_em
+        self.usos = 0
+        self.fixo = False  # Aquecido no preload: compartilhado entre os workers, não é descartado por ociosidade
+
+    def classes_pdf(self) -> list:
+        from pdf_models.base import PDFBase
+
+        return [
+            valor for valor in vars(self.modulo).values()
+            if isinstance(valor, type) and issubclass(valor, PDFBase) and valor.__module__ == self.modulo.__name__
+        ]
+
+    def tamanho_recursos(self) -> int:
+        """Bytes das imagens decodificadas pelas classes de PDF deste modelo."""
+        return sum(classe.tamanho_recursos() for classe in self.classes_pdf())
+
+    def aquecer(self) -> int:
+        """Decodifica as imagens que o módulo declara em constantes (fundo, logo...)."""
+        caminhos = [valor for valor in vars(self.modulo).values() if isinstance(valor, str) and os.path.isfile(valor)]
+        return sum(classe.aquecer(caminhos) for classe in self.classes_pdf())
+
+
+class RegistroPDF:
+    """
+    Modelos de PDF por nome. Nada é importado até alguém gerar um PDF com o modelo:
+    a descoberta só lista os módulos 'pdf_models/modelo_<nome>.py' (com a função
+    'gerar_pdf_<nome>') e os entry points do grupo GRUPO_ENTRY_POINTS.
+
+    Cada modelo carregado mantém seu estado aquecido (classes, fontes, imagens
+    decodificadas) até ficar ocioso por PDF_TEMPLATE_OCIOSO segundos.
+    """
+
+    def __init__(self, pacote: str = "pdf_models", padrao: str = MODELO_PADRAO, ociosidade: float = PDF_TEMPLATE_OCIOSO):
+        self.pacote = pacote
+        self.padrao = padrao
+        self.ociosidade = ociosidade
+        self._caminhos: Optional[Dict[str, str]] = None
+        self._carregados: Dict[str, ModeloCarregado] = {}
+        self._lock = threading.RLock()  # As rotas 'def' e a geração de PDF rodam no threadpool
+        self._ultima_limpeza = time.monotonic()
+
+    def _descobrir(self) -> Dict[str, str]:
+        """Nome -> 'módulo:função', sem importar nenhum modelo."""
+        if self._caminhos is None:
+            with self._lock:
+                if self._caminhos is None:
+                    caminhos = {}
+                    for ep in entry_points(group=GRUPO_ENTRY_POINTS):
+                        caminhos[ep.name] = ep.value
+                    # Os modelos do próprio projeto têm prioridade sobre os instalados
+                    pacote = importlib.import_module(self.pacote)
+                    for info in pkgutil.iter_modules(pacote.__path__):
+                        if info.name.startswith("modelo_"):
+                            nome = info.name[len("modelo_"):]
+                            caminhos[nome] = f"{self.pacote}.{info.name}:gerar_pdf_{nome}"
+                    self._caminhos = caminhos
+        return self._caminhos
+
+    def nomes(self) -> List[str]:
+        """Modelos que o usuário pode escolher."""
+        return sorted(nome for nome in self._descobrir() if nome not in MODELOS_INTERNOS)
+
+    def existe(self, nome: str) -> bool:
+        return nome in self._descobrir()
+
+    def obter(self, nome: Optional[str]) -> Callable:
+        """Função geradora do modelo (o padrão se o nome não existir), importando-o se preciso."""
+        if not nome or not self.existe(nome):
+            nome = self.padrao
+        with self._lock:
+            modelo = self._carregados.get(nome)
+            metricas.somar("pdf_modelos_total", resultado="importado" if modelo is None else "acerto")
+            if modelo is None:
+                modelo = self._carregar(nome)
+            modelo.ultimo_uso = time.monotonic()
+            modelo.usos += 1
+            self._limpar_se_preciso()
+        return modelo.funcao
+
+    def aquecer(self, nomes: List[str]) -> List[str]:
+        """
+        Importa os modelos e decodifica as imagens deles sem contar como uso.
+        Com o preload do gunicorn isso roda uma vez no master e os workers herdam tudo.
+        """
+        aquecidos = []
+        for nome in nomes:
+            if not self.existe(nome):
+                logger.warning("Modelo de PDF '%s' não encontrado para aquecer.", nome)
+                continue
+            with self._lock:
+                modelo = self._carregados.get(nome) or self._carregar(nome)
+            modelo.aquecer()
+            modelo.fixo = True
+            aquecidos.append(nome)
+        return aquecidos
+
+    def _carregar(self, nome: str) -> ModeloCarregado:
+        caminho_modulo, funcao = self._descobrir()[nome].split(":")
+        inicio = time.perf_counter()
+        modulo = importlib.import_module(caminho_modulo)
+        modelo = ModeloCarregado(nome, modulo, medir_geracao(nome, getattr(modulo, funcao)), time.perf_counter() - inicio)
+        self._carregados[nome] = modelo
+        logger.info("Modelo de PDF '%s' carregado em %.3fs.", nome, modelo.segundos_carga, extra={"modelo": nome})
+        return modelo
+
+    def descartar(self, nome: str) -> bool:
+        """Esquece o modelo carregado; o próximo uso importa o módulo de novo."""
+        with self._lock:
+            modelo = self._carregados.pop(nome, None)
+            if modelo is None:
+                return False
+            nome_modulo = modelo.modulo.__name__
+            # Um mesmo módulo pode atender mais de um nome (entry points)
+            if not any(m.modulo.__name__ == nome_modulo for m in self._carregados.values()):
+                sys.modules.pop(nome_modulo, None)
+                pai, _, filho = nome_modulo.rpartition(".")
+                if pai in sys.modules and getattr(sys.modules[pai], filho, None) is modelo.modulo:
+                    delattr(sys.modules[pai], filho)
+            logger.info("Modelo de PDF '%s' descartado.", nome, extra={"modelo": nome})
+            return True
+
+    def descartar_ociosos(self, ociosidade: Optional[float] = None) -> List[str]:
+        ociosidade = self.ociosidade if ociosidade is None else ociosidade
+        limite = time.monotonic() - ociosidade
+        with self._lock:
+            ociosos = [nome for nome, modelo in self._carregados.items() if modelo.ultimo_uso < limite and not modelo.fixo]
+            for nome in ociosos:
+                self.descartar(nome)
+        return ociosos
+
+    def _limpar_se_preciso(self):
+        agora = time.monotonic()
+        if self.ociosidade <= 0 or agora - self._ultima_limpeza < INTERVALO_LIMPEZA:
+            return
+        self._ultima_limpeza = agora
+        self.descartar_ociosos()
+
+    def estado(self) -> dict:
+        """Modelos disponíveis e o estado dos que estão carregados neste processo."""
+        agora = time.monotonic()
+        with self._lock:
+            carregados = {
+                nome: {
+                    "usos": modelo.usos,
+                    "carga_s": round(modelo.segundos_carga, 4),
+                    "carregado_ha_s": round(agora - modelo.carregado_em, 1),
+                    "ocioso_ha_s": round(agora - modelo.ultimo_uso, 1),
+                    "recursos_bytes": modelo.tamanho_recursos(),
+                    "fixo": modelo.fixo,
+                }
+                for nome, modelo in self._carregados.items()
+            }
+        return {"disponiveis": sorted(self._descobrir()), "carregados": carregados, "ociosidade_s": self.ociosidade}
+
+
+registro_pdf = RegistroPDF()
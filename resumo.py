@@ -0,0 +1,161 @@
+"""
+Resumo mensal dos orçamentos (tabela ResumoMensal), usado pelo dashboard.
+
+Cada orçamento "contribui" com uma linha (user_id, mês, status) do resumo. Ao criar,
+alterar ou apagar um orçamento, as rotas calculam a contribuição de antes e a de depois
+e aplicam só a diferença, com um upsert por linha afetada. Se o resumo sair de sincronia
+(ex.: alteração feita direto no banco), reconstrua tudo com:
+
+    python resumo.py
+"""
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, literal, select
+from sqlmodel import Session
+
+from database import insert_upsert
+from models import Orcamento, OrcamentoItem, ResumoMensal
+
+STATUS_PADRAO = "Orçamento"
+CAMPOS_SOMADOS = ("quantidade", "total_geral", "total_servicos", "total_materiais")
+
+
+def mes_da_emissao(data_emissao: Optional[str]) -> str:
+    """'19/10/2026' -> '2026-10' (mesma regra do SQL de reconstrução)."""
+    data = data_emissao or ""
+    return f"{data[6:10]}-{data[3:5]}"
+
+
+def contribuicao(orcamento: Orcamento) -> dict:
+    """Quanto um orçamento soma no resumo, no estado atual do objeto."""
+    total_servicos = total_materiais = 0.0
+    for item in orcamento.itens or []:
+        subtotal = float(item.get("quantidade") or 0) * float(item.get("valor") or 0)
+        if item.get("tipo") == "servico":
+            total_servicos += subtotal
+        elif item.get("tipo") == "material":
+            total_materiais += subtotal
+    return {
+        "user_id": orcamento.user_id,
+        "mes": mes_da_emissao(orcamento.data_emissao),
+        "status": orcamento.status or STATUS_PADRAO,
+        "quantidade": 1,
+        "total_geral": float(orcamento.total_geral or 0),
+        "total_servicos": total_servicos,
+        "total_materiais": total_materiais,
+    }
+
+
+def _chave(c: dict):
+    return c["user_id"], c["mes"], c["status"]
+
+
+def instrucoes_ajuste(session, antes: Optional[dict], depois: Optional[dict]) -> list:
+    """
+    Monta os upserts que levam o resumo de 'antes' para 'depois'
+    (antes=None: orçamento novo; depois=None: orçamento apagado).
+    """
+    deltas = {}
+    for contrib, sinal in ((antes, -1), (depois, 1)):
+        if contrib is None:
+            continue
+        delta = deltas.setdefault(_chave(contrib), dict.fromkeys(CAMPOS_SOMADOS, 0))
+        for campo in CAMPOS_SOMADOS:
+            delta[campo] += sinal * contrib[campo]
+
+    instrucoes = []
+    for (user_id, mes, status), delta in deltas.items():
+        if not any(delta.values()):
+            continue  # Nada mudou nesta linha (ex.: só a descrição foi editada)
+        statement = insert_upsert(session, ResumoMensal).values(user_id=user_id, mes=mes, status=status, **delta)
+        instrucoes.append(statement.on_conflict_do_update(
+            index_elements=[ResumoMensal.user_id, ResumoMensal.mes, ResumoMensal.status],
+            set_={campo: getattr(ResumoMensal, campo) + statement.excluded[campo] for campo in CAMPOS_SOMADOS},
+        ))
+    return instrucoes
+
+
+def atualizar_resumo(session: Session, antes: Optional[dict], depois: Optional[dict]):
+    """Aplica a diferença no resumo. Não faz commit: roda na transação de quem chamou."""
+    for statement in instrucoes_ajuste(session, antes, depois):
+        session.exec(statement)
+
+
+async def atualizar_resumo_async(session, antes: Optional[dict], depois: Optional[dict]):
+    """Versão de atualizar_resumo para a AsyncSession."""
+    for statement in instrucoes_ajuste(session, antes, depois):
+        await session.exec(statement)
+
+
+def _consulta_contribuicoes(sinal: int = 1):
+    """
+    SELECT com a contribuição agregada dos orçamentos por (user_id, mês, status), calculada
+    em SQL a partir de orcamento + orcamentoitem. sinal=-1 devolve os valores negativos.
+    Quem usa acrescenta o filtro com .where(...).
+    """
+    subtotal = OrcamentoItem.quantidade * OrcamentoItem.valor
+    totais_itens = (
+        select(
+            OrcamentoItem.orcamento_id,
+            func.sum(case((OrcamentoItem.tipo == "servico", subtotal), else_=0)).label("servicos"),
+            func.sum(case((OrcamentoItem.tipo == "material", subtotal), else_=0)).label("materiais"),
+        )
+        .group_by(OrcamentoItem.orcamento_id)
+        .subquery()
+    )
+    data = Orcamento.data_emissao
+    mes = func.substr(data, 7, 4).concat(literal("-")).concat(func.substr(data, 4, 2))
+    status = func.coalesce(Orcamento.status, STATUS_PADRAO)
+    return (
+        select(
+            Orcamento.user_id,
+            mes,
+            status,
+            func.count() * sinal,
+            func.sum(func.coalesce(Orcamento.total_geral, 0)) * sinal,
+            func.sum(func.coalesce(totais_itens.c.servicos, 0)) * sinal,
+            func.sum(func.coalesce(totais_itens.c.materiais, 0)) * sinal,
+        )
+        .outerjoin(totais_itens, totais_itens.c.orcamento_id == Orcamento.id)
+        .where(Orcamento.user_id.is_not(None))
+        .group_by(Orcamento.user_id, mes, status)
+    )
+
+
+def ajustar_resumo_em_massa(session: Session, condicao, sinal: int):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) no resumo a contribuição de todos os orçamentos
+    que atendem 'condicao', num único INSERT ... SELECT ... ON CONFLICT. Usado pelas
+    operações em lote; não faz commit.
+    """
+    statement = insert_upsert(session, ResumoMensal).from_select(
+        ["user_id", "mes", "status", *CAMPOS_SOMADOS], _consulta_contribuicoes(sinal).where(condicao)
+    )
+    session.exec(statement.on_conflict_do_update(
+        index_elements=[ResumoMensal.user_id, ResumoMensal.mes, ResumoMensal.status],
+        set_={campo: getattr(ResumoMensal, campo) + statement.excluded[campo] for campo in CAMPOS_SOMADOS},
+    ))
+
+
+def reconstruir_resumo(session: Session, user_id: Optional[int] = None):
+    """Recalcula o resumo a partir de orcamento + orcamentoitem (de todos os usuários ou de um só)."""
+    origem = _consulta_contribuicoes()
+    apagar = delete(ResumoMensal)
+    if user_id is not None:
+        origem = origem.where(Orcamento.user_id == user_id)
+        apagar = apagar.where(ResumoMensal.user_id == user_id)
+
+    session.exec(apagar)
+    session.exec(insert(ResumoMensal).from_select(
+        ["user_id", "mes", "status", *CAMPOS_SOMADOS], origem
+    ))
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    with Session(engine) as session:
+        reconstruir_resumo(session)
+        session.commit()
+        total = session.scalar(select(func.count()).select_from(ResumoMensal))
+    print(f"Resumo reconstruído: {total} linha(s).")
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import tempfile
+import itertools
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)  # templates/ e static/ são relativos à raiz do projeto
+
+# Antes de importar o app: o banco é escolhido na importação do database.py
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='orcamento-testes-'), 'testes.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["BASIC_AUTH_USER"] = "admin"
+os.environ["BASIC_AUTH_PASS"] = "secret"
+os.environ["METRICAS_TOKEN"] = "testes"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+import app as aplicacao
+from database import engine, async_engine
+from models import User
+from security import get_password_hash
+
+SENHA_TESTE = "senha-teste"
+_numeros = itertools.count(1)
+
+
+def _ligar_chaves_estrangeiras(conexao_dbapi, _registro):
+    # O SQLite só confere FOREIGN KEY / ON DELETE com este pragma; sem ele os testes
+    # não pegariam o que quebra no Postgres
+    cursor = conexao_dbapi.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+event.listen(engine, "connect", _ligar_chaves_estrangeiras)
+event.listen(async_engine.sync_engine, "connect", _ligar_chaves_estrangeiras)
+
+
+@pytest.fixture(scope="session")
+def app():
+    # O primeiro cliente roda o lifespan: tabelas e usuário admin
+    with TestClient(aplicacao.app):
+        yield aplicacao.app
+
+
+def criar_usuario(username: str = None, **campos) -> User:
+    """Usuário direto no banco, com plano ilimitado (o salvar confere a assinatura)."""
+    campos.setdefault("plano_ilimitado", True)
+    user = User(
+        username=username or f"teste_{next(_numeros):04d}",
+        hashed_password=get_password_hash(SENHA_TESTE),
+        **campos,
+    )
+    with Session(engine) as session:
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+    return user
+
+
+def formulario_orcamento(numero: str, **campos) -> dict:
+    itens = [
+        {"tipo": "servico", "nome": "Pintura", "quantidade": 2, "valor": 10, "unidade": "m²"},
+        {"tipo": "material", "nome": "Tinta", "quantidade": 1, "valor": 5},
+    ]
+    return {
+        "nome": "Cliente Teste", "telefone": "19 99999-0000", "numero_orcamento": numero,
+        "descricao_servico": "Pintura", "condicao_pagamento": "À vista",
+        "itens": json.dumps(itens), "contatos": "[]", **campos,
+    }
+
+
+def logar(app, username: str, senha: str = SENHA_TESTE) -> TestClient:
+    cliente = TestClient(app)
+    resposta = cliente.post("/login", data={"username": username, "password": senha}, follow_redirects=False)
+    assert resposta.status_code == 302 and resposta.headers["location"] == "/", resposta.text
+    return cliente
+
+
+@pytest.fixture
+def usuario(app) -> User:
+    return criar_usuario()
+
+
+@pytest.fixture
+def cliente(app, usuario) -> TestClient:
+    """TestClient com a sessão de um usuário novo (cada teste tem o seu)."""
+    return logar(app, usuario.username)
+
+
+@pytest.fixture
+def admin(app) -> TestClient:
+    return logar(app, os.environ["BASIC_AUTH_USER"], os.environ["BASIC_AUTH_PASS"])
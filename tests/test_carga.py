@@ -0,0 +1,28 @@
+import asyncio
+
+import httpx
+
+import carga
+from database import async_engine
+
+
+def test_fluxo_da_carga_sem_erros(app):
+    """O fluxo do carga.py (login, listar, salvar, PDF, WhatsApp, link público) com 2 usuários simultâneos."""
+    usuarios = carga.semear_usuarios(2, prefixo="carga_teste")
+
+    async def rodar():
+        try:
+            return await carga.rodar_nivel(
+                "http://teste", usuarios, carga.SENHA_PADRAO, concorrencia=2, duracao=1,
+                transport=httpx.ASGITransport(app=app),
+            )
+        finally:
+            # As conexões assíncronas abertas aqui pertencem a este event loop
+            await async_engine.dispose()
+
+    resultado = asyncio.run(rodar())
+
+    resumo = resultado.resumo()
+    assert resultado.fluxos >= 2, resumo
+    assert not resultado.erros, resumo
+    assert all(resumo["etapas"][etapa]["n"] for etapa in carga.ETAPAS), resumo
@@ -0,0 +1,42 @@
+from sqlmodel import Session
+
+from database import engine
+from models import Cliente
+
+
+def _importar(cliente, conteudo: str):
+    resposta = cliente.post("/api/clientes/importar", files={"arquivo": ("clientes.csv", conteudo.encode(), "text/csv")})
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def _clientes(cliente) -> list:
+    return [(c["nome"], c["telefone"], c["cidade_uf"]) for c in cliente.get("/api/clientes/").json()]
+
+
+def test_importar_mesmo_telefone_no_arquivo_cria_um_cliente(cliente):
+    resultado = _importar(cliente, "nome,telefone,cidade_uf\nJoao Silva,19 99999-1111,\nJ. Silva,(19) 99999-1111,Campinas/SP\n")
+
+    assert resultado["clientes_criados"] == 1
+    assert [e["linha"] for e in resultado["erros"]] == [3]
+    assert _clientes(cliente) == [("Joao Silva", "(19) 99999-1111", "Campinas/SP")]
+
+
+def test_importar_telefone_cadastrado_nao_troca_o_nome(cliente):
+    _importar(cliente, "nome,telefone\nJoao Silva,19 99999-1111\n")
+
+    resultado = _importar(cliente, "nome,telefone,cidade_uf\nJ. Silva,(19) 99999-1111,Campinas/SP\n")
+
+    assert (resultado["clientes_criados"], resultado["clientes_atualizados"]) == (0, 1)
+    assert _clientes(cliente) == [("Joao Silva", "(19) 99999-1111", "Campinas/SP")]
+
+
+def test_importar_telefone_de_varios_clientes_atualiza_o_mais_antigo(cliente, usuario):
+    with Session(engine) as session:
+        for nome in ("Maria Souza", "Ana Souza"):
+            session.add(Cliente(nome=nome, telefone="19 98888-2222", user_id=usuario.id))
+            session.commit()
+
+    _importar(cliente, "nome,telefone,cidade_uf\nM. Souza,19 98888-2222,Valinhos/SP\n")
+
+    assert _clientes(cliente) == [("Ana Souza", "19 98888-2222", None), ("Maria Souza", "19 98888-2222", "Valinhos/SP")]
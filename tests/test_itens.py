@@ -0,0 +1,132 @@
+import io
+import zipfile
+
+import pytest
+from sqlalchemy import event, text
+from sqlmodel import Session
+
+from app import marcar_catalogo_alterado
+from database import engine
+from models import Item
+
+
+def test_criar_item_duplicado_responde_409(cliente):
+    item = {"tipo": "material", "nome": "Tinta acrilica", "valor": 10}
+    assert cliente.post("/api/item/", json=item).status_code == 201
+
+    resposta = cliente.post("/api/item/", json=dict(item, nome="TINTA ACRILICA"))
+    assert resposta.status_code == 409
+
+
+def test_criar_item_concorrente_responde_409(cliente, usuario):
+    """Outra requisição grava o mesmo item entre a verificação e o INSERT: o índice único barra."""
+
+    gravado = []
+
+    def gravar_antes(conexao, cursor, comando, parametros, contexto, executemany):
+        if comando.startswith("INSERT INTO item") and not gravado:
+            gravado.append(True)
+            with engine.begin() as outra:
+                outra.execute(
+                    text("INSERT INTO item (tipo, nome, valor, nome_busca, user_id) VALUES ('servico', 'Reboco', 30, 'reboco', :user_id)"),
+                    {"user_id": usuario.id},
+                )
+
+    event.listen(engine, "before_cursor_execute", gravar_antes)
+    try:
+        resposta = cliente.post("/api/item/", json={"tipo": "servico", "nome": "Reboco", "valor": 35})
+    finally:
+        event.remove(engine, "before_cursor_execute", gravar_antes)
+
+    assert resposta.status_code == 409
+    assert [i["valor"] for i in cliente.get("/api/servico/").json()] == [30]
+
+
+def _alterar_catalogo_em_outro_worker(user_id: int):
+    """Item novo gravado direto no banco, com a revisão do catálogo, sem tocar o cache deste processo."""
+    with Session(engine) as session:
+        session.add(Item(tipo="material", nome="Cimento", valor=39.9, user_id=user_id))
+        marcar_catalogo_alterado(session, user_id)
+        session.commit()
+
+
+def test_catalogo_alterado_em_outro_worker_nao_fica_velho(cliente, usuario):
+    assert cliente.post("/api/item/", json={"tipo": "material", "nome": "Areia", "valor": 150}).status_code == 201
+    resposta = cliente.get("/api/catalogo/")  # Catálogo no cache deste processo
+    etag = resposta.headers["etag"]
+
+    _alterar_catalogo_em_outro_worker(usuario.id)
+
+    # A ETag antiga não ganha 304 e as três rotas já trazem o item novo
+    resposta = cliente.get("/api/catalogo/", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200 and resposta.headers["etag"] != etag
+    assert [i["nome"] for i in resposta.json()["materiais"]] == ["Areia", "Cimento"]
+    assert [i["nome"] for i in cliente.get("/api/materiais/").json()] == ["Areia", "Cimento"]
+    assert cliente.get("/api/catalogo/", headers={"If-None-Match": resposta.headers["etag"]}).status_code == 304
+
+
+def test_revisao_do_catalogo_sobe_com_cada_alteracao(cliente, usuario):
+    versoes = [cliente.get("/api/catalogo/").json()["versao"]]
+    item_id = cliente.post("/api/item/", json={"tipo": "servico", "nome": "Reboco", "valor": 30}).json()["id"]
+    versoes.append(cliente.get("/api/catalogo/").json()["versao"])
+    arquivo = {"arquivo": ("itens.csv", "tipo,nome,valor\nservico,Pintura,18\n".encode(), "text/csv")}
+    assert cliente.post("/api/item/importar", files=arquivo).status_code == 200
+    versoes.append(cliente.get("/api/catalogo/").json()["versao"])
+    assert cliente.delete(f"/api/item/{item_id}").status_code == 204
+    versoes.append(cliente.get("/api/catalogo/").json()["versao"])
+
+    assert len(set(versoes)) == 4
+
+
+def test_rotas_do_catalogo_nao_expoem_nome_busca(cliente):
+    criado = cliente.post("/api/item/", json={"tipo": "servico", "nome": "Instalação elétrica", "valor": 120})
+    assert criado.status_code == 201
+
+    respostas = [
+        [criado.json()],
+        cliente.get("/api/servico/").json(),
+        cliente.get("/api/catalogo/busca", params={"q": "instalacao"}).json(),
+        cliente.get("/api/catalogo/").json()["servicos"],
+    ]
+    for itens in respostas:
+        assert [set(item) for item in itens] == [{"id", "tipo", "nome", "valor", "ncm", "user_id"}]
+
+
+def _importar(cliente, nome_arquivo: str, conteudo: bytes):
+    return cliente.post("/api/item/importar", files={"arquivo": (nome_arquivo, conteudo, "application/octet-stream")})
+
+
+def test_importar_csv_atualiza_item_existente(cliente):
+    assert cliente.post("/api/item/", json={"tipo": "material", "nome": "Tinta acrilica", "valor": 10}).status_code == 201
+
+    resposta = _importar(cliente, "itens.csv", "tipo;nome;valor;ncm\nmaterial;TINTA ACRILICA;12,50;3209.10.10\nservico;Reboco;30\n".encode())
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json() == {"total_linhas": 2, "importados": 2, "erros": []}
+    materiais = cliente.get("/api/materiais/").json()
+    assert [(i["nome"], i["valor"], i["ncm"]) for i in materiais] == [("TINTA ACRILICA", 12.5, "3209.10.10")]
+    assert [i["nome"] for i in cliente.get("/api/servico/").json()] == ["Reboco"]
+
+
+def test_importar_linhas_repetidas_no_arquivo_fica_a_ultima(cliente):
+    resposta = _importar(cliente, "itens.csv", "tipo,nome,valor,ncm\nmaterial,Cimento,30,2523.29.10\nmaterial,cimento,35,\n".encode())
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["erros"] == [{"linha": 2, "erro": "Item repetido no arquivo; substituído pela linha 3."}]
+    # Uma linha só, com o valor da última e o NCM que só a primeira trazia
+    assert [(i["nome"], i["valor"], i["ncm"]) for i in cliente.get("/api/materiais/").json()] == [("cimento", 35, "2523.29.10")]
+
+
+def _zip_sem_planilha() -> bytes:
+    conteudo = io.BytesIO()
+    with zipfile.ZipFile(conteudo, "w") as arquivo:
+        arquivo.writestr("leia-me.txt", "não é uma planilha")
+    return conteudo.getvalue()
+
+
+@pytest.mark.parametrize("conteudo", [b"isto nao e um xlsx", _zip_sem_planilha()], ids=["nao_zip", "zip_sem_planilha"])
+def test_importar_xlsx_corrompido_responde_400(cliente, conteudo):
+    resposta = _importar(cliente, "itens.xlsx", conteudo)
+
+    assert resposta.status_code == 400, resposta.text
+    assert cliente.get("/api/catalogo/").json()["materiais"] == []
@@ -0,0 +1,36 @@
+"""
+Os limites de consultas SQL e de tempo de limites_rotas.LIMITES, um teste por rota.
+Os casos rodam em sequência no mesmo banco (a ordem de CASOS importa: o que um cria,
+outro apaga). Para ver os comandos de todas as rotas: python limites_rotas.py --comandos
+
+O tempo varia com a máquina (CI compartilhado, suíte em paralelo) e só é conferido com
+LIMITES_TEMPO=1; as consultas são conferidas sempre.
+"""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import limites_rotas as limites
+
+
+@pytest.fixture(scope="module")
+def rotas(app):
+    clientes = {"usuario": TestClient(app), "admin": TestClient(app), "anonimo": TestClient(app)}
+    ctx = limites.semear(orcamentos=30)
+    limites.preparar_casos(clientes, ctx)
+    return clientes, ctx
+
+
+def test_toda_rota_tem_limite_e_caso(app):
+    assert limites.verificar_cobertura(app) == []
+
+
+@pytest.mark.parametrize("caso", limites.CASOS, ids=lambda caso: f"{caso.metodo} {caso.rota}")
+def test_rota_dentro_do_limite(rotas, caso):
+    clientes, ctx = rotas
+    resultado = limites.medir(caso, clientes, ctx)
+
+    erros = limites.conferir(caso, resultado, tempo=os.getenv("LIMITES_TEMPO") == "1")
+    comandos = "\n".join(f"{numero:>3}. {' '.join(comando.split())[:200]}" for numero, comando in enumerate(resultado["comandos"], 1))
+    assert not erros, "; ".join(erros) + "\n" + comandos
@@ -0,0 +1,24 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as aplicacao
+
+
+def test_metricas_desativadas_sem_token(app, admin, monkeypatch):
+    monkeypatch.setattr(aplicacao, "METRICAS_TOKEN", None)
+    # Nem o admin logado vê: sem token configurado a rota não existe
+    assert admin.get("/metrics").status_code == 404
+
+
+@pytest.mark.parametrize("cabecalho", [None, "Bearer errado", "segredo"])
+def test_metricas_recusam_token_errado(app, monkeypatch, cabecalho):
+    monkeypatch.setattr(aplicacao, "METRICAS_TOKEN", "segredo")
+    cabecalhos = {"Authorization": cabecalho} if cabecalho else {}
+    assert TestClient(app).get("/metrics", headers=cabecalhos).status_code == 403
+
+
+def test_metricas_com_token(app, monkeypatch):
+    monkeypatch.setattr(aplicacao, "METRICAS_TOKEN", "segredo")
+    resposta = TestClient(app).get("/metrics", headers={"Authorization": "Bearer segredo"})
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain")
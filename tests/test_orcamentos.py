@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+from conftest import formulario_orcamento
+from database import contar_consultas
+
+CONTATOS = json.dumps([{"nome": "Ana", "telefone": "19 98888-0000", "email": "ana@exemplo.com.br"}])
+
+
+def _gravar(cliente, url: str, formulario: dict) -> list:
+    """Manda o formulário e devolve os comandos SQL da requisição (COMMIT/ROLLBACK incluídos)."""
+    with contar_consultas() as comandos:
+        resposta = cliente.post(url, data=formulario)
+    assert resposta.status_code == 200, resposta.text
+    return comandos
+
+
+def _orcamento_id(cliente, numero: str) -> int:
+    return next(o["id"] for o in cliente.get("/api/orcamentos/").json() if o["numero"] == numero)
+
+
+@pytest.fixture
+def cliente_aquecido(cliente):
+    # Deixa o usuário no cache das leituras (as escritas o buscam no banco de qualquer jeito)
+    assert cliente.get("/api/proximo-numero/").status_code == 200
+    return cliente
+
+
+def test_salvar_orcamento_com_cliente_novo_em_uma_transacao(cliente_aquecido):
+    comandos = _gravar(cliente_aquecido, "/salvar-orcamento/", formulario_orcamento("0001", salvar_cliente="on", contatos=CONTATOS))
+
+    # Usuário (SELECT e o ROLLBACK da sessão da autenticação), cliente, contatos do perfil
+    # (leitura e inserção), orçamento, contatos do orçamento, itens, vínculo dos itens com
+    # o catálogo, resumo do dashboard e o COMMIT
+    assert len(comandos) == 11, comandos
+    assert comandos.count("COMMIT") == 1
+
+
+def test_salvar_orcamento_com_cliente_existente_em_uma_transacao(cliente_aquecido):
+    _gravar(cliente_aquecido, "/salvar-orcamento/", formulario_orcamento("0001", salvar_cliente="on", contatos=CONTATOS))
+    cliente_id = cliente_aquecido.get("/api/clientes/").json()[0]["id"]
+
+    comandos = _gravar(cliente_aquecido, "/salvar-orcamento/", formulario_orcamento(
+        "0002", cliente_id=str(cliente_id), salvar_cliente="on", contatos=CONTATOS,
+    ))
+
+    # O mesmo, com o UPDATE ... RETURNING do cliente no lugar do INSERT e sem contato novo
+    assert len(comandos) == 10, comandos
+    assert comandos.count("COMMIT") == 1
+
+
+def test_atualizar_orcamento_em_uma_transacao(cliente_aquecido):
+    _gravar(cliente_aquecido, "/salvar-orcamento/", formulario_orcamento("0001", salvar_cliente="on", contatos=CONTATOS))
+    orcamento_id = _orcamento_id(cliente_aquecido, "0001")
+
+    comandos = _gravar(cliente_aquecido, f"/atualizar-orcamento/{orcamento_id}", formulario_orcamento(
+        "0001", salvar_cliente="on", descricao_servico="Pintura e reboco",
+        contatos=json.dumps([{"nome": "Ana", "telefone": "19 98888-0000", "email": "ana@exemplo.com"}]),
+    ))
+
+    # Usuário, orçamento e contatos dele, cliente e contatos do perfil; os UPDATEs do que
+    # mudou, itens regravados com o vínculo ao catálogo, o COMMIT e o ROLLBACK da autenticação
+    assert len(comandos) == 13, comandos
+    assert comandos.count("COMMIT") == 1
+
+
+@pytest.mark.parametrize("campos", [{"descricao_servico": None}, {"numero": None}, {"numero": "  "}])
+def test_patch_recusa_campo_obrigatorio_vazio(cliente, campos):
+    _gravar(cliente, "/salvar-orcamento/", formulario_orcamento("0001"))
+    orcamento_id = _orcamento_id(cliente, "0001")
+
+    resposta = cliente.patch(f"/api/orcamentos/{orcamento_id}", json=campos)
+
+    assert resposta.status_code == 400, resposta.text
+    assert _orcamento_id(cliente, "0001") == orcamento_id  # Nada foi gravado
+
+
+@pytest.mark.parametrize("operacao", [
+    {"operacao": "atualizar", "posicao": 0, "item": {"quantidade": None}},
+    {"operacao": "atualizar", "posicao": 0, "item": {"valor": None}},
+    {"operacao": "atualizar", "posicao": 0, "item": {"nome": None}},
+    {"operacao": "atualizar", "posicao": 1, "item": {"tipo": None}},
+    {"operacao": "atualizar", "posicao": 1, "item": {"nome": ""}},
+    {"operacao": "adicionar", "item": {"tipo": "servico", "nome": "Reboco", "quantidade": None, "valor": 30}},
+])
+def test_patch_recusa_item_com_campo_obrigatorio_vazio(cliente, operacao):
+    _gravar(cliente, "/salvar-orcamento/", formulario_orcamento("0001"))
+    orcamento_id = _orcamento_id(cliente, "0001")
+
+    resposta = cliente.patch(f"/api/orcamentos/{orcamento_id}", json={"itens": [operacao]})
+
+    assert resposta.status_code == 400, resposta.text
+    assert cliente.get(f"/api/orcamento-detalhes/{orcamento_id}").json()["total_geral"] == 25
+
+
+def test_patch_aceita_nulo_em_campo_opcional(cliente):
+    _gravar(cliente, "/salvar-orcamento/", formulario_orcamento("0001"))
+    orcamento_id = _orcamento_id(cliente, "0001")
+
+    resposta = cliente.patch(f"/api/orcamentos/{orcamento_id}", json={
+        "condicao_pagamento": None,
+        "itens": [{"operacao": "atualizar", "posicao": 0, "item": {"unidade": None, "quantidade": 3}}],
+    })
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["total_geral"] == 35
+
+
+@pytest.mark.parametrize("item", [{"quantidade": 2.5}, {"quantidade": -3}, {"quantidade": 0}, {"valor": -10}])
+def test_patch_recusa_quantidade_fracionada_ou_negativa(cliente, item):
+    _gravar(cliente, "/salvar-orcamento/", formulario_orcamento("0001"))
+    orcamento_id = _orcamento_id(cliente, "0001")
+
+    resposta = cliente.patch(f"/api/orcamentos/{orcamento_id}", json={
+        "itens": [{"operacao": "atualizar", "posicao": 0, "item": item}],
+    })
+
+    assert resposta.status_code == 422, resposta.text
+    detalhes = cliente.get(f"/api/orcamento-detalhes/{orcamento_id}").json()
+    assert (detalhes["total_geral"], detalhes["total_servicos"] + detalhes["total_materiais"]) == (25, 25)
@@ -0,0 +1,66 @@
+from sqlmodel import Session, delete, func, select, update
+
+from conftest import criar_usuario, formulario_orcamento, logar
+from database import engine
+from idempotencia import CABECALHO_IDEMPOTENCIA
+from models import ChaveIdempotencia, ResumoMensal, User
+
+
+def test_apagar_usuario_com_orcamentos(app, admin):
+    user = criar_usuario()
+    cliente = logar(app, user.username)
+    assert cliente.post("/salvar-orcamento/", data=formulario_orcamento("0001")).status_code == 200
+    assert cliente.get("/api/dashboard/").json()["geral"]["quantidade"] == 1  # Já tem linha em resumomensal
+
+    assert admin.delete(f"/api/users/{user.id}").status_code == 204
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(ResumoMensal).where(ResumoMensal.user_id == user.id)).one() == 0
+
+
+def test_apagar_usuario_com_chave_de_idempotencia(app, admin):
+    user = criar_usuario()
+    cliente = logar(app, user.username)
+    resposta = cliente.post(
+        "/salvar-orcamento/", data=formulario_orcamento("0001"), headers={CABECALHO_IDEMPOTENCIA: "salvar-0001"},
+    )
+    assert resposta.status_code == 200
+
+    assert admin.delete(f"/api/users/{user.id}").status_code == 204
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(ChaveIdempotencia).where(ChaveIdempotencia.user_id == user.id)).one() == 0
+
+
+def _alterar_em_outro_worker(user_id: int, **valores):
+    """Grava direto no banco, sem invalidar o cache deste processo (como faria outro worker)."""
+    with Session(engine) as session:
+        session.exec(update(User).where(User.id == user_id).values(**valores))
+        session.commit()
+
+
+def test_contador_redefinido_em_outro_worker_vale_na_hora(cliente, usuario):
+    assert cliente.get("/api/proximo-numero/").json() == {"proximo_numero": "0001"}  # Usuário no cache
+
+    _alterar_em_outro_worker(usuario.id, contador_orcamento_override=40)
+    assert cliente.get("/api/proximo-numero/").json() == {"proximo_numero": "0040"}
+
+    # O salvar consome o contador; o outro worker volta a sugerir pelo maior número
+    assert cliente.post("/salvar-orcamento/", data=formulario_orcamento("0040")).status_code == 200
+    assert cliente.get("/api/proximo-numero/").json() == {"proximo_numero": "0041"}
+
+
+def test_acesso_revogado_em_outro_worker_bloqueia_na_hora(cliente, usuario):
+    assert cliente.get("/api/proximo-numero/").status_code == 200  # Usuário no cache
+
+    _alterar_em_outro_worker(usuario.id, plano_ilimitado=False, data_expiracao=None)
+    resposta = cliente.post("/salvar-orcamento/", data=formulario_orcamento("0001"))
+    assert resposta.status_code == 403
+
+
+def test_usuario_apagado_em_outro_worker_nao_grava(cliente, usuario):
+    assert cliente.get("/api/proximo-numero/").status_code == 200  # Usuário no cache
+
+    with Session(engine) as session:
+        session.exec(delete(User).where(User.id == usuario.id))
+        session.commit()
+    resposta = cliente.post("/api/item/", json={"tipo": "servico", "nome": "Reboco", "valor": 30}, follow_redirects=False)
+    assert resposta.status_code in (302, 307) and resposta.headers["location"] == "/login"